@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Measure the throughput of the pure-Python AES implementation in CBC and
+# CTR mode, both through the functions operating on bytes and through the
+# ones operating on lists of integers.
+
+from __future__ import unicode_literals, print_function
+
+import optparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from youtube_dl.aes import (
+    aes_cbc_decrypt,
+    aes_cbc_decrypt_bytes,
+    aes_cbc_encrypt_bytes,
+    aes_ctr_decrypt_bytes,
+)
+from youtube_dl.utils import bytes_to_intlist, intlist_to_bytes
+
+
+def measure(func, size, runs):
+    best = None
+    for _ in range(runs):
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return size / best / 1024 / 1024
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [OPTIONS]')
+    parser.add_option(
+        '--size', type=int, default=1024, metavar='KB',
+        help='Size of the data to process (default is %default)')
+    parser.add_option(
+        '--runs', type=int, default=3,
+        help='Number of runs, the fastest one is reported (default is %default)')
+    parser.add_option(
+        '--key-size', type=int, default=16, metavar='BYTES',
+        help='Cipher key size: 16, 24 or 32 (default is %default)')
+    opts, args = parser.parse_args()
+
+    size = opts.size * 1024
+    data = os.urandom(size)
+    key = os.urandom(opts.key_size)
+    iv = os.urandom(16)
+
+    benchmarks = (
+        ('CBC decrypt (bytes)', lambda: aes_cbc_decrypt_bytes(data, key, iv)),
+        ('CBC decrypt (int list)', lambda: intlist_to_bytes(aes_cbc_decrypt(
+            bytes_to_intlist(data), bytes_to_intlist(key), bytes_to_intlist(iv)))),
+        ('CBC encrypt (bytes)', lambda: aes_cbc_encrypt_bytes(data, key, iv)),
+        ('CTR (bytes)', lambda: aes_ctr_decrypt_bytes(data, key, iv)),
+    )
+    print('AES-%d, %d KB' % (opts.key_size * 8, opts.size))
+    for name, func in benchmarks:
+        print('%-24s %6.2f MB/s' % (name + ':', measure(func, size, opts.runs)))
+
+
+if __name__ == '__main__':
+    main()
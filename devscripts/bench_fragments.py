@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Load test the fragment downloaders: download many HLS streams at once from
+# a local server serving synthetic m3u8 playlists and compare the fragment
+# engines by time, throughput and number of threads.
+
+from __future__ import division, unicode_literals, print_function
+
+import multiprocessing
+import optparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from youtube_dl import YoutubeDL
+from youtube_dl.compat import compat_http_server
+from youtube_dl.downloader.hls import HlsFD
+
+try:
+    import socketserver
+except ImportError:  # Python 2
+    import SocketServer as socketserver
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, compat_http_server.HTTPServer):
+    daemon_threads = True
+    # Hundreds of clients may connect at once
+    request_queue_size = 1024
+
+
+class BenchRequestHandler(compat_http_server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_data(self, data, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server
+        mobj = re.match(r'^/stream/\d+/index\.m3u8$', self.path)
+        if mobj:
+            lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:2', '#EXT-X-MEDIA-SEQUENCE:0']
+            for i in range(server.fragment_count):
+                lines.extend(['#EXTINF:2.0,', 'frag%d.ts' % i])
+            lines.append('#EXT-X-ENDLIST')
+            return self.send_data('\n'.join(lines).encode('utf-8'), 'application/vnd.apple.mpegurl')
+        if re.match(r'^/stream/\d+/frag\d+\.ts$', self.path):
+            # Simulate the latency of a remote server
+            if server.latency:
+                time.sleep(server.latency)
+            return self.send_data(server.fragment, 'video/mp2t')
+        self.send_error(404)
+
+
+def serve(port_queue, fragment_count, fragment_size, latency):
+    # The server runs in its own process so that its threads are not counted
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), BenchRequestHandler)
+    httpd.fragment_count = fragment_count
+    httpd.fragment = os.urandom(fragment_size)
+    httpd.latency = latency
+    port_queue.put(httpd.socket.getsockname()[1])
+    httpd.serve_forever()
+
+
+def measure(base_url, tmpdir, streams, params):
+    results = []
+
+    def download(index):
+        ydl = YoutubeDL(params)
+        fd = HlsFD(ydl, params)
+        filename = os.path.join(tmpdir, 'stream%d.ts' % index)
+        results.append(fd.download(filename, {
+            'url': '%s/stream/%d/index.m3u8' % (base_url, index),
+        }))
+
+    peak_threads = [threading.active_count()]
+    done = threading.Event()
+
+    def monitor():
+        while not done.is_set():
+            peak_threads[0] = max(peak_threads[0], threading.active_count())
+            done.wait(0.01)
+
+    monitor_thread = threading.Thread(target=monitor)
+    monitor_thread.start()
+    threads = [threading.Thread(target=download, args=(i,)) for i in range(streams)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+    done.set()
+    monitor_thread.join()
+    assert results == [True] * streams, results
+    size = sum(os.path.getsize(os.path.join(tmpdir, fn)) for fn in os.listdir(tmpdir))
+    for fn in os.listdir(tmpdir):
+        os.remove(os.path.join(tmpdir, fn))
+    # Neither the monitor nor the main thread download anything
+    return elapsed, size, peak_threads[0] - 2
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [OPTIONS]')
+    parser.add_option(
+        '--streams', type=int, default=50,
+        help='Number of streams downloaded at once (default is %default)')
+    parser.add_option(
+        '--fragments', type=int, default=40,
+        help='Number of fragments per stream (default is %default)')
+    parser.add_option(
+        '--fragment-size', type=int, default=64, metavar='KB',
+        help='Size of the fragments (default is %default)')
+    parser.add_option(
+        '--latency', type=float, default=0.02, metavar='SECONDS',
+        help='Time the server waits before sending a fragment (default is %default)')
+    parser.add_option(
+        '--concurrent-fragments', type=int, default=4, metavar='N',
+        help='Number of fragments downloaded concurrently per stream (default is %default)')
+    parser.add_option(
+        '--engine', action='append', dest='engines', metavar='ENGINE',
+        help='Fragment engine to measure, may be repeated (default is threads and asyncio)')
+    opts, args = parser.parse_args()
+
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(
+        port_queue, opts.fragments, opts.fragment_size * 1024, opts.latency))
+    server.daemon = True
+    server.start()
+    base_url = 'http://127.0.0.1:%d' % port_queue.get()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for engine in opts.engines or ['threads', 'asyncio']:
+            params = {
+                'quiet': True,
+                'noprogress': True,
+                'continuedl': False,
+                'concurrent_fragment_downloads': opts.concurrent_fragments,
+                'fragment_engine': engine,
+                'proxy': '',
+            }
+            elapsed, size, peak_threads = measure(base_url, tmpdir, opts.streams, params)
+            print('%-8s %d streams in %.2fs at %.1f MB/s (at most %d downloading threads)' % (
+                engine + ':', opts.streams, elapsed, size / elapsed / 1024 / 1024, peak_threads))
+    finally:
+        shutil.rmtree(tmpdir)
+        server.terminate()
+
+
+if __name__ == '__main__':
+    main()
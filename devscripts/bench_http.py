@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Measure the throughput of the HTTP downloader against a local server, so
+# that it is limited by the per-block overhead of the download loop rather
+# than by the network.
+
+from __future__ import unicode_literals, print_function
+
+import optparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from youtube_dl import YoutubeDL
+from youtube_dl.compat import compat_http_server
+from youtube_dl.downloader.http import HttpFD
+
+try:
+    import socketserver
+except ImportError:  # Python 2
+    import SocketServer as socketserver
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, compat_http_server.HTTPServer):
+    daemon_threads = True
+
+
+class BenchRequestHandler(compat_http_server.BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        data = self.server.data
+        mobj = re.match(r'bytes=(\d+)-(\d+)', self.headers.get('Range') or '')
+        if mobj:
+            start, end = int(mobj.group(1)), int(mobj.group(2))
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, end, len(data)))
+            data = data[start:end + 1]
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class ReadOnlyResponse(object):
+    """Response wrapper without readinto(), forcing the read() path"""
+
+    def __init__(self, response):
+        self._response = response
+
+    def __getattr__(self, name):
+        if name == 'readinto':
+            raise AttributeError(name)
+        return getattr(self._response, name)
+
+
+def measure(url, filename, size, params, hide_readinto, runs):
+    best = None
+    for _ in range(runs):
+        ydl = YoutubeDL(params)
+        if hide_readinto:
+            urlopen = ydl.urlopen
+            ydl.urlopen = lambda req: ReadOnlyResponse(urlopen(req))
+        fd = HttpFD(ydl, params)
+        hook_calls = []
+        fd.add_progress_hook(lambda s: hook_calls.append(s['status']))
+        start = time.time()
+        assert fd.download(filename, {'url': url})
+        elapsed = time.time() - start
+        assert os.path.getsize(filename) == size
+        os.remove(filename)
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(hook_calls)
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [OPTIONS]')
+    parser.add_option(
+        '--size', type=int, default=256, metavar='MB',
+        help='Size of the served file (default is %default)')
+    parser.add_option(
+        '--runs', type=int, default=3,
+        help='Number of runs, the fastest one is reported (default is %default)')
+    parser.add_option(
+        '--buffer-size', type=int, metavar='BYTES',
+        help='Download buffer size, also disables its automatic resizing')
+    parser.add_option(
+        '--progress-rate', type=float, metavar='RATE',
+        help='Maximum number of progress updates per second, 0 for every block')
+    parser.add_option(
+        '--connections', type=int, metavar='N',
+        help='Number of connections to download the file with')
+    parser.add_option(
+        '--no-compare', action='store_true', default=False,
+        help='Only measure the current download loop, not the one reading a new bytes object and reporting progress for every block')
+    opts, args = parser.parse_args()
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), BenchRequestHandler)
+    httpd.data = os.urandom(1024 * 1024) * opts.size
+    server_thread = threading.Thread(target=httpd.serve_forever)
+    server_thread.daemon = True
+    server_thread.start()
+    url = 'http://127.0.0.1:%d/file.mp4' % httpd.socket.getsockname()[1]
+
+    params = {
+        'quiet': True,
+        'continuedl': False,
+    }
+    if opts.buffer_size is not None:
+        params['buffersize'] = opts.buffer_size
+        params['noresizebuffer'] = True
+    if opts.progress_rate is not None:
+        params['progress_rate'] = opts.progress_rate
+    if opts.connections is not None:
+        params['http_connections'] = opts.connections
+
+    modes = [('current', params, False)]
+    if not opts.no_compare:
+        modes.insert(0, ('read() per block', dict(params, progress_rate=0), True))
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(tmpdir, 'file.mp4')
+        for label, mode_params, hide_readinto in modes:
+            best, hook_calls = measure(url, filename, len(httpd.data), mode_params, hide_readinto, opts.runs)
+            print('%-17s %d MB at %.1f MB/s (%d progress updates per download)' % (
+                label + ':', opts.size, opts.size / best, hook_calls))
+    finally:
+        shutil.rmtree(tmpdir)
+        httpd.shutdown()
+
+
+if __name__ == '__main__':
+    main()
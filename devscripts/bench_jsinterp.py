@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Measure the cost of extracting the signature function from YouTube player
+# code and of calling it, the way YoutubeIE does for every format.
+# Without --player, a sample with the structure of the html5 players is used;
+# players cached by test/test_youtube_signature.py are in test/testdata.
+
+from __future__ import unicode_literals, print_function
+
+import io
+import optparse
+import os
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from test.helper import FakeYDL
+from youtube_dl.extractor import YoutubeIE
+
+SAMPLE_PLAYER = '''
+var Tx={VP:function(a){a.reverse()},
+Bi:function(a,b){var c=a[0];a[0]=a[b%a.length];a[b%a.length]=c},
+nK:function(a,b){a.splice(0,b)}};
+var Ux=function(a){a=a.split("");Tx.Bi(a,47);Tx.nK(a,2);Tx.VP(a,44);Tx.nK(a,3);
+Tx.Bi(a,65);Tx.VP(a,59);Tx.Bi(a,14);Tx.nK(a,1);Tx.Bi(a,38);Tx.VP(a,70);return a.join("")};
+c&&(b=a.sig||Ux(c),e.set("signature",b));
+'''
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [OPTIONS]')
+    parser.add_option(
+        '--player', metavar='FILE',
+        help='JavaScript player file to extract the signature function from')
+    parser.add_option(
+        '--calls', type=int, default=10000,
+        help='Number of calls to the signature function (default is %default)')
+    opts, args = parser.parse_args()
+
+    if opts.player:
+        with io.open(opts.player, encoding='utf-8') as f:
+            jscode = f.read()
+    else:
+        jscode = SAMPLE_PLAYER
+
+    ie = YoutubeIE(FakeYDL())
+    signature = string.printable[:86]
+
+    start = time.time()
+    func = ie._parse_sig_js(jscode)
+    extracted = time.time()
+    func(signature)
+    first_call = time.time()
+    for _ in range(opts.calls):
+        func(signature)
+    end = time.time()
+
+    print('Extraction: %8.1f us' % ((extracted - start) * 1e6))
+    print('First call: %8.1f us' % ((first_call - extracted) * 1e6))
+    print('Per call:   %8.1f us' % ((end - first_call) / opts.calls * 1e6))
+
+
+if __name__ == '__main__':
+    main()
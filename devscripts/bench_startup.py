@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Measure the startup cost of youtube-dl: the time it takes a fresh
+# interpreter to import the package and to dispatch a URL, and the resident
+# memory it uses afterwards.
+#
+# Every sample runs in a new process so imports are never cached in memory.
+# The script exits with a non-zero status if one of the given limits is
+# exceeded, so it can be used to catch startup regressions.
+
+from __future__ import unicode_literals, print_function
+
+import json
+import optparse
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child process; prints a JSON object with the measurements
+CHILD_SCRIPT = r'''
+import json
+import sys
+import time
+
+start = time.time()
+import youtube_dl
+from youtube_dl.extractor import _LAZY_LOADER
+imported = time.time()
+
+url = sys.argv[1]
+if url:
+    ydl = youtube_dl.YoutubeDL({'quiet': True})
+    ie = next(ie for ie in ydl._suitable_ies(url) if ie.suitable(url))
+dispatched = time.time()
+
+try:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    if sys.platform == 'darwin':
+        rss //= 1024
+except ImportError:
+    rss = None
+
+print(json.dumps({
+    'lazy': _LAZY_LOADER,
+    'import': imported - start,
+    'dispatch': dispatched - imported,
+    'rss': rss,
+    'modules': len(sys.modules),
+}))
+'''
+
+
+def measure(python, url):
+    output = subprocess.check_output(
+        [python, '-c', CHILD_SCRIPT, url or ''], cwd=ROOT_DIR)
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [OPTIONS]')
+    parser.add_option(
+        '--runs', type=int, default=10,
+        help='Number of processes to sample (default is %default)')
+    parser.add_option(
+        '--python', default=sys.executable,
+        help='Python interpreter to benchmark (default is %default)')
+    parser.add_option(
+        '--url', default='https://www.youtube.com/watch?v=BaW_jenozKc',
+        help='URL to dispatch to an extractor after importing, empty to skip (default is %default)')
+    parser.add_option(
+        '--max-import-time', type=float, metavar='SECONDS',
+        help='Fail if the median import time exceeds SECONDS')
+    parser.add_option(
+        '--max-rss', type=int, metavar='KB',
+        help='Fail if the median maximum resident set size exceeds KB')
+    parser.add_option(
+        '--no-compile', action='store_true', default=False,
+        help='Do not byte-compile the package before sampling')
+    opts, args = parser.parse_args()
+
+    if not opts.no_compile:
+        # Installed packages come with byte-compiled modules; without them
+        # every sample would include the compilation of changed modules
+        subprocess.check_call(
+            [opts.python, '-m', 'compileall', '-q', os.path.join(ROOT_DIR, 'youtube_dl')])
+
+    samples = [measure(opts.python, opts.url) for _ in range(opts.runs)]
+
+    print('Lazy extractors:  %s' % ('yes' if samples[0]['lazy'] else 'no (run "make lazy-extractors")'))
+    print('Modules loaded:   %d' % samples[0]['modules'])
+    for key, label in (('import', 'Import time:'), ('dispatch', 'Dispatch time:')):
+        values = [s[key] for s in samples]
+        print('%-17s median %.1f ms, min %.1f ms, max %.1f ms' % (
+            label, median(values) * 1000, min(values) * 1000, max(values) * 1000))
+    rss = [s['rss'] for s in samples if s['rss'] is not None]
+    if rss:
+        print('Max RSS:          median %d KB' % median(rss))
+
+    failed = False
+    if opts.max_import_time is not None:
+        import_time = median([s['import'] for s in samples])
+        if import_time > opts.max_import_time:
+            print('Import time of %.3f s exceeds the limit of %.3f s' % (import_time, opts.max_import_time), file=sys.stderr)
+            failed = True
+    if opts.max_rss is not None and rss and median(rss) > opts.max_rss:
+        print('Maximum RSS of %d KB exceeds the limit of %d KB' % (median(rss), opts.max_rss), file=sys.stderr)
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,25 +5,30 @@ import io
 import os
 from os.path import dirname as dirn
 import sys
+import types
 
-print('WARNING: Lazy loading extractors is an experimental feature that may not always work', file=sys.stderr)
+try:
+    import builtins
+except ImportError:  # Python 2
+    import __builtin__ as builtins
 
 sys.path.insert(0, dirn(dirn((os.path.abspath(__file__)))))
 
 lazy_extractors_filename = sys.argv[1]
 if os.path.exists(lazy_extractors_filename):
     os.remove(lazy_extractors_filename)
+# Always build from the real extractors, even if a lazy extractors module
+# is present somewhere else
+sys.modules['youtube_dl.extractor.lazy_extractors'] = None
 
 from youtube_dl.extractor import _ALL_CLASSES
 from youtube_dl.extractor.common import InfoExtractor, SearchInfoExtractor
+from youtube_dl.extractor.urlindex import build_url_index
+from youtube_dl import compat, utils
 
 with open('devscripts/lazy_load_template.py', 'rt') as f:
     module_template = f.read()
 
-module_contents = [
-    module_template + '\n' + getsource(InfoExtractor.suitable) + '\n',
-    'class LazyLoadSearchExtractor(LazyLoadExtractor):\n    pass\n']
-
 ie_template = '''
 class {name}({bases}):
     _VALID_URL = {valid_url!r}
@@ -46,6 +51,36 @@ def get_base_name(base):
         return base.__name__
 
 
+def code_names(code):
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= code_names(const)
+    return names
+
+
+def build_suitable_imports(ie, defined_names):
+    """
+    Return the import statements for the module level names used by the
+    suitable() override of ie that the lazy module does not define
+    """
+    module_globals = sys.modules[ie.__module__].__dict__
+    imports = set()
+    for name in code_names(ie.suitable.__func__.__code__):
+        if name in defined_names or name not in module_globals:
+            continue
+        obj = module_globals[name]
+        if getattr(compat, name, None) is obj:
+            imports.add('from ..compat import {0}'.format(name))
+        elif getattr(utils, name, None) is obj:
+            imports.add('from ..utils import {0}'.format(name))
+        elif isinstance(obj, types.ModuleType):
+            imports.add('import {0} as {1}'.format(obj.__name__, name) if obj.__name__ != name else 'import {0}'.format(name))
+        else:
+            raise Exception('{0}.suitable uses {1}, which cannot be imported into the lazy extractors module'.format(ie.__name__, name))
+    return imports
+
+
 def build_lazy_ie(ie, name):
     valid_url = getattr(ie, '_VALID_URL', None)
     s = ie_template.format(
@@ -83,16 +118,37 @@ while classes:
             break
 ordered_cls.append(_ALL_CLASSES[-1])
 
-names = []
+# suitable() overrides are copied verbatim, so the names they use must be
+# available in the lazy module as well
+defined_names = set(dir(builtins)) | set(ie.__name__ for ie in ordered_cls) | set(['re'])
+suitable_imports = set()
+for ie in ordered_cls:
+    if ie.suitable.__func__ is not InfoExtractor.suitable.__func__:
+        suitable_imports |= build_suitable_imports(ie, defined_names)
+if suitable_imports:
+    module_template = module_template.replace(
+        '\nimport re\n', '\nimport re\n\n' + ''.join(
+            imp + '\n' for imp in sorted(suitable_imports)), 1)
+
+module_contents = [
+    module_template + '\n' + getsource(InfoExtractor.suitable) + '\n',
+    'class LazyLoadSearchExtractor(LazyLoadExtractor):\n    pass\n']
+
 for ie in ordered_cls:
-    name = ie.__name__
-    src = build_lazy_ie(ie, name)
-    module_contents.append(src)
-    if ie in _ALL_CLASSES:
-        names.append(name)
+    module_contents.append(build_lazy_ie(ie, ie.__name__))
+
+# The order of _ALL_CLASSES decides which extractor handles a URL, so it
+# must not depend on the order the classes are defined in
+module_contents.append(
+    '_ALL_CLASSES = [{0}]'.format(', '.join(ie.__name__ for ie in _ALL_CLASSES)))
 
+url_index, unindexed = build_url_index(_ALL_CLASSES)
+module_contents.append(
+    '_URL_INDEX = {{\n{0}\n}}'.format('\n'.join(
+        "    '{0}': ({1},),".format(token, ', '.join("'%s'" % ie_key for ie_key in ie_keys))
+        for token, ie_keys in sorted(url_index.items()))))
 module_contents.append(
-    '_ALL_CLASSES = [{0}]'.format(', '.join(names)))
+    '_URL_INDEX_UNINDEXED = [{0}]'.format(', '.join("'%s'" % ie_key for ie_key in unindexed)))
 
 module_src = '\n'.join(module_contents) + '\n'
 
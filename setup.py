@@ -9,9 +9,11 @@ import sys
 
 try:
     from setuptools import setup, Command
+    from setuptools.command.build_py import build_py
     setuptools_available = True
 except ImportError:
     from distutils.core import setup, Command
+    from distutils.command.build_py import build_py
     setuptools_available = False
 from distutils.spawn import spawn
 
@@ -85,20 +87,42 @@ else:
 
 class build_lazy_extractors(Command):
     description = 'Build the extractor lazy loading module'
-    user_options = []
+    user_options = [
+        ('output=', 'o', 'file to write the module to (default: youtube_dl/extractor/lazy_extractors.py)'),
+    ]
 
     def initialize_options(self):
-        pass
+        self.output = None
 
     def finalize_options(self):
-        pass
+        if self.output is None:
+            self.output = 'youtube_dl/extractor/lazy_extractors.py'
 
     def run(self):
+        if not os.path.exists('devscripts/make_lazy_extractors.py'):
+            warnings.warn('Skipping the lazy extractors since devscripts/make_lazy_extractors.py is not present.')
+            return
         spawn(
-            [sys.executable, 'devscripts/make_lazy_extractors.py', 'youtube_dl/extractor/lazy_extractors.py'],
+            [sys.executable, 'devscripts/make_lazy_extractors.py', self.output],
             dry_run=self.dry_run,
         )
 
+
+class build_py_with_lazy_extractors(build_py):
+    """Build the lazy extractors so that they are always packaged"""
+
+    def run(self):
+        build_py.run(self)
+        # The module is written to the build directory, so that the source
+        # tree keeps using the real extractors
+        output = os.path.join(self.build_lib, 'youtube_dl', 'extractor', 'lazy_extractors.py')
+        lazy_extractors = self.distribution.get_command_obj('build_lazy_extractors')
+        lazy_extractors.output = output
+        self.run_command('build_lazy_extractors')
+        if self.compile and os.path.exists(output):
+            self.byte_compile([output])
+
+
 setup(
     name='youtube_dl',
     version=__version__,
@@ -133,6 +157,9 @@ setup(
         'Programming Language :: Python :: 3.6',
     ],
 
-    cmdclass={'build_lazy_extractors': build_lazy_extractors},
+    cmdclass={
+        'build_lazy_extractors': build_lazy_extractors,
+        'build_py': build_py_with_lazy_extractors,
+    },
     **params
 )
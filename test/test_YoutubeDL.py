@@ -10,14 +10,17 @@ import unittest
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import copy
+import threading
+import time
 
 from test.helper import FakeYDL, assertRegexpMatches
 from youtube_dl import YoutubeDL
+from youtube_dl.YoutubeDL import _PostProcessorPool
 from youtube_dl.compat import compat_str, compat_urllib_error
 from youtube_dl.extractor import YoutubeIE
 from youtube_dl.extractor.common import InfoExtractor
 from youtube_dl.postprocessor.common import PostProcessor
-from youtube_dl.utils import ExtractorError, match_filter_func
+from youtube_dl.utils import DownloadError, ExtractorError, MaxDownloadsReached, PostProcessingError, match_filter_func
 
 TEST_URL = 'http://localhost/sample.mp4'
 
@@ -635,6 +638,48 @@ class TestYoutubeDL(unittest.TestCase):
         self.assertTrue(os.path.exists(filename), '%s doesn\'t exist' % filename)
         os.unlink(filename)
 
+    def test_postprocessor_workers(self):
+        lock = threading.Lock()
+        runs = []
+        active = [0, 0]
+
+        class SlowPP(PostProcessor):
+            def __init__(self, name):
+                super(SlowPP, self).__init__()
+                self.name = name
+
+            def run(self, info):
+                with lock:
+                    active[0] += 1
+                    active[1] = max(active)
+                time.sleep(0.05)
+                with lock:
+                    active[0] -= 1
+                    runs.append((info['id'], self.name))
+                if info['id'] == 'broken':
+                    raise PostProcessingError('broken')
+                return [], info
+
+        ydl = YoutubeDL({'postprocessor_workers': 2, 'quiet': True})
+        ydl.add_post_processor(SlowPP('first'))
+        ydl.add_post_processor(SlowPP('second'))
+        pool = _PostProcessorPool(ydl, 2)
+        for i in range(4):
+            pool.submit('%d.mp4' % i, {'id': compat_str(i)})
+        pool.drain()
+        self.assertEqual(sorted(runs), sorted(
+            (compat_str(i), name) for i in range(4) for name in ('first', 'second')))
+        # The postprocessors of every file run in order
+        for i in range(4):
+            names = [name for video_id, name in runs if video_id == compat_str(i)]
+            self.assertEqual(names, ['first', 'second'])
+        self.assertEqual(active[1], 2)
+
+        # Errors are raised once the files are post-processed
+        pool.submit('broken.mp4', {'id': 'broken'})
+        self.assertRaises(DownloadError, pool.drain)
+        pool.drain()
+
     def test_match_filter(self):
         class FilterYDL(YDL):
             def __init__(self, *args, **kwargs):
@@ -782,6 +827,193 @@ class TestYoutubeDL(unittest.TestCase):
         result = get_ids({'playlist_items': '2-4,3-4,3'})
         self.assertEqual(result, [2, 3, 4])
 
+    def test_playlist_workers(self):
+        entries = [{
+            'id': compat_str(i),
+            'title': compat_str(i),
+            'url': TEST_URL,
+        } for i in range(1, 9)]
+        playlist = {
+            '_type': 'playlist',
+            'id': 'test',
+            'entries': entries,
+            'extractor': 'test:playlist',
+            'extractor_key': 'test:playlist',
+            'webpage_url': 'http://example.com',
+        }
+
+        class ConcurrentYDL(YDL):
+            def __init__(self, *args, **kwargs):
+                super(ConcurrentYDL, self).__init__(*args, **kwargs)
+                self.lock = threading.Lock()
+                self.active = self.max_active = 0
+
+            def process_info(self, info_dict):
+                with self.lock:
+                    self.active += 1
+                    self.max_active = max(self.max_active, self.active)
+                time.sleep(0.05)
+                with self.lock:
+                    self.active -= 1
+                super(ConcurrentYDL, self).process_info(info_dict)
+
+        ydl = ConcurrentYDL({'playlist_workers': 4, 'playlistreverse': True})
+        res = ydl.process_ie_result(copy.deepcopy(playlist))
+        self.assertEqual([e['id'] for e in res['entries']], [compat_str(i) for i in range(8, 0, -1)])
+        self.assertEqual(
+            sorted((int(info['id']), info['playlist_index']) for info in ydl.downloaded_info_dicts),
+            [(i, 9 - i) for i in range(1, 9)])
+        self.assertTrue(1 < ydl.max_active <= 4)
+
+        ydl = ConcurrentYDL({
+            'playlist_workers': 4,
+            'rejecttitle': '^2$',
+        })
+        res = ydl.process_ie_result(copy.deepcopy(playlist))
+        self.assertEqual([e['id'] for e in res['entries']], ['1', '3', '4', '5', '6', '7', '8'])
+
+    def test_playlist_workers_max_downloads(self):
+        entries = [{
+            'id': compat_str(i),
+            'title': compat_str(i),
+            'url': TEST_URL,
+        } for i in range(1, 9)]
+        playlist = {
+            '_type': 'playlist',
+            'id': 'test',
+            'entries': entries,
+            'extractor': 'test:playlist',
+            'extractor_key': 'test:playlist',
+            'webpage_url': 'http://example.com',
+        }
+
+        ydl = FakeYDL({
+            'playlist_workers': 4,
+            'max_downloads': 3,
+            'simulate': True,
+            'forceid': True,
+            'outtmpl': '%(autonumber)s.%(ext)s',
+        })
+        ids = []
+        ydl.to_stdout = lambda msg, *args, **kwargs: ids.append(msg)
+        self.assertRaises(MaxDownloadsReached, ydl.process_ie_result, copy.deepcopy(playlist))
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(ydl._num_downloads, 3)
+
+    def test_concurrent_formats(self):
+        ydl = YDL()
+        statuses = []
+        ydl.add_progress_hook(statuses.append)
+        lock = threading.Lock()
+        started = []
+        both_started = threading.Event()
+
+        def dl(name, info, progress_hooks):
+            with lock:
+                started.append(name)
+                if len(started) == 2:
+                    both_started.set()
+            # Both formats are downloaded at the same time
+            self.assertTrue(both_started.wait(5))
+            size = info['filesize']
+            for ph in progress_hooks:
+                ph({'status': 'downloading', 'filename': name, 'downloaded_bytes': size // 2, 'total_bytes': size, 'speed': 10})
+            if info['format_id'] == 'broken':
+                raise DownloadError('broken')
+            for ph in progress_hooks:
+                ph({'status': 'finished', 'filename': name, 'downloaded_bytes': size, 'total_bytes': size})
+            return info['format_id'] == 'video'
+
+        results = ydl._download_formats_concurrently([
+            ('video.fvideo.mp4', {'format_id': 'video', 'filesize': 1000}),
+            ('video.faudio.m4a', {'format_id': 'audio', 'filesize': 200}),
+        ], dl)
+        self.assertEqual(results, [True, False])
+        self.assertEqual(len(statuses), 4)
+        for status in statuses:
+            self.assertEqual(status['component_index'], 1 if status['filename'] == 'video.fvideo.mp4' else 2)
+            self.assertEqual(status['component_count'], 2)
+            # Unknown until both formats have reported their size
+            self.assertIn(status['aggregate_total_bytes'], (None, 1200))
+        self.assertEqual(statuses[-1]['aggregate_total_bytes'], 1200)
+        self.assertEqual(statuses[-1]['aggregate_downloaded_bytes'], 1200)
+        self.assertEqual(statuses[-1]['aggregate_speed'], 0)
+
+        del started[:]
+        del statuses[:]
+        both_started.clear()
+        self.assertRaises(DownloadError, ydl._download_formats_concurrently, [
+            ('video.fbroken.mp4', {'format_id': 'broken', 'filesize': 1000}),
+            ('video.faudio.m4a', {'format_id': 'audio', 'filesize': 200}),
+        ], dl)
+        # The other format is downloaded all the same
+        self.assertEqual(
+            [s['filename'] for s in statuses if s['status'] == 'finished'], ['video.faudio.m4a'])
+
+    def test_prefetch_entries(self):
+        extracted = []
+        instances = set()
+
+        class PrefetchIE(InfoExtractor):
+            _VALID_URL = r'prefetch:(?P<id>\d+)'
+
+            def _real_extract(self, url):
+                video_id = self._match_id(url)
+                self.to_screen('%s: Extracting' % video_id)
+                extracted.append((video_id, threading.current_thread().name))
+                instances.add((threading.current_thread().name, self))
+                # The information of the third video expires right away
+                expire = int(time.time()) + (0 if video_id == '3' else 3600)
+                return {
+                    'id': video_id,
+                    'title': video_id,
+                    'url': TEST_URL + '?expire=%d' % expire,
+                }
+
+        class PrefetchYDL(YDL):
+            to_screen = YoutubeDL.to_screen
+
+            def to_stdout(self, message, skip_eol=False, check_quiet=False):
+                self.msgs.append(message)
+
+            def process_info(self, info_dict):
+                self.msgs.append('download %s' % info_dict['id'])
+                time.sleep(0.05)
+                super(PrefetchYDL, self).process_info(info_dict)
+
+        ydl = PrefetchYDL({'prefetch_entries': 2})
+        ydl.add_info_extractor(PrefetchIE())
+        playlist = {
+            '_type': 'playlist',
+            'id': 'test',
+            'entries': [{
+                '_type': 'url',
+                'url': 'prefetch:%d' % i,
+                'ie_key': 'Prefetch',
+            } for i in range(1, 6)],
+            'extractor': 'test:playlist',
+            'extractor_key': 'test:playlist',
+            'webpage_url': 'http://example.com',
+        }
+        res = ydl.process_ie_result(playlist)
+        self.assertEqual([e['id'] for e in res['entries']], ['1', '2', '3', '4', '5'])
+        self.assertEqual([info['id'] for info in ydl.downloaded_info_dicts], ['1', '2', '3', '4', '5'])
+
+        main_thread = threading.current_thread().name
+        self.assertTrue(any(name != main_thread for _, name in extracted))
+        # The prefetcher does not share extractor instances with the main thread
+        shared_ie = ydl.get_info_extractor('Prefetch')
+        self.assertFalse(any(ie is shared_ie for name, ie in instances if name != main_thread))
+        # Expired information is extracted again
+        self.assertEqual([video_id for video_id, _ in extracted].count('3'), 2)
+
+        # Extraction output is shown in order, right before each download
+        msgs = [msg for msg in ydl.msgs if not msg.startswith('[download]')]
+        for i in range(1, 6):
+            idx = msgs.index('download %d' % i)
+            self.assertEqual(msgs[idx - 1], '[Prefetch] %d: Extracting' % i)
+        self.assertTrue('[info] 3: Prefetched information has expired, re-extracting' in msgs)
+
     def test_urlopen_no_file_protocol(self):
         # see https://github.com/rg3/youtube-dl/issues/8227
         ydl = YDL()
@@ -8,9 +8,20 @@ import sys
 import unittest
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from youtube_dl.aes import aes_decrypt, aes_encrypt, aes_cbc_decrypt, aes_cbc_encrypt, aes_decrypt_text
+from youtube_dl.aes import (
+    aes_decrypt,
+    aes_encrypt,
+    aes_cbc_decrypt,
+    aes_cbc_decrypt_bytes,
+    aes_cbc_encrypt,
+    aes_cbc_encrypt_bytes,
+    aes_ctr_decrypt_bytes,
+    aes_decrypt_text,
+    key_expansion,
+)
 from youtube_dl.utils import bytes_to_intlist, intlist_to_bytes
 import base64
+import binascii
 
 # the encrypted data can be generate with 'devscripts/generate_aes_testdata.py'
 
@@ -41,6 +52,35 @@ class TestAES(unittest.TestCase):
             encrypted,
             b"\x97\x92+\xe5\x0b\xc3\x18\x91ky9m&\xb3\xb5@\xe6'\xc2\x96.\xc8u\x88\xab9-[\x9e|\xf1\xcd")
 
+    def test_cbc_bytes(self):
+        data = b"\x97\x92+\xe5\x0b\xc3\x18\x91ky9m&\xb3\xb5@\xe6'\xc2\x96.\xc8u\x88\xab9-[\x9e|\xf1\xcd"
+        key = iv = intlist_to_bytes(self.key)
+        for wrap in (bytes, bytearray, memoryview):
+            decrypted = aes_cbc_decrypt_bytes(wrap(data), wrap(key), wrap(iv))
+            self.assertEqual(decrypted.rstrip(b'\x08'), self.secret_msg)
+            self.assertEqual(aes_cbc_encrypt_bytes(wrap(self.secret_msg), wrap(key), wrap(iv)), data)
+
+    def test_ctr_bytes(self):
+        # NIST SP 800-38A, F.5.1
+        key = binascii.unhexlify('2b7e151628aed2a6abf7158809cf4f3c')
+        iv = binascii.unhexlify('f0f1f2f3f4f5f6f7f8f9fafbfcfdfeff')
+        data = binascii.unhexlify('874d6191b620e3261bef6864990db6ce9806f66b7970fdff8617187bb9fffdff')
+        self.assertEqual(
+            aes_ctr_decrypt_bytes(memoryview(data)[:27], key, iv),
+            binascii.unhexlify('6bc1bee22e409f96e93d7e117393172aae2d8a571e03ac9c9eb76f')[:27])
+
+    def test_key_sizes(self):
+        # FIPS-197, appendix C
+        plaintext = bytes_to_intlist(binascii.unhexlify('00112233445566778899aabbccddeeff'))
+        for key_size, ciphertext in (
+                (16, '69c4e0d86a7b0430d8cdb78070b4c55a'),
+                (24, 'dda97ca4864cdfe06eaf70a0ec0d7191'),
+                (32, '8ea2b7ca516745bfeafc49904b496089')):
+            expanded_key = key_expansion(list(range(key_size)))
+            encrypted = aes_encrypt(plaintext, expanded_key)
+            self.assertEqual(intlist_to_bytes(encrypted), binascii.unhexlify(ciphertext))
+            self.assertEqual(aes_decrypt(encrypted, expanded_key), plaintext)
+
     def test_decrypt_text(self):
         password = intlist_to_bytes(self.key).decode('utf-8')
         encrypted = base64.b64encode(
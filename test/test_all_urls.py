@@ -14,9 +14,11 @@ from test.helper import gettestcases
 
 from youtube_dl.extractor import (
     FacebookIE,
+    gen_extractor_classes,
     gen_extractors,
     YoutubeIE,
 )
+from youtube_dl.extractor.urlindex import build_url_index, url_tokens
 
 
 class TestAllURLsMatching(unittest.TestCase):
@@ -97,6 +99,22 @@ class TestAllURLsMatching(unittest.TestCase):
                         ie.suitable(url),
                         '%s should not match URL %r . That URL belongs to %s.' % (type(ie).__name__, url, tc['name']))
 
+    def test_url_index(self):
+        classes = gen_extractor_classes()
+        index, unindexed = build_url_index(classes)
+        self.assertTrue(len(unindexed) < len(classes) // 10)
+
+        positions = dict((ie.ie_key(), i) for i, ie in enumerate(classes))
+        for tc in gettestcases(include_onlymatching=True):
+            url = tc['url']
+            candidates = set(positions[ie_key] for ie_key in unindexed)
+            for token in url_tokens(url):
+                candidates.update(positions[ie_key] for ie_key in index.get(token, ()))
+            self.assertEqual(
+                [ie.ie_key() for ie in classes if ie.suitable(url)],
+                [classes[i].ie_key() for i in sorted(candidates) if classes[i].suitable(url)],
+                'URL index does not preserve the extractors matching %r' % url)
+
     def test_keywords(self):
         self.assertMatch(':ytsubs', ['youtube:subscriptions'])
         self.assertMatch(':ytsubscriptions', ['youtube:subscriptions'])
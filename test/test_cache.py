@@ -3,7 +3,10 @@
 
 from __future__ import unicode_literals
 
+import json
 import shutil
+import threading
+import time
 
 # Allow direct execution
 import os
@@ -13,7 +16,10 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
 from test.helper import FakeYDL
+from test.test_http import http_server_port
 from youtube_dl.cache import Cache
+from youtube_dl.compat import compat_http_server
+from youtube_dl.extractor.common import InfoExtractor
 
 
 def _is_empty(d):
@@ -54,6 +60,184 @@ class TestCache(unittest.TestCase):
         self.assertFalse(os.path.exists(self.test_dir))
         self.assertEqual(c.load('test_cache', 'k.'), None)
 
+    def test_ttl(self):
+        ydl = FakeYDL({
+            'cachedir': self.test_dir,
+        })
+        c = Cache(ydl)
+        c.store('test_cache', 'k', [1], ttl=60)
+        c.store('test_cache', 'expired', [2], ttl=-1)
+        self.assertEqual(c.load('test_cache', 'k'), [1])
+        self.assertEqual(c.load('test_cache', 'expired'), None)
+        # Expired entries are removed
+        self.assertEqual(os.listdir(os.path.join(self.test_dir, 'test_cache')), ['k.json'])
+
+    def test_memo(self):
+        ydl = FakeYDL({
+            'cachedir': self.test_dir,
+        })
+        c = Cache(ydl)
+        c.store('test_cache', 'k', {'x': [1]})
+        obj = c.load('test_cache', 'k')
+        obj['x'].append(2)
+        self.assertEqual(c.load('test_cache', 'k'), {'x': [1]})
+        # Changes by other processes are picked up
+        Cache(FakeYDL({'cachedir': self.test_dir})).store('test_cache', 'k', {'x': [3]})
+        self.assertEqual(c.load('test_cache', 'k'), {'x': [3]})
+        with open(os.path.join(self.test_dir, 'test_cache', 'k.json'), 'w') as f:
+            f.write('{"x": [4, 5]}')
+        self.assertEqual(c.load('test_cache', 'k'), {'x': [4, 5]})
+
+    def test_max_size(self):
+        ydl = FakeYDL({
+            'cachedir': self.test_dir,
+            'cache_max_size': 250,
+        })
+        c = Cache(ydl)
+        data = 'x' * 95
+        c.store('test_cache', 'a', data)
+        c.store('test_cache2', 'b', data)
+        # Make sure the access times differ
+        time.sleep(0.01)
+        self.assertEqual(c.load('test_cache', 'a'), data)
+        c.store('test_cache', 'c', data)
+        # b is the least recently used entry
+        self.assertEqual(c.load('test_cache2', 'b'), None)
+        self.assertEqual(c.load('test_cache', 'a'), data)
+        self.assertEqual(c.load('test_cache', 'c'), data)
+
+        # The cache directory is only walked when it may exceed the limit
+        walks = []
+        evict = c._evict
+        c._evict = lambda max_size: walks.append(max_size) or evict(max_size)
+        c.store('test_cache', 'a', 'x')
+        c.store('test_cache', 'd', data)
+        self.assertEqual(walks, [])
+        c.store('test_cache', 'e', data)
+        self.assertEqual(walks, [250])
+        self.assertEqual(c.load('test_cache', 'c'), None)
+
+
+class HTTPCacheTestRequestHandler(compat_http_server.BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get('If-None-Match')))
+        if self.path == '/fresh':
+            self.send_response(200)
+            self.send_header('Cache-Control', 'max-age=60')
+            self.end_headers()
+            self.wfile.write(('fresh %d' % len(self.server.requests)).encode('utf-8'))
+        elif self.path == '/etag':
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('ETag', '"v1"')
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'n': len(self.server.requests)}).encode('utf-8'))
+        elif self.path == '/cookie':
+            self.send_response(200)
+            self.send_header('Cache-Control', 'max-age=60')
+            self.send_header('Set-Cookie', 'session=abc; Path=/')
+            self.end_headers()
+            self.wfile.write(('cookie %s' % self.headers.get('Cookie')).encode('utf-8'))
+        elif self.path == '/no-store':
+            self.send_response(200)
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            self.wfile.write(b'no-store')
+        else:
+            assert False
+
+
+class HTTPCacheTestIE(InfoExtractor):
+    pass
+
+
+class TestHTTPResponseCache(unittest.TestCase):
+    def setUp(self):
+        TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+        self.test_dir = os.path.join(TEST_DIR, 'testdata', 'http_cache_test')
+        self.tearDown()
+        self.httpd = compat_http_server.HTTPServer(
+            ('127.0.0.1', 0), HTTPCacheTestRequestHandler)
+        self.httpd.requests = []
+        self.base_url = 'http://127.0.0.1:%d' % http_server_port(self.httpd)
+        server_thread = threading.Thread(target=self.httpd.serve_forever)
+        server_thread.daemon = True
+        server_thread.start()
+
+    def tearDown(self):
+        if hasattr(self, 'httpd'):
+            self.httpd.shutdown()
+            self.httpd.server_close()
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def _ie(self, **params):
+        ydl_params = {
+            'cachedir': self.test_dir,
+            'http_cache': True,
+        }
+        ydl_params.update(params)
+        return HTTPCacheTestIE(FakeYDL(ydl_params))
+
+    def test_fresh(self):
+        ie = self._ie()
+        self.assertEqual(ie._download_webpage(self.base_url + '/fresh', None), 'fresh 1')
+        self.assertEqual(ie._download_webpage(self.base_url + '/fresh', None), 'fresh 1')
+        # Other processes share the cache
+        self.assertEqual(self._ie()._download_webpage(self.base_url + '/fresh', None), 'fresh 1')
+        self.assertEqual(len(self.httpd.requests), 1)
+        self.assertEqual(
+            ie._downloader.http_cache.format_stats(),
+            ['HTTPCacheTest: 1 hits, 0 revalidated, 1 misses (50% served from cache)'])
+        # Requests with a body or credentials always go to the network
+        ie._download_webpage(self.base_url + '/fresh', None, headers={'Authorization': 'Basic eDp5'})
+        self._ie(username='user')._download_webpage(self.base_url + '/fresh', None)
+        self.assertEqual(len(self.httpd.requests), 3)
+
+    def test_revalidation(self):
+        ie = self._ie()
+        self.assertEqual(ie._download_json(self.base_url + '/etag', None), {'n': 1})
+        self.assertEqual(ie._download_json(self.base_url + '/etag', None), {'n': 1})
+        self.assertEqual(self.httpd.requests, [('/etag', None), ('/etag', '"v1"')])
+        self.assertEqual(
+            ie._downloader.http_cache.format_stats(),
+            ['HTTPCacheTest: 0 hits, 1 revalidated, 1 misses (50% served from cache)'])
+
+    def test_not_cached(self):
+        ie = self._ie()
+        ie._download_webpage(self.base_url + '/no-store', None)
+        ie._download_webpage(self.base_url + '/no-store', None)
+        self._ie(http_cache=False)._download_webpage(self.base_url + '/fresh', None)
+        self._ie(http_cache=False)._download_webpage(self.base_url + '/fresh', None)
+        self.assertEqual(len(self.httpd.requests), 4)
+        self.assertFalse(os.path.exists(os.path.join(self.test_dir, 'http-responses')))
+
+    def test_cookies(self):
+        url = self.base_url + '/cookie'
+        self.assertEqual(self._ie()._download_webpage(url, None), 'cookie None')
+        # The cookies set by a cached response end up in the cookie jar
+        ie = self._ie()
+        self.assertEqual(ie._download_webpage(url, None), 'cookie None')
+        self.assertEqual(len(self.httpd.requests), 1)
+        self.assertEqual([c.value for c in ie._downloader.cookiejar], ['abc'])
+        # Responses to requests with other cookies are not reused
+        self.assertEqual(ie._download_webpage(url, None), 'cookie session=abc')
+        self.assertEqual(len(self.httpd.requests), 2)
+
+    def test_max_age(self):
+        ie = self._ie(http_cache_max_age=0)
+        ie._download_webpage(self.base_url + '/fresh', None)
+        ie._download_webpage(self.base_url + '/fresh', None)
+        self.assertEqual(len(self.httpd.requests), 2)
+
 
 if __name__ == '__main__':
     unittest.main()
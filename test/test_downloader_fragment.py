@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# coding: utf-8
+from __future__ import unicode_literals
+
+# Allow direct execution
+import binascii
+import os
+import random
+import re
+import sys
+import time
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from test.helper import try_rm
+from youtube_dl import YoutubeDL
+from youtube_dl.aes import aes_cbc_encrypt_bytes
+from youtube_dl.compat import compat_http_server, compat_struct_pack
+from youtube_dl.downloader import get_suitable_downloader
+from youtube_dl.downloader.dash import DashSegmentsFD
+from youtube_dl.downloader.external import FFmpegFD
+from youtube_dl.downloader.hls import HlsFD
+import threading
+
+try:
+    import socketserver
+except ImportError:  # Python 2
+    import SocketServer as socketserver
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+FRAGMENT_COUNT = 20
+
+HLS_KEY = b'0123456789abcdef'
+HLS_IV = b'fedcba9876543210'
+HLS_MEDIA_SEQUENCE = 7
+
+
+def fragment_data(index):
+    return ('fragment %03d;' % index).encode('ascii') * 100
+
+
+def hls_iv(index):
+    # The second half of the fragments uses IVs derived from the media sequence
+    if index < FRAGMENT_COUNT // 2:
+        return HLS_IV
+    return compat_struct_pack('>8xq', HLS_MEDIA_SEQUENCE + index)
+
+
+def live_manifest(request_index):
+    # The window of three fragments moves every other refresh
+    first = request_index // 2
+    last = min(first + 3, FRAGMENT_COUNT)
+    lines = [
+        '#EXTM3U',
+        '#EXT-X-TARGETDURATION:0.05',
+        '#EXT-X-MEDIA-SEQUENCE:%d' % first,
+    ]
+    for i in range(first, last):
+        lines.extend(['#EXTINF:0.05,', 'frag/%d' % i])
+    if last == FRAGMENT_COUNT:
+        lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines).encode('utf-8')
+
+
+def hls_manifest():
+    lines = [
+        '#EXTM3U',
+        '#EXT-X-MEDIA-SEQUENCE:%d' % HLS_MEDIA_SEQUENCE,
+        '#EXT-X-KEY:METHOD=AES-128,URI="key",IV=0x%s' % binascii.hexlify(HLS_IV).decode('ascii'),
+    ]
+    for i in range(FRAGMENT_COUNT):
+        if i == FRAGMENT_COUNT // 2:
+            lines.append('#EXT-X-KEY:METHOD=AES-128,URI="key"')
+        lines.extend(['#EXTINF:1.0,', 'frag/%d' % i])
+    lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines).encode('utf-8')
+
+
+class HTTPTestRequestHandler(compat_http_server.BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_data(self, data):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/hls/manifest.m3u8':
+            return self.send_data(hls_manifest())
+        if self.path == '/live/manifest.m3u8':
+            self.server.live_requests += 1
+            return self.send_data(live_manifest(self.server.live_requests - 1))
+        if self.path == '/hls/key':
+            self.server.key_requests += 1
+            return self.send_data(HLS_KEY)
+        mobj = re.match(r'^(/hls|/live)?/frag/(\d+)$', self.path)
+        if not mobj:
+            assert False
+        index = int(mobj.group(2))
+        if index in self.server.unavailable:
+            self.send_response(404)
+            self.end_headers()
+            return
+        # Make later fragments finish before earlier ones every now and then
+        time.sleep(random.random() * 0.02)
+        data = fragment_data(index)
+        if mobj.group(1) == '/hls':
+            data = aes_cbc_encrypt_bytes(data, HLS_KEY, hls_iv(index))
+        self.send_response(200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, compat_http_server.HTTPServer):
+    daemon_threads = True
+
+
+class FakeLogger(object):
+    def debug(self, msg):
+        pass
+
+    def warning(self, msg):
+        pass
+
+    def error(self, msg):
+        pass
+
+
+class FragmentServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.httpd = ThreadingHTTPServer(
+            ('localhost', 0), HTTPTestRequestHandler)
+        self.httpd.unavailable = set()
+        self.httpd.key_requests = 0
+        self.httpd.live_requests = 0
+        self.port = self.httpd.socket.getsockname()[1]
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+        self.filename = os.path.join(TEST_DIR, 'testfragments.mp4')
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        try_rm(self.filename)
+
+
+class TestFragmentDownloader(FragmentServerTestCase):
+    def download(self, params):
+        ydl = YoutubeDL(dict({'logger': FakeLogger()}, **params))
+        fd = DashSegmentsFD(ydl, dict(ydl.params, **params))
+        info_dict = {
+            'url': 'http://localhost:%d/manifest.mpd' % self.port,
+            'fragment_base_url': 'http://localhost:%d/frag/' % self.port,
+            'fragments': [{'path': '%d' % i} for i in range(FRAGMENT_COUNT)],
+        }
+        return fd.download(self.filename, info_dict)
+
+    def expected_fragment(self, index):
+        return fragment_data(index)
+
+    def expected_content(self, skipped=()):
+        return b''.join(
+            self.expected_fragment(i) for i in range(FRAGMENT_COUNT) if i not in skipped)
+
+    def assert_downloaded(self, expected):
+        self.assertTrue(os.path.isfile(self.filename))
+        with open(self.filename, 'rb') as f:
+            self.assertEqual(f.read(), expected)
+        self.assertFalse(os.path.exists(self.filename + '.ytdl'))
+        self.assertFalse(any(
+            fn.startswith('testfragments.mp4.part-Frag') for fn in os.listdir(TEST_DIR)))
+
+    def test_sequential(self):
+        self.assertTrue(self.download({}))
+        self.assert_downloaded(self.expected_content())
+
+    def test_concurrent(self):
+        self.assertTrue(self.download({'concurrent_fragment_downloads': 4}))
+        self.assert_downloaded(self.expected_content())
+
+    def test_keep_fragments(self):
+        self.assertTrue(self.download({
+            'concurrent_fragment_downloads': 4,
+            'keep_fragments': True,
+        }))
+        frag_filenames = [
+            os.path.join(TEST_DIR, 'testfragments.mp4.part-Frag%d' % i)
+            for i in range(FRAGMENT_COUNT)]
+        try:
+            for i, frag_filename in enumerate(frag_filenames):
+                with open(frag_filename, 'rb') as f:
+                    self.assertEqual(f.read(), fragment_data(i))
+        finally:
+            for frag_filename in frag_filenames:
+                try_rm(frag_filename)
+        self.assert_downloaded(self.expected_content())
+
+    def test_concurrent_skip_unavailable(self):
+        self.httpd.unavailable = set([3, 11])
+        self.assertTrue(self.download({
+            'concurrent_fragment_downloads': 4,
+            'fragment_retries': 1,
+        }))
+        self.assert_downloaded(self.expected_content(skipped=(3, 11)))
+
+    def test_concurrent_abort_unavailable(self):
+        self.httpd.unavailable = set([5])
+        self.assertFalse(self.download({
+            'concurrent_fragment_downloads': 4,
+            'fragment_retries': 0,
+            'skip_unavailable_fragments': False,
+            'ignoreerrors': True,
+        }))
+        # Only the fragments before the unavailable one are appended and the
+        # resume index points right after them
+        with open(self.filename + '.part', 'rb') as f:
+            self.assertEqual(f.read(), b''.join(self.expected_fragment(i) for i in range(5)))
+        with open(self.filename + '.ytdl') as f:
+            self.assertIn('"index": 5', f.read())
+
+        self.httpd.unavailable = set()
+        self.assertTrue(self.download({'concurrent_fragment_downloads': 4}))
+        self.assert_downloaded(self.expected_content())
+
+
+class TestHlsDecryption(TestFragmentDownloader):
+    def download(self, params):
+        ydl = YoutubeDL(dict({'logger': FakeLogger()}, **params))
+        fd = HlsFD(ydl, dict(ydl.params, **params))
+        self.httpd.key_requests = 0
+        info_dict = {
+            'url': 'http://localhost:%d/hls/manifest.m3u8' % self.port,
+        }
+        return fd.download(self.filename, info_dict)
+
+    def expected_fragment(self, index):
+        # Decrypted fragments keep their PKCS#7 padding
+        data = fragment_data(index)
+        padding = 16 - len(data) % 16
+        return data + compat_struct_pack('B', padding) * padding
+
+    def assert_downloaded(self, expected):
+        super(TestHlsDecryption, self).assert_downloaded(expected)
+        # The key is shared by all the fragments
+        self.assertEqual(self.httpd.key_requests, 1)
+
+    def test_keep_fragments(self):
+        # Fragments kept on disk are decrypted once they are read back
+        self.assertTrue(self.download({'keep_fragments': True}))
+        for i in range(FRAGMENT_COUNT):
+            try_rm(os.path.join(TEST_DIR, 'testfragments.mp4.part-Frag%d' % i))
+        self.assert_downloaded(self.expected_content())
+
+
+class TestHlsLive(FragmentServerTestCase):
+    def download(self, params):
+        ydl = YoutubeDL(dict({'logger': FakeLogger()}, **params))
+        fd = HlsFD(ydl, dict(ydl.params, **params))
+        return fd.download(self.filename, {
+            'url': 'http://localhost:%d/live/manifest.m3u8' % self.port,
+            'is_live': True,
+        })
+
+    def assert_captured(self):
+        with open(self.filename, 'rb') as f:
+            self.assertEqual(f.read(), b''.join(fragment_data(i) for i in range(FRAGMENT_COUNT)))
+        # The playlist is refreshed until it ends
+        self.assertEqual(self.httpd.live_requests, 2 * (FRAGMENT_COUNT - 3) + 1)
+
+    def test_sequential(self):
+        self.assertTrue(self.download({}))
+        self.assert_captured()
+
+    def test_concurrent(self):
+        self.assertTrue(self.download({'concurrent_fragment_downloads': 4}))
+        self.assert_captured()
+
+    def test_suitable_downloader(self):
+        info_dict = {
+            'url': 'http://localhost:%d/live/manifest.m3u8' % self.port,
+            'protocol': 'm3u8_native',
+            'is_live': True,
+        }
+        self.assertEqual(get_suitable_downloader(info_dict, {}), FFmpegFD)
+        self.assertEqual(get_suitable_downloader(info_dict, {'hls_prefer_native': True}), HlsFD)
+
+
+@unittest.skipIf(sys.version_info < (3, 5), 'asyncio engine requires Python 3.5+')
+class TestAsyncFragmentDownloader(TestFragmentDownloader):
+    def download(self, params):
+        return super(TestAsyncFragmentDownloader, self).download(
+            dict(params, fragment_engine='asyncio', proxy=''))
+
+
+@unittest.skipIf(sys.version_info < (3, 5), 'asyncio engine requires Python 3.5+')
+class TestAsyncHlsDecryption(TestHlsDecryption):
+    def download(self, params):
+        return super(TestAsyncHlsDecryption, self).download(
+            dict(params, fragment_engine='asyncio', proxy=''))
+
+    def test_many_streams(self):
+        # Concurrent downloads share the event loop
+        filenames = [self.filename + '.%d' % i for i in range(4)]
+        results = []
+
+        def download(filename):
+            params = {'logger': FakeLogger(), 'fragment_engine': 'asyncio', 'proxy': ''}
+            fd = HlsFD(YoutubeDL(params), params)
+            results.append(fd.download(filename, {
+                'url': 'http://localhost:%d/hls/manifest.m3u8' % self.port,
+            }))
+
+        threads = [threading.Thread(target=download, args=(fn,)) for fn in filenames]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(results, [True] * 4)
+            for filename in filenames:
+                with open(filename, 'rb') as f:
+                    self.assertEqual(f.read(), self.expected_content())
+        finally:
+            for filename in filenames:
+                try_rm(filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
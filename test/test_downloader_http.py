@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# coding: utf-8
+from __future__ import unicode_literals
+
+# Allow direct execution
+import json
+import os
+import re
+import sys
+import time
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from test.helper import try_rm
+from youtube_dl import YoutubeDL
+from youtube_dl.compat import compat_http_server
+from youtube_dl.compat import compat_urllib_error
+from youtube_dl.downloader.http import HttpFD
+from youtube_dl.downloader.retry import RetryPolicy
+import threading
+
+try:
+    import socketserver
+except ImportError:  # Python 2
+    import SocketServer as socketserver
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TEST_SIZE = 100 * 1024
+TEST_DATA = b''.join(('%05d,' % i).encode('ascii') for i in range(TEST_SIZE // 6)) + b'x' * (TEST_SIZE % 6)
+
+
+class HTTPTestRequestHandler(compat_http_server.BaseHTTPRequestHandler):
+    # Chunked transfer encoding requires HTTP/1.1
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        start, end = 0, TEST_SIZE - 1
+        mobj = re.match(r'bytes=(\d+)-(\d+)?', self.headers.get('Range') or '')
+        if mobj and self.path == '/range':
+            self.server.ranges.append(self.headers['Range'])
+            if len(self.server.ranges) in self.server.failing_requests:
+                self.send_response(503)
+                if self.server.retry_after is not None:
+                    self.send_header('Retry-After', self.server.retry_after)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            start = int(mobj.group(1))
+            if mobj.group(2):
+                end = min(int(mobj.group(2)), end)
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, end, TEST_SIZE))
+        else:
+            self.send_response(200)
+        data = TEST_DATA[start:end + 1]
+        self.send_header('Content-Type', 'video/mp4')
+        if self.path == '/chunked':
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for i in range(0, len(data), 1000):
+                chunk = data[i:i + 1000]
+                self.wfile.write(('%x\r\n' % len(chunk)).encode('ascii') + chunk + b'\r\n')
+            self.wfile.write(b'0\r\n\r\n')
+        else:
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, compat_http_server.HTTPServer):
+    daemon_threads = True
+
+
+class FakeLogger(object):
+    def debug(self, msg):
+        pass
+
+    def warning(self, msg):
+        pass
+
+    def error(self, msg):
+        pass
+
+
+class TestHttpFD(unittest.TestCase):
+    def setUp(self):
+        self.httpd = ThreadingHTTPServer(
+            ('localhost', 0), HTTPTestRequestHandler)
+        self.httpd.ranges = []
+        self.httpd.failing_requests = set()
+        self.httpd.retry_after = None
+        self.port = self.httpd.socket.getsockname()[1]
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+        self.filename = os.path.join(TEST_DIR, 'testhttp.mp4')
+        self.tearDown_files()
+
+    def tearDown_files(self):
+        try_rm(self.filename)
+        try_rm(self.filename + '.part')
+        try_rm(self.filename + '.ytdl')
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.tearDown_files()
+
+    def download(self, path, params):
+        ydl = YoutubeDL(dict({'logger': FakeLogger()}, **params))
+        fd = HttpFD(ydl, dict(ydl.params, **params))
+        fd._MIN_SEGMENT_SIZE = 1000
+        statuses = []
+        fd.add_progress_hook(lambda s: statuses.append(s['status']))
+        self.assertTrue(fd.download(self.filename, {
+            'url': 'http://localhost:%d%s' % (self.port, path),
+        }))
+        with open(self.filename, 'rb') as f:
+            self.assertEqual(f.read(), TEST_DATA)
+        return statuses
+
+    def test_fixed_block_size(self):
+        for path in ('/regular', '/chunked'):
+            statuses = self.download(path, {
+                'buffersize': 1000,
+                'noresizebuffer': True,
+                'progress_rate': 0,
+            })
+            # Every block is reported without a progress rate
+            self.assertEqual(statuses.count('downloading'), (TEST_SIZE + 999) // 1000)
+            self.assertEqual(statuses[-1], 'finished')
+            try_rm(self.filename)
+
+    def test_progress_rate(self):
+        statuses = self.download('/regular', {
+            'buffersize': 1000,
+            'noresizebuffer': True,
+            'progress_rate': 0.001,
+        })
+        # Only the first block is reported within the first 1000 seconds
+        self.assertEqual(statuses, ['downloading', 'finished'])
+
+    def test_resume(self):
+        with open(self.filename + '.part', 'wb') as f:
+            f.write(TEST_DATA[:12345])
+        self.download('/range', {'continuedl': True})
+
+    def test_segmented(self):
+        self.download('/range', {'http_connections': 4})
+        quarter = TEST_SIZE // 4
+        self.assertEqual(self.httpd.ranges[0], 'bytes=0-0')
+        self.assertEqual(sorted(self.httpd.ranges[1:]), sorted(
+            'bytes=%d-%d' % (i * quarter, (i + 1) * quarter - 1) for i in range(4)))
+        self.assertFalse(os.path.exists(self.filename + '.ytdl'))
+
+    def test_segmented_retry(self):
+        self.httpd.failing_requests = set([2])
+        self.download('/range', {'http_connections': 2, 'retries': 1})
+        self.assertEqual(len(self.httpd.ranges), 4)
+
+    def test_segmented_resume(self):
+        half = TEST_SIZE // 2
+        with open(self.filename + '.part', 'wb') as f:
+            f.write(TEST_DATA[:100] + b'\0' * (half - 100) + TEST_DATA[half:half + 200] + b'\0' * (TEST_SIZE - half - 200))
+        with open(self.filename + '.ytdl', 'w') as f:
+            json.dump({'downloader': {'segments': {
+                'total_bytes': TEST_SIZE,
+                'ranges': [[0, half - 1, 100], [half, TEST_SIZE - 1, 200]],
+            }}}, f)
+        self.download('/range', {'http_connections': 2})
+        self.assertEqual(sorted(self.httpd.ranges[1:]), [
+            'bytes=100-%d' % (half - 1), 'bytes=%d-%d' % (half + 200, TEST_SIZE - 1)])
+
+    def test_segmented_fallback(self):
+        # Servers ignoring ranges get a single connection
+        self.download('/regular', {'http_connections': 4})
+        # So do downloads started with a single connection
+        with open(self.filename + '.part', 'wb') as f:
+            f.write(TEST_DATA[:12345])
+        try_rm(self.filename)
+        self.download('/range', {'http_connections': 4})
+        self.assertEqual(self.httpd.ranges, ['bytes=12345-'])
+
+    def test_retry_after(self):
+        self.httpd.failing_requests = set([2])
+        self.httpd.retry_after = '1'
+        start = time.time()
+        self.download('/range', {'http_connections': 2, 'retries': 1, 'retry_backoff': 0})
+        self.assertGreaterEqual(time.time() - start, 1)
+
+    def test_rate_limit(self):
+        # Limits are shared by all the downloads of the process
+        filenames = [self.filename + '.%d' % i for i in range(2)]
+        params = {'ratelimit': 200000, 'buffersize': 4096, 'logger': FakeLogger()}
+        results = []
+
+        def download(filename):
+            fd = HttpFD(YoutubeDL(params), params)
+            results.append(fd.download(filename, {
+                'url': 'http://localhost:%d/regular' % self.port,
+            }))
+
+        threads = [threading.Thread(target=download, args=(fn,)) for fn in filenames]
+        start = time.time()
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.time() - start
+            self.assertEqual(results, [True, True])
+            for filename in filenames:
+                with open(filename, 'rb') as f:
+                    self.assertEqual(f.read(), TEST_DATA)
+        finally:
+            for filename in filenames:
+                try_rm(filename)
+        # Less the initial burst of a tenth of a second
+        self.assertGreaterEqual(elapsed, (2 * TEST_SIZE - 20000) / 200000.0 - 0.05)
+
+    def test_rate_limit_per_host(self):
+        start = time.time()
+        self.download('/regular', {'ratelimit_per_host': 150000, 'buffersize': 4096})
+        self.assertGreaterEqual(time.time() - start, (TEST_SIZE - 15000) / 150000.0 - 0.05)
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def http_error(self, code, headers={}):
+        return compat_urllib_error.HTTPError('http://example.com/', code, 'error', headers, None)
+
+    def test_backoff(self):
+        policy = RetryPolicy({'retry_backoff': 2, 'retry_max_delay': 5})
+        for _ in range(20):
+            self.assertTrue(0 <= policy.delay(1) <= 2)
+            self.assertTrue(0 <= policy.delay(2) <= 4)
+            self.assertTrue(0 <= policy.delay(10) <= 5)
+        self.assertEqual(RetryPolicy({'retry_backoff': 0}).delay(5), 0)
+
+    def test_retry_after(self):
+        policy = RetryPolicy({'retry_backoff': 0, 'retry_max_delay': 100})
+        self.assertEqual(policy.delay(1, self.http_error(503, {'Retry-After': '7'})), 7)
+        self.assertEqual(policy.delay(1, self.http_error(503, {'Retry-After': '1000'})), 100)
+        self.assertEqual(policy.delay(1, self.http_error(503, {'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})), 0)
+        self.assertEqual(policy.delay(1, self.http_error(503, {'Retry-After': 'soon'})), 0)
+
+    def test_circuit_breaker(self):
+        url = 'http://circuit-breaker.test/video.mp4'
+        policy = RetryPolicy({'circuit_breaker_threshold': 3, 'circuit_breaker_cooldown': 60})
+        self.assertFalse(policy.record_failure(url, self.http_error(404)))
+        self.assertFalse(policy.record_failure(url, self.http_error(503)))
+        self.assertFalse(policy.record_failure(url, self.http_error(429)))
+        self.assertEqual(policy.host_delay(url), 0)
+        self.assertTrue(policy.record_failure(url, self.http_error(500)))
+        self.assertTrue(59 < policy.host_delay(url) <= 60)
+        # Other hosts and downloads of other hosts are not affected
+        self.assertEqual(policy.host_delay('http://example.com/'), 0)
+        policy.record_success(url)
+        self.assertEqual(policy.host_delay(url), 0)
+        self.assertEqual(RetryPolicy({'circuit_breaker_threshold': 0}).host_delay(url), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
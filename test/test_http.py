@@ -170,5 +170,64 @@ class TestProxy(unittest.TestCase):
         self.assertEqual(response, 'normal: http://xn--fiq228c.tw/')
 
 
+class KeepAliveRequestHandler(compat_http_server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        payload = ('%s %d' % (self.path, self.client_address[1])).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        if self.path == '/close':
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(payload)
+        if self.path == '/drop':
+            # Drop the connection without telling the client
+            self.close_connection = True
+
+
+class TestKeepAlive(unittest.TestCase):
+    def setUp(self):
+        self.httpd = compat_http_server.HTTPServer(
+            ('localhost', 0), KeepAliveRequestHandler)
+        self.port = http_server_port(self.httpd)
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+
+    def fetch(self, ydl, path):
+        path, client_port = ydl.urlopen(
+            'http://localhost:%d%s' % (self.port, path)).read().decode('utf-8').split(' ')
+        return client_port
+
+    @unittest.skipIf(sys.version_info < (3, 0), 'Persistent connections require Python 3')
+    def test_connection_reuse(self):
+        ydl = YoutubeDL({'logger': FakeLogger()})
+        pool = ydl._connection_pool
+        ports = [self.fetch(ydl, '/%d' % i) for i in range(3)]
+        self.assertEqual(len(set(ports)), 1)
+        self.assertEqual((pool.hits, pool.misses), (2, 1))
+
+        # Connection: close responses are not pooled
+        self.fetch(ydl, '/close')
+        self.assertNotEqual(self.fetch(ydl, '/'), ports[0])
+
+    @unittest.skipIf(sys.version_info < (3, 0), 'Persistent connections require Python 3')
+    def test_stale_connection(self):
+        ydl = YoutubeDL({'logger': FakeLogger()})
+        first_port = self.fetch(ydl, '/drop')
+        # The pooled connection has been closed by the server
+        self.assertNotEqual(self.fetch(ydl, '/'), first_port)
+
+    def test_disabled(self):
+        ydl = YoutubeDL({'logger': FakeLogger(), 'keep_alive_connections': 0})
+        self.assertNotEqual(self.fetch(ydl, '/'), self.fetch(ydl, '/'))
+        self.assertEqual(ydl._connection_pool.hits, 0)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -112,6 +112,26 @@ class TestJSInterpreter(unittest.TestCase):
         ''')
         self.assertEqual(jsi.call_function('z'), 5)
 
+    def test_repeated_calls(self):
+        jsi = JSInterpreter('function f(a){var x = [1, 2]; x[0] = (a) * 2; return x;}')
+        f = jsi.extract_function('f')
+        first = f([3])
+        self.assertEqual(first, [6, 2])
+        self.assertEqual(f([4]), [8, 2])
+        # Literals create a new object on every call
+        self.assertEqual(first, [6, 2])
+
+    def test_object_methods(self):
+        jsi = JSInterpreter('''
+        var Tx={VP:function(a){a.reverse()},
+        Bi:function(a,b){var c=a[0];a[0]=a[b%a.length];a[b%a.length]=c},
+        nK:function(a,b){a.splice(0,b)}};
+        function f(a){a=a.split("");Tx.Bi(a,3);Tx.nK(a,1);Tx.VP(a,2);return a.join("")}
+        ''')
+        f = jsi.extract_function('f')
+        self.assertEqual(f(['abcdef']), 'feacb')
+        self.assertEqual(f(['012345']), '54021')
+
 
 if __name__ == '__main__':
     unittest.main()
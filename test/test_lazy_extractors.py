@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+from __future__ import unicode_literals
+
+# Allow direct execution
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+import shutil
+import subprocess
+import tempfile
+
+from test.helper import gettestcases
+from youtube_dl.extractor import gen_extractor_classes
+from youtube_dl.extractor.common import InfoExtractor
+from youtube_dl.extractor.urlindex import build_url_index
+
+rootDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_lazy_extractors():
+    tmpdir = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(tmpdir, 'lazy_extractors.py')
+        with open(os.devnull, 'w') as devnull:
+            subprocess.check_call(
+                [sys.executable, 'devscripts/make_lazy_extractors.py', filename],
+                cwd=rootDir, stderr=devnull)
+        with io.open(filename, encoding='utf-8') as f:
+            source = f.read()
+    finally:
+        shutil.rmtree(tmpdir)
+    module_globals = {
+        '__name__': 'youtube_dl.extractor.lazy_extractors',
+        '__package__': 'youtube_dl.extractor',
+    }
+    exec(compile(source, 'lazy_extractors.py', 'exec'), module_globals)
+    return module_globals
+
+
+class TestLazyExtractors(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.lazy = load_lazy_extractors()
+        cls.classes = gen_extractor_classes()
+
+    def test_classes(self):
+        lazy_classes = self.lazy['_ALL_CLASSES']
+        self.assertEqual(
+            [ie.__name__ for ie in lazy_classes],
+            [ie.__name__ for ie in self.classes])
+        for lazy_ie, ie in zip(lazy_classes, self.classes):
+            self.assertEqual(lazy_ie.ie_key(), ie.ie_key())
+            # Attributes that are not part of the lazy class come from the
+            # real one
+            self.assertEqual(lazy_ie.IE_NAME, ie.IE_NAME)
+
+    def test_instances(self):
+        lazy_ie = self.lazy['YoutubeIE']
+        self.assertEqual(lazy_ie.extract_id('https://www.youtube.com/watch?v=BaW_jenozKc'), 'BaW_jenozKc')
+        self.assertEqual(type(lazy_ie()).__name__, 'YoutubeIE')
+        self.assertTrue(isinstance(lazy_ie(), InfoExtractor))
+
+    def test_suitable(self):
+        overridden = [
+            (self.lazy[ie.__name__], ie) for ie in self.classes
+            if ie.suitable.__func__ is not InfoExtractor.suitable.__func__]
+        for tc in gettestcases(include_onlymatching=True):
+            url = tc['url']
+            lazy_ie = self.lazy[tc['name'] + 'IE']
+            self.assertTrue(lazy_ie.suitable(url), '%s should match URL %r' % (lazy_ie.__name__, url))
+            for lazy_ie, ie in overridden:
+                self.assertEqual(
+                    lazy_ie.suitable(url), ie.suitable(url),
+                    'Lazy %s does not match URL %r like the real one' % (ie.__name__, url))
+
+    def test_url_index(self):
+        index, unindexed = build_url_index(self.classes)
+        self.assertEqual(self.lazy['_URL_INDEX'], dict((k, tuple(v)) for k, v in index.items()))
+        self.assertEqual(self.lazy['_URL_INDEX_UNINDEXED'], unindexed)
+
+
+if __name__ == '__main__':
+    unittest.main()
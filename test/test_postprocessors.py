@@ -3,15 +3,230 @@
 from __future__ import unicode_literals
 
 # Allow direct execution
+import functools
 import os
+import shutil
 import sys
+import tempfile
 import unittest
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from youtube_dl.postprocessor import MetadataFromTitlePP
+from youtube_dl import YoutubeDL
+from youtube_dl.postprocessor import (
+    FFmpegEmbedSubtitlePP,
+    FFmpegFixupStretchedPP,
+    FFmpegMergerPP,
+    FFmpegMetadataPP,
+    FFmpegPostProcessor,
+    MetadataFromTitlePP,
+)
+from youtube_dl.postprocessor.ffmpeg import _exe_registry
+
+
+FAKE_FFMPEG = '''#!/bin/sh
+echo "$@" >> "$(dirname "$0")/calls.log"
+case "$*" in
+*-version*) echo "ffmpeg version 4.1.3 Copyright (c) 2000-2019" ;;
+*-formats*) printf 'File formats:\\n D. = Demuxing supported\\n .E = Muxing supported\\n --\\n D  aac             raw ADTS AAC\\n  E mp4             MP4\\n DE matroska,webm   Matroska / WebM\\n' ;;
+*-codecs*) printf 'Codecs:\\n D..... = Decoding supported\\n -------\\n DEV.LS h264                 H.264\\n D.A.L. mp3                  MP3\\n' ;;
+*-protocols*) printf 'Supported file protocols:\\nInput:\\n  file\\n  http\\nOutput:\\n  file\\n' ;;
+esac
+'''
+
+# Concatenates its inputs instead of merging them
+FAKE_FFMPEG_MERGER = '''#!/bin/sh
+if [ "$1" = -version ]; then echo "ffmpeg version 4.1.3"; exit 0; fi
+if [ -e "$(dirname "$0")/fail" ]; then echo "Invalid data found" >&2; exit 1; fi
+inputs=
+while [ $# -gt 1 ]; do
+    if [ "$1" = -i ]; then shift; inputs="$inputs ${1#file:}"; fi
+    shift
+done
+cat $inputs > "${1#file:}"
+'''
+
+
+# Copies its first input and fails to combine a fix and metadata if asked to
+FAKE_FFMPEG_COPIER = '''#!/bin/sh
+echo "$@" >> "$(dirname "$0")/calls.log"
+if [ "$1" = -version ]; then echo "ffmpeg version 4.1.3"; exit 0; fi
+case "$*" in
+*-aspect*-metadata*) if [ -e "$(dirname "$0")/fail" ]; then echo "Conflicting options" >&2; exit 1; fi ;;
+esac
+while [ "$1" != -i ]; do shift; done
+input="${2#file:}"
+while [ $# -gt 1 ]; do shift; done
+cp "$input" "${1#file:}"
+'''
 
 
 class TestMetadataFromTitle(unittest.TestCase):
     def test_format_to_regex(self):
         pp = MetadataFromTitlePP(None, '%(title)s - %(artist)s')
         self.assertEqual(pp._titleregex, '(?P<title>.+)\ \-\ (?P<artist>.+)')
+
+
+@unittest.skipIf(os.name == 'nt', 'fake ffmpeg is a shell script')
+class TestFFmpegProbe(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.ffmpeg = os.path.join(self.tmpdir, 'ffmpeg')
+        with open(self.ffmpeg, 'w') as f:
+            f.write(FAKE_FFMPEG)
+        os.chmod(self.ffmpeg, 0o755)
+        self.cachedir = os.path.join(self.tmpdir, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def calls(self):
+        try:
+            with open(os.path.join(self.tmpdir, 'calls.log')) as f:
+                return f.read().splitlines()
+        except IOError:
+            return []
+
+    def ffpp(self, cachedir=False):
+        return FFmpegPostProcessor(YoutubeDL({
+            'ffmpeg_location': self.tmpdir,
+            'cachedir': cachedir,
+        }))
+
+    def test_memoized(self):
+        for _ in range(3):
+            ffpp = self.ffpp()
+            self.assertEqual(ffpp.basename, 'ffmpeg')
+            self.assertEqual(ffpp._versions['ffmpeg'], '4.1.3')
+            self.assertFalse(ffpp.probe_available)
+        self.assertEqual(self.calls(), ['-version'])
+
+        for _ in range(2):
+            ffpp = self.ffpp()
+            self.assertEqual(ffpp.get_capabilities('muxers'), ['mp4', 'matroska', 'webm'])
+            self.assertEqual(ffpp.get_capabilities('codecs'), {'h264': 'DE', 'mp3': 'D'})
+            self.assertEqual(ffpp.get_capabilities('protocols'), ['file', 'http'])
+        self.assertEqual(len(self.calls()), 4)
+
+        # An updated executable is probed again
+        mtime = os.stat(self.ffmpeg).st_mtime + 10
+        os.utime(self.ffmpeg, (mtime, mtime))
+        self.ffpp()
+        self.assertEqual(len(self.calls()), 5)
+
+    def test_persisted(self):
+        self.ffpp(self.cachedir).get_capabilities('protocols')
+        self.assertEqual(len(self.calls()), 2)
+        # A new process only reads the cache
+        _exe_registry._entries.clear()
+        ffpp = self.ffpp(self.cachedir)
+        self.assertEqual(ffpp._versions['ffmpeg'], '4.1.3')
+        self.assertEqual(ffpp.get_capabilities('protocols'), ['file', 'http'])
+        self.assertEqual(len(self.calls()), 2)
+
+
+@unittest.skipUnless(hasattr(os, 'mkfifo'), 'FIFOs are not supported')
+class TestStreamedMerge(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        ffmpeg = os.path.join(self.tmpdir, 'ffmpeg')
+        with open(ffmpeg, 'w') as f:
+            f.write(FAKE_FFMPEG_MERGER)
+        os.chmod(ffmpeg, 0o755)
+        self.merger = FFmpegMergerPP(YoutubeDL({
+            'ffmpeg_location': self.tmpdir,
+            'cachedir': False,
+            'quiet': True,
+        }))
+        self.filename = os.path.join(self.tmpdir, 'video.mp4')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def writer(self, data, result=True):
+        def download(path):
+            with open(path, 'wb') as f:
+                f.write(data)
+            return result
+        return download
+
+    def run_streamed(self, *writers):
+        paths = [os.path.join(self.tmpdir, 'video.f%d.mp4' % i) for i in range(len(writers))]
+        return self.merger.run_streamed(self.filename, [
+            (path, functools.partial(writer, path)) for path, writer in zip(paths, writers)])
+
+    def test_merge(self):
+        video = b'v' * 200000
+        self.assertTrue(self.run_streamed(self.writer(video), self.writer(b'audio')))
+        with open(self.filename, 'rb') as f:
+            self.assertEqual(f.read(), video + b'audio')
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ['ffmpeg', 'video.mp4'])
+
+    def test_download_failure(self):
+        self.assertFalse(self.run_streamed(self.writer(b'video', False), self.writer(b'audio')))
+        self.assertEqual(os.listdir(self.tmpdir), ['ffmpeg'])
+
+    def test_ffmpeg_failure(self):
+        open(os.path.join(self.tmpdir, 'fail'), 'w').close()
+        self.assertFalse(self.run_streamed(self.writer(b'video'), self.writer(b'audio')))
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ['fail', 'ffmpeg'])
+
+
+@unittest.skipIf(os.name == 'nt', 'fake ffmpeg is a shell script')
+class TestFusedStreamCopies(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        ffmpeg = os.path.join(self.tmpdir, 'ffmpeg')
+        with open(ffmpeg, 'w') as f:
+            f.write(FAKE_FFMPEG_COPIER)
+        os.chmod(ffmpeg, 0o755)
+        self.filename = os.path.join(self.tmpdir, 'video.mkv')
+        self.subtitles = os.path.join(self.tmpdir, 'video.en.vtt')
+        for fn in (self.filename, self.subtitles):
+            with open(fn, 'w') as f:
+                f.write('data')
+        self.ydl = YoutubeDL({
+            'ffmpeg_location': self.tmpdir,
+            'cachedir': False,
+            'quiet': True,
+        })
+        for pp in (FFmpegMetadataPP, FFmpegEmbedSubtitlePP):
+            self.ydl.add_post_processor(pp(self.ydl))
+        self.info = {
+            'id': 'video',
+            'ext': 'mkv',
+            'title': 'Video',
+            'stretched_ratio': 1.5,
+            'requested_subtitles': {'en': {'ext': 'vtt'}},
+            '__postprocessors': [FFmpegFixupStretchedPP(self.ydl)],
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def calls(self):
+        with open(os.path.join(self.tmpdir, 'calls.log')) as f:
+            return [call for call in f.read().splitlines() if call != '-version']
+
+    def test_fused(self):
+        self.ydl.post_process(self.filename, self.info)
+        calls = self.calls()
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(calls[0].startswith(
+            '-y -i file:%s -i file:%s -c copy -map 0 -aspect 1.500000 -metadata title=Video -map -0:s -map 1:0 '
+            '-metadata:s:s:0 language=eng' % (self.filename, self.subtitles)))
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ['calls.log', 'ffmpeg', 'video.mkv'])
+
+    def test_fallback(self):
+        open(os.path.join(self.tmpdir, 'fail'), 'w').close()
+        self.ydl.post_process(self.filename, self.info)
+        calls = self.calls()
+        # The steps are run one by one after the combined run failed
+        self.assertEqual(len(calls), 4)
+        self.assertIn('-aspect', calls[1])
+        self.assertIn('-metadata title=Video', calls[2])
+        self.assertIn('-map 1:0', calls[3])
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ['calls.log', 'fail', 'ffmpeg', 'video.mkv'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,6 +13,8 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # Various small unit tests
 import io
 import json
+import shutil
+import tempfile
 import xml.etree.ElementTree
 
 from youtube_dl.utils import (
@@ -23,6 +25,7 @@ from youtube_dl.utils import (
     date_from_str,
     DateRange,
     detect_exe_version,
+    DownloadArchive,
     determine_ext,
     dict_get,
     encode_compat_str,
@@ -1280,6 +1283,38 @@ Line 1
         self.assertEqual(get_elements_by_attribute('class', 'foo', html), [])
         self.assertEqual(get_elements_by_attribute('class', 'no-such-foo', html), [])
 
+    def test_download_archive(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            fn = os.path.join(tmpdir, 'archive.txt')
+            archive = DownloadArchive(fn)
+            self.assertFalse('youtube abc' in archive)
+
+            with io.open(fn, 'w', encoding='utf-8') as f:
+                f.write('youtube abc\nyoutube def\n')
+            self.assertTrue('youtube abc' in archive)
+            self.assertTrue('youtube def' in archive)
+            self.assertFalse('youtube ghi' in archive)
+
+            # Entries recorded by this or another instance are visible
+            archive.add('youtube ghi')
+            other = DownloadArchive(fn)
+            self.assertTrue('youtube ghi' in other)
+            other.add('vimeo 123')
+            self.assertTrue('vimeo 123' in archive)
+            with io.open(fn, 'r', encoding='utf-8') as f:
+                self.assertEqual(
+                    f.read(), 'youtube abc\nyoutube def\nyoutube ghi\nvimeo 123\n')
+
+            # Replaced archives are reloaded
+            os.remove(fn)
+            with io.open(fn, 'w', encoding='utf-8') as f:
+                f.write('youtube jkl\n')
+            self.assertTrue('youtube jkl' in archive)
+            self.assertFalse('vimeo 123' in archive)
+        finally:
+            shutil.rmtree(tmpdir)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -10,10 +10,15 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import io
 import re
+import shutil
 import string
+import threading
+import time
 
 from test.helper import FakeYDL
+from youtube_dl.cache import Cache
 from youtube_dl.extractor import YoutubeIE
+from youtube_dl.extractor.youtube import _SignatureSpecCache
 from youtube_dl.compat import compat_str, compat_urlretrieve
 
 _TESTS = [
@@ -119,5 +124,78 @@ for test_spec in _TESTS:
     make_tfunc(*test_spec)
 
 
+class TestSignatureSpecCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), 'testdata', 'sigcache_test')
+        self.cache = Cache(FakeYDL({'cachedir': self.cache_dir}))
+        self.extractions = 0
+
+    def tearDown(self):
+        if os.path.exists(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+
+    def extract(self, spec=(2, 1, 0)):
+        def extract():
+            self.extractions += 1
+            # Give concurrent lookups a chance to find the extraction running
+            time.sleep(0.05)
+            return list(spec)
+        return extract
+
+    def test_memory_and_disk(self):
+        spec_cache = _SignatureSpecCache()
+        self.assertEqual(spec_cache.get(self.cache, 'js_x_3', self.extract()), [2, 1, 0])
+        self.assertEqual(spec_cache.get(self.cache, 'js_x_3', self.extract()), [2, 1, 0])
+        self.assertEqual((spec_cache.hits, spec_cache.disk_hits, spec_cache.misses), (1, 0, 1))
+
+        # Another process only has the filesystem cache
+        other_spec_cache = _SignatureSpecCache()
+        self.assertEqual(other_spec_cache.get(self.cache, 'js_x_3', self.extract()), [2, 1, 0])
+        self.assertEqual((other_spec_cache.hits, other_spec_cache.disk_hits), (0, 1))
+        self.assertEqual(self.extractions, 1)
+
+        # Changes of the cache file are picked up
+        self.cache.store('youtube-sigfuncs', 'js_x_3', [0, 1, 2])
+        cache_fn = os.path.join(self.cache_dir, 'youtube-sigfuncs', 'js_x_3.json')
+        os.utime(cache_fn, (0, 0))
+        self.assertEqual(spec_cache.get(self.cache, 'js_x_3', self.extract()), [0, 1, 2])
+        self.assertEqual(self.extractions, 1)
+
+    def test_disabled_cache(self):
+        cache = Cache(FakeYDL({'cachedir': False}))
+        spec_cache = _SignatureSpecCache()
+        self.assertEqual(spec_cache.get(cache, 'js_x_3', self.extract()), [2, 1, 0])
+        self.assertEqual(spec_cache.get(cache, 'js_x_3', self.extract()), [2, 1, 0])
+        self.assertEqual(self.extractions, 1)
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+    def test_lru(self):
+        spec_cache = _SignatureSpecCache(max_entries=2)
+        cache = Cache(FakeYDL({'cachedir': False}))
+        for func_id in ('js_a_3', 'js_b_3', 'js_a_3', 'js_c_3', 'js_a_3', 'js_b_3'):
+            spec_cache.get(cache, func_id, self.extract())
+        # js_b_3 was evicted by js_c_3
+        self.assertEqual(self.extractions, 4)
+
+    def test_concurrent(self):
+        spec_cache = _SignatureSpecCache()
+        results = []
+
+        def get():
+            results.append(spec_cache.get(self.cache, 'js_x_3', self.extract()))
+
+        threads = [threading.Thread(target=get) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, [[2, 1, 0]] * 5)
+        self.assertEqual(self.extractions, 1)
+        # Nothing is left behind by the locks
+        self.assertEqual(spec_cache._key_locks, {})
+        self.assertEqual(os.listdir(os.path.join(self.cache_dir, 'youtube-sigfuncs')), ['js_x_3.json'])
+
+
 if __name__ == '__main__':
     unittest.main()
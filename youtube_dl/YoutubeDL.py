@@ -9,6 +9,7 @@ import copy
 import datetime
 import errno
 import fileinput
+import functools
 import io
 import itertools
 import json
@@ -21,6 +22,7 @@ import shutil
 import subprocess
 import socket
 import sys
+import threading
 import time
 import tokenize
 import traceback
@@ -36,9 +38,12 @@ from .compat import (
     compat_kwargs,
     compat_numeric_types,
     compat_os_name,
+    compat_parse_qs,
+    compat_queue,
     compat_str,
     compat_tokenize_tokenize,
     compat_urllib_error,
+    compat_urllib_parse_urlparse,
     compat_urllib_request,
     compat_urllib_request_DataHandler,
 )
@@ -51,6 +56,7 @@ from .utils import (
     DEFAULT_OUTTMPL,
     determine_ext,
     determine_protocol,
+    DownloadArchive,
     DownloadError,
     encode_compat_str,
     encodeFilename,
@@ -62,7 +68,7 @@ from .utils import (
     GeoRestrictedError,
     int_or_none,
     ISO3166Utils,
-    locked_file,
+    KeepAliveConnectionPool,
     make_HTTPS_handler,
     MaxDownloadsReached,
     orderedSet,
@@ -91,10 +97,20 @@ from .utils import (
     YoutubeDLCookieProcessor,
     YoutubeDLHandler,
 )
-from .cache import Cache
-from .extractor import get_info_extractor, gen_extractor_classes, _LAZY_LOADER
+from .cache import (
+    Cache,
+    HTTPResponseCache,
+)
+from .extractor import (
+    get_info_extractor,
+    gen_extractor_classes,
+    gen_extractor_url_index,
+    _LAZY_LOADER,
+)
+from .extractor.urlindex import url_tokens
 from .extractor.openload import PhantomJSwrapper
 from .downloader import get_suitable_downloader
+from .downloader.http import HttpFD
 from .downloader.rtmp import rtmpdump_version
 from .postprocessor import (
     FFmpegFixupM3u8PP,
@@ -110,6 +126,136 @@ if compat_os_name == 'nt':
     import ctypes
 
 
+class _InfoPrefetcher(object):
+    """
+    Extracts the information of upcoming URLs in a background thread.
+
+    At most lookahead URLs past the one being processed are extracted.
+    The screen output of the extraction is kept and replayed when the
+    result is taken, so that it shows up in the usual order.
+    """
+
+    def __init__(self, ydl, urls, lookahead):
+        self._ydl = ydl
+        self._lookahead = lookahead
+        self._slots = [{'key': key, 'state': 'pending'} for key in orderedSet(urls)]
+        self._by_key = dict((slot['key'], slot) for slot in self._slots)
+        self._current = -1
+        self._stop = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        for i, slot in enumerate(self._slots):
+            with self._cond:
+                while not self._stop and i > self._current + self._lookahead:
+                    self._cond.wait()
+                if self._stop:
+                    return
+                if slot['state'] != 'pending':
+                    continue
+                slot['state'] = 'running'
+            url, ie_key = slot['key']
+            result = self._ydl._prefetch_ie_result(url, ie_key)
+            with self._cond:
+                slot['result'] = result
+                slot['state'] = 'done'
+                self._cond.notify_all()
+
+    def take(self, url, ie_key):
+        """
+        Return (ie_result, output) for a prefetched URL or None if the URL
+        has not been prefetched and must be extracted by the caller
+        """
+        with self._cond:
+            slot = self._by_key.get((url, ie_key))
+            if slot is None or slot['state'] == 'taken':
+                return None
+            self._current = max(self._current, self._slots.index(slot))
+            self._cond.notify_all()
+            while slot['state'] == 'running':
+                # Wait with a timeout so that KeyboardInterrupt is delivered
+                self._cond.wait(0.5)
+            result = slot.pop('result', None)
+            slot['state'] = 'taken'
+            return result
+
+    def close(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+
+
+class _PostProcessorPool(object):
+    """
+    Runs the postprocessors of downloaded files in background threads.
+
+    Files are handed over as soon as they are downloaded, so that the next
+    download does not wait for ffmpeg. The postprocessors of a file run in
+    order in a single worker. At most workers files wait for a worker, past
+    that submit() blocks. The first error raised by a worker is raised again
+    by the next call to submit() or drain().
+    """
+
+    def __init__(self, ydl, workers):
+        self._ydl = ydl
+        self._jobs = compat_queue.Queue(workers)
+        self._pending = 0
+        self._error = None
+        self._cond = threading.Condition()
+        for _ in range(workers):
+            thread = threading.Thread(target=self._run)
+            thread.daemon = True
+            thread.start()
+
+    def _run(self):
+        ydl = self._ydl
+        while True:
+            filename, info_dict = self._jobs.get()
+            ydl._worker_local.prefix = '[%s] ' % info_dict.get('id')
+            try:
+                ydl._post_process_and_record(filename, info_dict)
+            except BaseException as e:
+                with self._cond:
+                    if self._error is None:
+                        self._error = e
+            finally:
+                ydl._worker_local.prefix = None
+                with self._cond:
+                    self._pending -= 1
+                    self._cond.notify_all()
+
+    def _raise_error(self):
+        with self._cond:
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def submit(self, filename, info_dict):
+        self._raise_error()
+        with self._cond:
+            self._pending += 1
+        while True:
+            # Wait with a timeout so that KeyboardInterrupt is delivered
+            try:
+                self._jobs.put((filename, info_dict), timeout=0.5)
+                break
+            except compat_queue.Full:
+                pass
+
+    def wait(self):
+        """Wait until all the submitted files are post-processed"""
+        with self._cond:
+            while self._pending:
+                self._cond.wait(0.5)
+
+    def drain(self):
+        self.wait()
+        self._raise_error()
+
+
 class YoutubeDL(object):
     """YoutubeDL class.
 
@@ -169,6 +315,10 @@ class YoutubeDL(object):
     playlist_items:    Specific indices of playlist to download.
     playlistreverse:   Download playlist items in reverse order.
     playlistrandom:    Download playlist items in random order.
+    playlist_workers:  Number of playlist items to extract and download
+                       concurrently (default 1).
+    prefetch_entries:  Number of upcoming playlist items or URLs to extract
+                       while the current one is being downloaded (default 0).
     matchtitle:        Download only matching titles.
     rejecttitle:       Reject downloads for matching titles.
     logger:            Log messages to a logging.Logger instance.
@@ -190,6 +340,14 @@ class YoutubeDL(object):
     skip_download:     Skip the actual download of the video file
     cachedir:          Location of the cache files in the filesystem.
                        False to disable filesystem cache.
+    cache_max_size:    Maximum total size of the filesystem cache in bytes.
+                       The least recently used entries are removed when it
+                       is exceeded.
+    http_cache:        Cache the webpages and API responses downloaded by the
+                       extractors in the filesystem cache, honoring their
+                       Cache-Control, ETag and Last-Modified headers.
+    http_cache_max_age: Maximum time in seconds for which a cached HTTP
+                       response is used without revalidation and kept.
     noplaylist:        Download single video instead of a playlist if in doubt.
     age_limit:         An integer representing the user's age in years.
                        Unsuitable videos for the given age are skipped.
@@ -213,6 +371,11 @@ class YoutubeDL(object):
     geo_verification_proxy:  URL of the proxy to use for IP address verification
                        on geo-restricted sites. (Experimental)
     socket_timeout:    Time to wait for unresponsive hosts, in seconds
+    keep_alive_connections: Maximum number of idle persistent connections
+                       kept open per host (default 4), 0 to close every
+                       connection after its request.
+    keep_alive_timeout: Number of seconds an idle persistent connection is
+                       kept open (default 30).
     bidi_workaround:   Work around buggy terminals without bidirectional text
                        support, using fridibi
     debug_printtraffic:Print out sent and received HTTP traffic
@@ -250,9 +413,25 @@ class YoutubeDL(object):
                        * fragment_count: The number of fragments (= individual
                                          files that will be merged)
 
+                       When the formats to be merged are downloaded
+                       concurrently (see concurrent_formats) the statuses of
+                       every format also have the following properties:
+                       * component_index: The index of the format, from 1
+                       * component_count: The number of formats
+                       * aggregate_downloaded_bytes: Bytes downloaded of all
+                                                     the formats
+                       * aggregate_total_bytes: Size of all the formats, None
+                                                if unknown
+                       * aggregate_speed: The download speed of all the formats
+                                          in bytes/second
+
                        Progress hooks are guaranteed to be called at least once
                        (with status "finished") if the download is successful.
     merge_output_format: Extension to use when merging formats.
+    concurrent_formats: Download the formats to be merged concurrently.
+    stream_merge:      Merge the formats while downloading them, through
+                       FIFOs, instead of downloading them to separate files
+                       first. Only plain HTTP formats are merged this way.
     fixup:             Automatically correct known faults of the file.
                        One of:
                        - "never": do nothing
@@ -292,19 +471,28 @@ class YoutubeDL(object):
                        None or unset for standard (built-in) downloader.
     hls_prefer_native: Use the native HLS downloader instead of ffmpeg/avconv
                        if True, otherwise use ffmpeg/avconv if False, otherwise
-                       use downloader suggested by extractor if None.
+                       use downloader suggested by extractor if None. Live
+                       streams are downloaded with ffmpeg/avconv unless True.
 
     The following parameters are not used by YoutubeDL itself, they are used by
     the downloader (see youtube_dl/downloader/common.py):
-    nopart, updatetime, buffersize, ratelimit, min_filesize, max_filesize, test,
-    noresizebuffer, retries, continuedl, noprogress, consoletitle,
-    xattr_set_filesize, external_downloader_args, hls_use_mpegts.
+    nopart, updatetime, buffersize, ratelimit, ratelimit_per_host, min_filesize,
+    max_filesize, test, noresizebuffer, retries, retry_backoff, retry_max_delay,
+    circuit_breaker_threshold, circuit_breaker_cooldown, continuedl, noprogress,
+    progress_rate, consoletitle, xattr_set_filesize, external_downloader_args,
+    hls_use_mpegts, concurrent_fragment_downloads, fragment_engine,
+    http_connections.
 
     The following options are used by the post processors:
     prefer_ffmpeg:     If True, use ffmpeg instead of avconv if both are available,
                        otherwise prefer avconv.
     postprocessor_args: A list of additional command-line arguments for the
                         postprocessor.
+    postprocessor_workers: Number of files to post-process in background
+                       threads while the next ones are downloaded (default 0,
+                       post-process every file right after its download).
+                       download() waits for them before returning, other
+                       callers can wait with drain_postprocessors().
 
     The following options are used by the Youtube extractor:
     youtube_include_dash_manifest: If True (default), DASH manifests and related
@@ -336,11 +524,17 @@ class YoutubeDL(object):
         if params is None:
             params = {}
         self._ies = []
+        self._ies_dispatch = None
         self._ies_instances = {}
         self._pps = []
         self._progress_hooks = []
         self._download_retcode = 0
         self._num_downloads = 0
+        self._download_archive = None
+        self._download_lock = threading.Lock()
+        self._worker_local = threading.local()
+        self._prefetchers = []
+        self._postprocessor_pool = None
         self._screen_file = [sys.stdout, sys.stderr][params.get('logtostderr', False)]
         self._err_file = sys.stderr
         self.params = {
@@ -349,6 +543,7 @@ class YoutubeDL(object):
         }
         self.params.update(params)
         self.cache = Cache(self)
+        self.http_cache = HTTPResponseCache(self)
 
         def check_deprecated(param, option, suggestion):
             if self.params.get(param) is not None:
@@ -444,6 +639,7 @@ class YoutubeDL(object):
     def add_info_extractor(self, ie):
         """Add an InfoExtractor object to the end of the list."""
         self._ies.append(ie)
+        self._ies_dispatch = None
         if not isinstance(ie, type):
             self._ies_instances[ie.ie_key()] = ie
             ie.set_downloader(self)
@@ -460,6 +656,15 @@ class YoutubeDL(object):
             self.add_info_extractor(ie)
         return ie
 
+    def _new_info_extractor(self, ie_key):
+        """
+        Get a new instance of the IE with name ie_key, which is not added to
+        the extractor list.
+        """
+        ie = self._ies_instances.get(ie_key)
+        ie_class = type(ie) if ie is not None else get_info_extractor(ie_key)
+        return ie_class(self)
+
     def add_default_info_extractors(self):
         """
         Add the InfoExtractors returned by gen_extractors to the end of the list
@@ -491,8 +696,23 @@ class YoutubeDL(object):
 
     def to_screen(self, message, skip_eol=False):
         """Print message to stdout if not in quiet mode."""
+        if self._buffer_output(self.to_screen, message, skip_eol):
+            return
+        prefix = getattr(self._worker_local, 'prefix', None)
+        if prefix:
+            # Output of concurrent playlist workers is interleaved, so tag
+            # every message and never leave a progress line unterminated
+            message = prefix + re.sub(r'^\r(?:\x1b\[K)?', '', message)
+            skip_eol = False
         return self.to_stdout(message, skip_eol, check_quiet=True)
 
+    def _buffer_output(self, method, *args):
+        output = getattr(self._worker_local, 'output', None)
+        if output is None:
+            return False
+        output.append((method, args))
+        return True
+
     def _write_string(self, s, out=None):
         write_string(s, out=out, encoding=self.params.get('encoding'))
 
@@ -547,11 +767,21 @@ class YoutubeDL(object):
         return self
 
     def __exit__(self, *args):
+        if self._postprocessor_pool is not None:
+            self._postprocessor_pool.wait()
         self.restore_console_title()
 
         if self.params.get('cookiefile') is not None:
             self.cookiejar.save()
 
+        if self.params.get('verbose'):
+            self._write_string(
+                '[debug] HTTP connection pool: %d reused, %d new connections\n'
+                % (self._connection_pool.hits, self._connection_pool.misses))
+            for line in self.http_cache.format_stats():
+                self._write_string('[debug] HTTP cache: %s\n' % line)
+        self._connection_pool.close()
+
     def trouble(self, message=None, tb=None):
         """Determine action to take when a download problem appears.
 
@@ -587,6 +817,8 @@ class YoutubeDL(object):
         Print the message to stderr, it will be prefixed with 'WARNING:'
         If stderr is a tty file the 'WARNING:' will be colored
         '''
+        if self._buffer_output(self.report_warning, message):
+            return
         if self.params.get('logger') is not None:
             self.params['logger'].warning(message)
         else:
@@ -627,7 +859,8 @@ class YoutubeDL(object):
             autonumber_size = self.params.get('autonumber_size')
             if autonumber_size is None:
                 autonumber_size = 5
-            template_dict['autonumber'] = self.params.get('autonumber_start', 1) - 1 + self._num_downloads
+            template_dict['autonumber'] = self.params.get('autonumber_start', 1) - 1 + getattr(
+                self._worker_local, 'num_downloads', self._num_downloads)
             if template_dict.get('resolution') is None:
                 if template_dict.get('width') and template_dict.get('height'):
                     template_dict['resolution'] = '%dx%d' % (template_dict['width'], template_dict['height'])
@@ -769,7 +1002,7 @@ class YoutubeDL(object):
         if ie_key:
             ies = [self.get_info_extractor(ie_key)]
         else:
-            ies = self._ies
+            ies = self._suitable_ies(url)
 
         for ie in ies:
             if not ie.suitable(url):
@@ -781,7 +1014,9 @@ class YoutubeDL(object):
                                     'and will probably not work.')
 
             try:
-                ie_result = ie.extract(url)
+                ie_result = self._take_prefetched_ie_result(url, ie_key)
+                if ie_result is None:
+                    ie_result = ie.extract(url)
                 if ie_result is None:  # Finished already (backwards compatibility; listformats and friends should be moved here)
                     break
                 if isinstance(ie_result, list):
@@ -817,6 +1052,111 @@ class YoutubeDL(object):
         else:
             self.report_error('no suitable InfoExtractor for URL %s' % url)
 
+    def _prefetch_urls(self, urls):
+        lookahead = self.params.get('prefetch_entries') or 0
+        urls = list(urls)
+        if lookahead <= 0 or not urls:
+            return None
+        prefetcher = _InfoPrefetcher(self, urls, lookahead)
+        self._prefetchers.append(prefetcher)
+        return prefetcher
+
+    def _stop_prefetching(self, prefetcher):
+        if prefetcher is not None:
+            prefetcher.close()
+            self._prefetchers.remove(prefetcher)
+
+    def _prefetch_ie_result(self, url, ie_key):
+        """
+        Extract url without processing it. Failures are left to be reported
+        by the regular extraction, so None is returned for them.
+        """
+        self._worker_local.output = output = []
+        try:
+            ies = [self._new_info_extractor(ie_key)] if ie_key else self._suitable_ies(url)
+            for ie in ies:
+                if not ie.suitable(url):
+                    continue
+                # Extractors keep state while extracting, so the shared
+                # instances are left to the main thread
+                ie = self._new_info_extractor(ie.ie_key())
+                ie_result = ie.extract(url)
+                if not isinstance(ie_result, dict):
+                    return None
+                self.add_default_extra_info(ie_result, ie, url)
+                return ie_result, output
+        except Exception:
+            return None
+        finally:
+            self._worker_local.output = None
+
+    def _take_prefetched_ie_result(self, url, ie_key):
+        for prefetcher in reversed(self._prefetchers):
+            prefetched = prefetcher.take(url, ie_key)
+            if prefetched is not None:
+                break
+        else:
+            return None
+        ie_result, output = prefetched
+        for method, args in output:
+            method(*args)
+        if self._has_expired(ie_result):
+            self.to_screen(
+                '[info] %s: Prefetched information has expired, re-extracting'
+                % ie_result.get('id', url))
+            return None
+        return ie_result
+
+    @staticmethod
+    def _has_expired(ie_result, margin=60):
+        """Check whether the signed media URLs of ie_result have expired"""
+        if ie_result.get('_type', 'video') != 'video':
+            return False
+        urls = [ie_result.get('url')] + [
+            f.get('url') for f in ie_result.get('formats') or []]
+        deadline = time.time() + margin
+        for url in urls:
+            if not url:
+                continue
+            qs = compat_parse_qs(compat_urllib_parse_urlparse(url).query)
+            for key, values in qs.items():
+                if key.lower() in ('expire', 'expires'):
+                    expires = int_or_none(values[0])
+                    if expires is not None and expires < deadline:
+                        return True
+        return False
+
+    def _suitable_ies(self, url):
+        """
+        Return the extractors that may be suitable for url, in the order of
+        the extractor list
+        """
+        url_index = gen_extractor_url_index()
+        if url_index is None:
+            return self._ies
+        index, unindexed = url_index
+        if self._ies_dispatch is None:
+            unindexed = set(unindexed)
+            indexed = set()
+            for ie_keys in index.values():
+                indexed.update(ie_keys)
+            positions = {}
+            always = set()
+            for i, ie in enumerate(self._ies):
+                ie_key = ie.ie_key()
+                if ie_key in indexed and ie_key not in unindexed:
+                    positions.setdefault(ie_key, []).append(i)
+                else:
+                    # Extractors unknown to the index may match anything
+                    always.add(i)
+            self._ies_dispatch = positions, always
+        positions, always = self._ies_dispatch
+        candidates = set(always)
+        for token in url_tokens(url):
+            for ie_key in index.get(token, ()):
+                candidates.update(positions.get(ie_key, ()))
+        return [self._ies[i] for i in sorted(candidates)]
+
     def add_default_extra_info(self, ie_result, ie, url):
         self.add_extra_info(ie_result, {
             'extractor': ie.IE_NAME,
@@ -964,7 +1304,7 @@ class YoutubeDL(object):
 
             x_forwarded_for = ie_result.get('__x_forwarded_for_ip')
 
-            for i, entry in enumerate(entries, 1):
+            def process_entry(i, entry):
                 self.to_screen('[download] Downloading video %s of %s' % (i, n_entries))
                 # This __x_forwarded_for_ip thing is a bit ugly but requires
                 # minimal changes
@@ -985,12 +1325,34 @@ class YoutubeDL(object):
                 reason = self._match_entry(entry, incomplete=True)
                 if reason is not None:
                     self.to_screen('[download] ' + reason)
-                    continue
+                    return False, None
+
+                return True, self.process_ie_result(
+                    entry, download=download, extra_info=extra)
+
+            playlist_workers = self.params.get('playlist_workers') or 1
+            prefetcher = None
+            # Nested playlists are processed by the worker that found them
+            if (playlist_workers > 1 and len(entries) > 1 and
+                    not getattr(self._worker_local, 'prefix', None)):
+                entry_results = self._process_entries_concurrently(
+                    process_entry, entries, playlist_workers)
+            else:
+                if not self.params.get('extract_flat', False):
+                    prefetcher = self._prefetch_urls(
+                        (sanitize_url(entry['url']), entry.get('ie_key'))
+                        for entry in entries
+                        if entry.get('_type') in ('url', 'url_transparent') and
+                        self._match_entry(entry, incomplete=True) is None)
+                entry_results = (
+                    process_entry(i, entry) for i, entry in enumerate(entries, 1))
 
-                entry_result = self.process_ie_result(entry,
-                                                      download=download,
-                                                      extra_info=extra)
-                playlist_results.append(entry_result)
+            try:
+                for matched, entry_result in entry_results:
+                    if matched:
+                        playlist_results.append(entry_result)
+            finally:
+                self._stop_prefetching(prefetcher)
             ie_result['entries'] = playlist_results
             self.to_screen('[download] Finished downloading playlist: %s' % playlist)
             return ie_result
@@ -1018,6 +1380,57 @@ class YoutubeDL(object):
         else:
             raise Exception('Invalid result type: %s' % result_type)
 
+    def _process_entries_concurrently(self, process_entry, entries, max_workers):
+        """
+        Run process_entry(index, entry) for every entry with up to
+        max_workers threads and return the results in playlist order.
+
+        Once an entry fails no new entries are started; the entries already
+        in progress are completed and the error of the earliest failed entry
+        is raised.
+        """
+        n_entries = len(entries)
+        jobs = compat_queue.Queue()
+        for job in enumerate(entries, 1):
+            jobs.put(job)
+        results = {}
+        errors = {}
+        stop = threading.Event()
+
+        def worker():
+            while not stop.is_set():
+                try:
+                    i, entry = jobs.get_nowait()
+                except compat_queue.Empty:
+                    return
+                self._worker_local.prefix = '[%d/%d] ' % (i, n_entries)
+                try:
+                    results[i] = process_entry(i, entry)
+                except BaseException as e:
+                    errors[i] = e
+                    stop.set()
+                finally:
+                    self._worker_local.prefix = None
+
+        threads = [
+            threading.Thread(target=worker)
+            for _ in range(min(max_workers, n_entries))]
+        for t in threads:
+            t.daemon = True
+            t.start()
+        try:
+            for t in threads:
+                # Wait with a timeout so that KeyboardInterrupt is delivered
+                while t.is_alive():
+                    t.join(0.5)
+        except BaseException:
+            stop.set()
+            raise
+
+        if errors:
+            raise errors[min(errors)]
+        return [results[i] for i in sorted(results)]
+
     def _build_format_filter(self, filter_spec):
         " Returns a function to filter the formats according to the filter_spec "
 
@@ -1693,7 +2106,11 @@ class YoutubeDL(object):
             self.to_screen('[download] ' + reason)
             return
 
-        self._num_downloads += 1
+        with self._download_lock:
+            if max_downloads is not None and self._num_downloads >= int(max_downloads):
+                raise MaxDownloadsReached()
+            self._num_downloads += 1
+            self._worker_local.num_downloads = self._num_downloads
 
         info_dict['_filename'] = filename = self.prepare_filename(info_dict)
 
@@ -1823,9 +2240,9 @@ class YoutubeDL(object):
 
         if not self.params.get('skip_download', False):
             try:
-                def dl(name, info):
+                def dl(name, info, progress_hooks=None):
                     fd = get_suitable_downloader(info, self.params)(self, self.params)
-                    for ph in self._progress_hooks:
+                    for ph in (self._progress_hooks if progress_hooks is None else progress_hooks):
                         fd.add_progress_hook(ph)
                     if self.params.get('verbose'):
                         self.to_stdout('[debug] Invoking downloader on %r' % info.get('url'))
@@ -1875,6 +2292,7 @@ class YoutubeDL(object):
                             '[download] %s has already been downloaded and '
                             'merged' % filename)
                     else:
+                        components = []
                         for f in requested_formats:
                             new_info = dict(info_dict)
                             new_info.update(f)
@@ -1883,8 +2301,22 @@ class YoutubeDL(object):
                                 'f%s' % f['format_id'], new_info['ext'])
                             if not ensure_dir_exists(fname):
                                 return
+                            components.append((fname, new_info))
+                        if postprocessors and self._can_stream_merge(merger, filename, components):
+                            if merger.run_streamed(filename, [
+                                    (fname, functools.partial(self._download_to_fifo, fname, new_info))
+                                    for fname, new_info in components]):
+                                components = []
+                                postprocessors = []
+                            else:
+                                self.report_warning(
+                                    'Streamed merge failed, downloading the formats to separate files')
+                        if len(components) > 1 and self.params.get('concurrent_formats'):
+                            results = self._download_formats_concurrently(components, dl)
+                        else:
+                            results = (dl(fname, new_info) for fname, new_info in components)
+                        for (fname, _), partial_success in zip(components, results):
                             downloaded.append(fname)
-                            partial_success = dl(fname, new_info)
                             success = success and partial_success
                         info_dict['__postprocessors'] = postprocessors
                         info_dict['__files_to_merge'] = downloaded
@@ -1963,12 +2395,29 @@ class YoutubeDL(object):
                     else:
                         assert fixup_policy in ('ignore', 'never')
 
-                try:
-                    self.post_process(filename, info_dict)
-                except (PostProcessingError) as err:
-                    self.report_error('postprocessing: %s' % str(err))
-                    return
-                self.record_download_archive(info_dict)
+                postprocessor_workers = self.params.get('postprocessor_workers')
+                if postprocessor_workers and (info_dict.get('__postprocessors') or self._pps):
+                    if self._postprocessor_pool is None:
+                        self._postprocessor_pool = _PostProcessorPool(self, postprocessor_workers)
+                    self._postprocessor_pool.submit(filename, info_dict)
+                else:
+                    self._post_process_and_record(filename, info_dict)
+
+    def _post_process_and_record(self, filename, info_dict):
+        try:
+            self.post_process(filename, info_dict)
+        except (PostProcessingError) as err:
+            self.report_error('postprocessing: %s' % str(err))
+            return
+        self.record_download_archive(info_dict)
+
+    def drain_postprocessors(self):
+        """
+        Wait until the files handed over to postprocessor_workers are
+        post-processed and raise the first error of their postprocessors
+        """
+        if self._postprocessor_pool is not None:
+            self._postprocessor_pool.drain()
 
     def download(self, url_list):
         """Download a given list of URLs."""
@@ -1979,20 +2428,28 @@ class YoutubeDL(object):
                 self.params.get('max_downloads') != 1):
             raise SameFileError(outtmpl)
 
-        for url in url_list:
-            try:
-                # It also downloads the videos
-                res = self.extract_info(
-                    url, force_generic_extractor=self.params.get('force_generic_extractor', False))
-            except UnavailableVideoError:
-                self.report_error('unable to download video')
-            except MaxDownloadsReached:
-                self.to_screen('[info] Maximum number of downloaded files reached.')
-                raise
-            else:
-                if self.params.get('dump_single_json', False):
-                    self.to_stdout(json.dumps(res))
+        force_generic_extractor = self.params.get('force_generic_extractor', False)
+        prefetcher = self._prefetch_urls(
+            (url, 'Generic' if force_generic_extractor else None)
+            for url in url_list)
+        try:
+            for url in url_list:
+                try:
+                    # It also downloads the videos
+                    res = self.extract_info(
+                        url, force_generic_extractor=force_generic_extractor)
+                except UnavailableVideoError:
+                    self.report_error('unable to download video')
+                except MaxDownloadsReached:
+                    self.to_screen('[info] Maximum number of downloaded files reached.')
+                    raise
+                else:
+                    if self.params.get('dump_single_json', False):
+                        self.to_stdout(json.dumps(res))
+        finally:
+            self._stop_prefetching(prefetcher)
 
+        self.drain_postprocessors()
         return self._download_retcode
 
     def download_with_info_file(self, info_filename):
@@ -2010,6 +2467,7 @@ class YoutubeDL(object):
                 return self.download([webpage_url])
             else:
                 raise
+        self.drain_postprocessors()
         return self._download_retcode
 
     @staticmethod
@@ -2018,6 +2476,89 @@ class YoutubeDL(object):
             (k, v) for k, v in info_dict.items()
             if k not in ['requested_formats', 'requested_subtitles'])
 
+    def _download_formats_concurrently(self, components, dl):
+        """
+        Download components, a list of (filename, info) tuples, each with
+        dl(filename, info, progress_hooks) in its own thread and return their
+        results in order.
+
+        The progress hooks get the statuses of every component along with the
+        index of the component and the aggregate progress of all of them.
+        If a download raises, the other ones are completed and the error of
+        the first failed component is raised.
+        """
+        n_components = len(components)
+        lock = threading.Lock()
+        progress = [{'downloaded_bytes': 0, 'total_bytes': None, 'speed': None}
+                    for _ in components]
+
+        def progress_hook(index, status):
+            with lock:
+                component = progress[index]
+                component['downloaded_bytes'] = status.get('downloaded_bytes') or 0
+                component['total_bytes'] = status.get('total_bytes') or status.get('total_bytes_estimate')
+                component['speed'] = status.get('speed') if status['status'] == 'downloading' else None
+                status.update({
+                    'component_index': index + 1,
+                    'component_count': n_components,
+                    'aggregate_downloaded_bytes': sum(c['downloaded_bytes'] for c in progress),
+                    'aggregate_total_bytes': (
+                        sum(c['total_bytes'] for c in progress)
+                        if all(c['total_bytes'] for c in progress) else None),
+                    'aggregate_speed': sum(c['speed'] or 0 for c in progress),
+                })
+            for ph in self._progress_hooks:
+                ph(status)
+
+        parent_prefix = getattr(self._worker_local, 'prefix', None) or ''
+        results = [None] * n_components
+        errors = {}
+
+        def download(index, fname, info):
+            self._worker_local.prefix = '%s[%s] ' % (parent_prefix, info.get('format_id'))
+            try:
+                results[index] = dl(fname, info, [functools.partial(progress_hook, index)])
+            except BaseException as e:
+                errors[index] = e
+
+        threads = [
+            threading.Thread(target=download, args=(i, fname, info))
+            for i, (fname, info) in enumerate(components)]
+        for t in threads:
+            t.daemon = True
+            t.start()
+        for t in threads:
+            # Wait with a timeout so that KeyboardInterrupt is delivered
+            while t.is_alive():
+                t.join(0.5)
+
+        if errors:
+            raise errors[min(errors)]
+        return results
+
+    def _can_stream_merge(self, merger, filename, components):
+        if not self.params.get('stream_merge') or not merger.can_stream() or filename == '-':
+            return False
+        for fname, info in components:
+            if get_suitable_downloader(info, self.params) is not HttpFD:
+                return False
+            # Partial downloads are resumed from their files instead
+            if any(os.path.exists(encodeFilename(fn)) for fn in (fname, fname + '.part')):
+                return False
+        return True
+
+    def _download_to_fifo(self, fifo, info):
+        # Nothing written to a FIFO can be taken back, so failed downloads
+        # are not resumed but retried to separate files instead
+        fd = HttpFD(self, dict(
+            self.params, nopart=True, continuedl=False, nooverwrites=False,
+            http_connections=1, retries=0))
+        for ph in self._progress_hooks:
+            fd.add_progress_hook(ph)
+        if self.params.get('verbose'):
+            self.to_stdout('[debug] Invoking downloader on %r' % info.get('url'))
+        return fd.download(fifo, info)
+
     def post_process(self, filename, ie_info):
         """Run all the postprocessors on the given file."""
         info = dict(ie_info)
@@ -2026,19 +2567,52 @@ class YoutubeDL(object):
         if ie_info.get('__postprocessors') is not None:
             pps_chain.extend(ie_info['__postprocessors'])
         pps_chain.extend(self._pps)
-        for pp in pps_chain:
-            files_to_delete = []
-            try:
-                files_to_delete, info = pp.run(info)
-            except PostProcessingError as e:
-                self.report_error(e.msg)
-            if files_to_delete and not self.params.get('keepvideo', False):
-                for old_filename in files_to_delete:
-                    self.to_screen('Deleting original file %s (pass -k to keep)' % old_filename)
-                    try:
-                        os.remove(encodeFilename(old_filename))
-                    except (IOError, OSError):
-                        self.report_warning('Unable to remove downloaded original file')
+        # The stream copies of consecutive postprocessors are done by a
+        # single ffmpeg invocation instead of rewriting the file each time
+        fused = []
+        for pp in pps_chain + [None]:
+            step = pp.plan_stream_copy(info) if pp is not None else None
+            if step is not None and step.can_follow([s for _, s in fused]):
+                fused.append((pp, step))
+                continue
+            if fused:
+                info = self._run_fused_postprocessors(fused, info)
+            fused = [(pp, step)] if step is not None else []
+            if pp is not None and step is None:
+                info = self._run_postprocessor(lambda: pp.run(info), info)
+
+    def _run_fused_postprocessors(self, fused, info):
+        if len(fused) == 1:
+            pp, step = fused[0]
+            return self._run_postprocessor(lambda: pp.run_stream_copy(info, [step]), info)
+        try:
+            return self._run_postprocessor(
+                lambda: fused[0][0].run_stream_copy(info, [step for _, step in fused]),
+                info, reraise=True)
+        except PostProcessingError as e:
+            self.report_warning(
+                'Unable to run the postprocessors with a single ffmpeg invocation (%s), '
+                'running them one by one' % e.msg)
+        for pp, _ in fused:
+            info = self._run_postprocessor(lambda: pp.run(info), info)
+        return info
+
+    def _run_postprocessor(self, run, info, reraise=False):
+        files_to_delete = []
+        try:
+            files_to_delete, info = run()
+        except PostProcessingError as e:
+            if reraise:
+                raise
+            self.report_error(e.msg)
+        if files_to_delete and not self.params.get('keepvideo', False):
+            for old_filename in files_to_delete:
+                self.to_screen('Deleting original file %s (pass -k to keep)' % old_filename)
+                try:
+                    os.remove(encodeFilename(old_filename))
+                except (IOError, OSError):
+                    self.report_warning('Unable to remove downloaded original file')
+        return info
 
     def _make_archive_id(self, info_dict):
         # Future-proof against any change in case
@@ -2051,33 +2625,32 @@ class YoutubeDL(object):
             return None  # Incomplete video information
         return extractor.lower() + ' ' + info_dict['id']
 
-    def in_download_archive(self, info_dict):
+    def _get_download_archive(self):
         fn = self.params.get('download_archive')
         if fn is None:
+            return None
+        if self._download_archive is None or self._download_archive.filename != fn:
+            self._download_archive = DownloadArchive(fn)
+        return self._download_archive
+
+    def in_download_archive(self, info_dict):
+        archive = self._get_download_archive()
+        if archive is None:
             return False
 
         vid_id = self._make_archive_id(info_dict)
         if vid_id is None:
             return False  # Incomplete video information
 
-        try:
-            with locked_file(fn, 'r', encoding='utf-8') as archive_file:
-                for line in archive_file:
-                    if line.strip() == vid_id:
-                        return True
-        except IOError as ioe:
-            if ioe.errno != errno.ENOENT:
-                raise
-        return False
+        return vid_id in archive
 
     def record_download_archive(self, info_dict):
-        fn = self.params.get('download_archive')
-        if fn is None:
+        archive = self._get_download_archive()
+        if archive is None:
             return
         vid_id = self._make_archive_id(info_dict)
         assert vid_id
-        with locked_file(fn, 'a', encoding='utf-8') as archive_file:
-            archive_file.write(vid_id + '\n')
+        archive.add(vid_id)
 
     @staticmethod
     def format_resolution(format, default='unknown'):
@@ -2292,9 +2865,17 @@ class YoutubeDL(object):
                 proxies['https'] = proxies['http']
         proxy_handler = PerRequestProxyHandler(proxies)
 
+        keep_alive_connections = self.params.get('keep_alive_connections')
+        keep_alive_timeout = self.params.get('keep_alive_timeout')
+        self._connection_pool = KeepAliveConnectionPool(
+            4 if keep_alive_connections is None else keep_alive_connections,
+            30 if keep_alive_timeout is None else keep_alive_timeout)
+
         debuglevel = 1 if self.params.get('debug_printtraffic') else 0
-        https_handler = make_HTTPS_handler(self.params, debuglevel=debuglevel)
-        ydlh = YoutubeDLHandler(self.params, debuglevel=debuglevel)
+        https_handler = make_HTTPS_handler(
+            self.params, debuglevel=debuglevel, connection_pool=self._connection_pool)
+        ydlh = YoutubeDLHandler(
+            self.params, debuglevel=debuglevel, connection_pool=self._connection_pool)
         data_handler = compat_urllib_request_DataHandler()
 
         # When passing our own FileHandler instance, build_opener won't add the
@@ -150,6 +150,11 @@ def _real_main(argv=None):
         if numeric_limit is None:
             parser.error('invalid rate limit specified')
         opts.ratelimit = numeric_limit
+    if opts.ratelimit_per_host is not None:
+        numeric_limit = FileDownloader.parse_bytes(opts.ratelimit_per_host)
+        if numeric_limit is None:
+            parser.error('invalid rate limit per host specified')
+        opts.ratelimit_per_host = numeric_limit
     if opts.min_filesize is not None:
         numeric_limit = FileDownloader.parse_bytes(opts.min_filesize)
         if numeric_limit is None:
@@ -160,6 +165,13 @@ def _real_main(argv=None):
         if numeric_limit is None:
             parser.error('invalid max_filesize specified')
         opts.max_filesize = numeric_limit
+    if opts.cache_max_size is not None:
+        numeric_limit = FileDownloader.parse_bytes(opts.cache_max_size)
+        if numeric_limit is None:
+            parser.error('invalid cache max size specified')
+        opts.cache_max_size = numeric_limit
+    if opts.http_cache_max_age is not None and opts.http_cache_max_age < 0:
+        parser.error('HTTP cache max age must be positive or 0')
     if opts.sleep_interval is not None:
         if opts.sleep_interval < 0:
             parser.error('sleep interval must be positive or 0')
@@ -186,6 +198,33 @@ def _real_main(argv=None):
         opts.retries = parse_retries(opts.retries)
     if opts.fragment_retries is not None:
         opts.fragment_retries = parse_retries(opts.fragment_retries)
+    if opts.retry_backoff is not None and opts.retry_backoff < 0:
+        parser.error('retry backoff must be positive or 0')
+    if opts.retry_max_delay is not None and opts.retry_max_delay < 0:
+        parser.error('retry max delay must be positive or 0')
+    if opts.circuit_breaker_threshold is not None and opts.circuit_breaker_threshold < 0:
+        parser.error('circuit breaker threshold must be positive or 0')
+    if opts.circuit_breaker_cooldown is not None and opts.circuit_breaker_cooldown < 0:
+        parser.error('circuit breaker cooldown must be positive or 0')
+    if opts.keep_alive_connections is not None and opts.keep_alive_connections < 0:
+        parser.error('keep-alive connections must be positive or 0')
+    if opts.keep_alive_timeout is not None and opts.keep_alive_timeout < 0:
+        parser.error('keep-alive timeout must be positive or 0')
+    if opts.concurrent_fragment_downloads is not None:
+        if opts.concurrent_fragment_downloads <= 0:
+            parser.error('concurrent fragments must be positive')
+    if opts.http_connections is not None:
+        if opts.http_connections <= 0:
+            parser.error('HTTP connections must be positive')
+    if opts.playlist_workers is not None:
+        if opts.playlist_workers <= 0:
+            parser.error('playlist workers must be positive')
+    if opts.prefetch_entries is not None and opts.prefetch_entries < 0:
+        parser.error('prefetch entries must be positive or 0')
+    if opts.postprocessor_workers is not None and opts.postprocessor_workers < 0:
+        parser.error('postprocessor workers must be positive or 0')
+    if opts.progress_rate is not None and opts.progress_rate < 0:
+        parser.error('progress rate must be positive or 0')
     if opts.buffersize is not None:
         numeric_buffersize = FileDownloader.parse_bytes(opts.buffersize)
         if numeric_buffersize is None:
@@ -339,20 +378,31 @@ def _real_main(argv=None):
         'ignoreerrors': opts.ignoreerrors,
         'force_generic_extractor': opts.force_generic_extractor,
         'ratelimit': opts.ratelimit,
+        'ratelimit_per_host': opts.ratelimit_per_host,
         'nooverwrites': opts.nooverwrites,
         'retries': opts.retries,
         'fragment_retries': opts.fragment_retries,
+        'retry_backoff': opts.retry_backoff,
+        'retry_max_delay': opts.retry_max_delay,
+        'circuit_breaker_threshold': opts.circuit_breaker_threshold,
+        'circuit_breaker_cooldown': opts.circuit_breaker_cooldown,
         'skip_unavailable_fragments': opts.skip_unavailable_fragments,
         'keep_fragments': opts.keep_fragments,
+        'concurrent_fragment_downloads': opts.concurrent_fragment_downloads,
+        'fragment_engine': opts.fragment_engine,
+        'http_connections': opts.http_connections,
         'buffersize': opts.buffersize,
         'noresizebuffer': opts.noresizebuffer,
         'continuedl': opts.continue_dl,
         'noprogress': opts.noprogress,
+        'progress_rate': opts.progress_rate,
         'progress_with_newline': opts.progress_with_newline,
         'playliststart': opts.playliststart,
         'playlistend': opts.playlistend,
         'playlistreverse': opts.playlist_reverse,
         'playlistrandom': opts.playlist_random,
+        'playlist_workers': opts.playlist_workers,
+        'prefetch_entries': opts.prefetch_entries,
         'noplaylist': opts.noplaylist,
         'logtostderr': opts.outtmpl == '-',
         'consoletitle': opts.consoletitle,
@@ -384,6 +434,9 @@ def _real_main(argv=None):
         'max_views': opts.max_views,
         'daterange': date,
         'cachedir': opts.cachedir,
+        'cache_max_size': opts.cache_max_size,
+        'http_cache': opts.http_cache,
+        'http_cache_max_age': opts.http_cache_max_age,
         'youtube_print_sig_code': opts.youtube_print_sig_code,
         'age_limit': opts.age_limit,
         'download_archive': download_archive_fn,
@@ -392,6 +445,8 @@ def _real_main(argv=None):
         'prefer_insecure': opts.prefer_insecure,
         'proxy': opts.proxy,
         'socket_timeout': opts.socket_timeout,
+        'keep_alive_connections': opts.keep_alive_connections,
+        'keep_alive_timeout': opts.keep_alive_timeout,
         'bidi_workaround': opts.bidi_workaround,
         'debug_printtraffic': opts.debug_printtraffic,
         'prefer_ffmpeg': opts.prefer_ffmpeg,
@@ -402,6 +457,8 @@ def _real_main(argv=None):
         'extract_flat': opts.extract_flat,
         'mark_watched': opts.mark_watched,
         'merge_output_format': opts.merge_output_format,
+        'stream_merge': opts.stream_merge,
+        'concurrent_formats': opts.concurrent_formats,
         'postprocessors': postprocessors,
         'fixup': opts.fixup,
         'source_address': opts.source_address,
@@ -419,6 +476,7 @@ def _real_main(argv=None):
         'hls_use_mpegts': opts.hls_use_mpegts,
         'external_downloader_args': external_downloader_args,
         'postprocessor_args': postprocessor_args,
+        'postprocessor_workers': opts.postprocessor_workers,
         'cn_verification_proxy': opts.cn_verification_proxy,
         'geo_verification_proxy': opts.geo_verification_proxy,
         'config_location': opts.config_location,
@@ -1,12 +1,22 @@
 from __future__ import unicode_literals
 
 import base64
-from math import ceil
 
+from .compat import (
+    compat_struct_pack,
+    compat_struct_unpack,
+)
 from .utils import bytes_to_intlist, intlist_to_bytes
 
 BLOCK_SIZE_BYTES = 16
 
+# The cipher works on the state as four big-endian 32-bit words (columns)
+# and implements each round with table lookups (T-tables) as described in
+# section 5.2.1 of "AES Proposal: Rijndael" by Daemen and Rijmen. The
+# functions operating on bytes-like objects (bytes, bytearray or memoryview)
+# never convert the data into lists of integers; the functions operating on
+# lists of integers are kept for compatibility and wrap them.
+
 
 def aes_ctr_decrypt(data, key, counter):
     """
@@ -18,20 +28,27 @@ def aes_ctr_decrypt(data, key, counter):
                                returns the next counter block
     @returns {int[]}           decrypted data
     """
-    expanded_key = key_expansion(key)
-    block_count = int(ceil(float(len(data)) / BLOCK_SIZE_BYTES))
+    block_count = (len(data) + BLOCK_SIZE_BYTES - 1) // BLOCK_SIZE_BYTES
+    counter_blocks = (
+        _unpack_words(intlist_to_bytes(counter.next_value())) for _ in range(block_count))
+    return bytes_to_intlist(_ctr_crypt(
+        intlist_to_bytes(data), _key_expansion_words(intlist_to_bytes(key)), counter_blocks))
 
-    decrypted_data = []
-    for i in range(block_count):
-        counter_block = counter.next_value()
-        block = data[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES]
-        block += [0] * (BLOCK_SIZE_BYTES - len(block))
 
-        cipher_counter_block = aes_encrypt(counter_block, expanded_key)
-        decrypted_data += xor(block, cipher_counter_block)
-    decrypted_data = decrypted_data[:len(data)]
+def aes_ctr_decrypt_bytes(data, key, iv):
+    """
+    Decrypt with aes in counter mode
 
-    return decrypted_data
+    The counter block starts at iv and is incremented as a 128-Bit
+    big-endian integer for every block.
+
+    @param {bytes} data   cipher (bytes, bytearray or memoryview)
+    @param {bytes} key    16/24/32-Byte cipher key
+    @param {bytes} iv     16-Byte initial counter block
+    @returns {bytes}      decrypted data
+    """
+    return _ctr_crypt(
+        data, _key_expansion_words(key), _counter_blocks(_unpack_words(iv)))
 
 
 def aes_cbc_decrypt(data, key, iv):
@@ -43,21 +60,32 @@ def aes_cbc_decrypt(data, key, iv):
     @param {int[]} iv          16-Byte IV
     @returns {int[]}           decrypted data
     """
-    expanded_key = key_expansion(key)
-    block_count = int(ceil(float(len(data)) / BLOCK_SIZE_BYTES))
+    return bytes_to_intlist(aes_cbc_decrypt_bytes(
+        intlist_to_bytes(data), intlist_to_bytes(key), intlist_to_bytes(iv)))
 
-    decrypted_data = []
-    previous_cipher_block = iv
-    for i in range(block_count):
-        block = data[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES]
-        block += [0] * (BLOCK_SIZE_BYTES - len(block))
 
-        decrypted_block = aes_decrypt(block, expanded_key)
-        decrypted_data += xor(decrypted_block, previous_cipher_block)
-        previous_cipher_block = block
-    decrypted_data = decrypted_data[:len(data)]
+def aes_cbc_decrypt_bytes(data, key, iv):
+    """
+    Decrypt with aes in CBC mode
 
-    return decrypted_data
+    @param {bytes} data   cipher (bytes, bytearray or memoryview)
+    @param {bytes} key    16/24/32-Byte cipher key
+    @param {bytes} iv     16-Byte IV
+    @returns {bytes}      decrypted data, padding is not removed
+    """
+    round_keys = _decryption_round_keys(_key_expansion_words(key))
+    words = _unpack_words(data)
+    p0, p1, p2, p3 = _unpack_words(iv)
+
+    decrypted = []
+    append = decrypted.extend
+    for i in range(0, len(words), 4):
+        c0, c1, c2, c3 = words[i:i + 4]
+        d0, d1, d2, d3 = _decrypt_block(c0, c1, c2, c3, round_keys)
+        append((d0 ^ p0, d1 ^ p1, d2 ^ p2, d3 ^ p3))
+        p0, p1, p2, p3 = c0, c1, c2, c3
+
+    return _pack_words(decrypted)[:len(data)]
 
 
 def aes_cbc_encrypt(data, key, iv):
@@ -69,23 +97,36 @@ def aes_cbc_encrypt(data, key, iv):
     @param {int[]} iv          16-Byte IV
     @returns {int[]}           encrypted data
     """
-    expanded_key = key_expansion(key)
-    block_count = int(ceil(float(len(data)) / BLOCK_SIZE_BYTES))
+    return bytes_to_intlist(aes_cbc_encrypt_bytes(
+        intlist_to_bytes(data), intlist_to_bytes(key), intlist_to_bytes(iv)))
 
-    encrypted_data = []
-    previous_cipher_block = iv
-    for i in range(block_count):
-        block = data[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES]
-        remaining_length = BLOCK_SIZE_BYTES - len(block)
-        block += [remaining_length] * remaining_length
-        mixed_block = xor(block, previous_cipher_block)
 
-        encrypted_block = aes_encrypt(mixed_block, expanded_key)
-        encrypted_data += encrypted_block
+def aes_cbc_encrypt_bytes(data, key, iv):
+    """
+    Encrypt with aes in CBC mode. Using PKCS#7 padding
 
-        previous_cipher_block = encrypted_block
+    Like aes_cbc_encrypt, no padding block is added if the length of data
+    is a multiple of the block size.
 
-    return encrypted_data
+    @param {bytes} data   cleartext (bytes, bytearray or memoryview)
+    @param {bytes} key    16/24/32-Byte cipher key
+    @param {bytes} iv     16-Byte IV
+    @returns {bytes}      encrypted data
+    """
+    round_keys = _key_expansion_words(key)
+    remaining_length = -len(data) % BLOCK_SIZE_BYTES
+    words = _unpack_words(
+        _as_bytes(data) + compat_struct_pack('B', remaining_length) * remaining_length)
+    c0, c1, c2, c3 = _unpack_words(iv)
+
+    encrypted = []
+    append = encrypted.extend
+    for i in range(0, len(words), 4):
+        m0, m1, m2, m3 = words[i:i + 4]
+        c0, c1, c2, c3 = _encrypt_block(m0 ^ c0, m1 ^ c1, m2 ^ c2, m3 ^ c3, round_keys)
+        append((c0, c1, c2, c3))
+
+    return _pack_words(encrypted)
 
 
 def key_expansion(data):
@@ -95,32 +136,7 @@ def key_expansion(data):
     @param {int[]} data  16/24/32-Byte cipher key
     @returns {int[]}     176/208/240-Byte expanded key
     """
-    data = data[:]  # copy
-    rcon_iteration = 1
-    key_size_bytes = len(data)
-    expanded_key_size_bytes = (key_size_bytes // 4 + 7) * BLOCK_SIZE_BYTES
-
-    while len(data) < expanded_key_size_bytes:
-        temp = data[-4:]
-        temp = key_schedule_core(temp, rcon_iteration)
-        rcon_iteration += 1
-        data += xor(temp, data[-key_size_bytes: 4 - key_size_bytes])
-
-        for _ in range(3):
-            temp = data[-4:]
-            data += xor(temp, data[-key_size_bytes: 4 - key_size_bytes])
-
-        if key_size_bytes == 32:
-            temp = data[-4:]
-            temp = sub_bytes(temp)
-            data += xor(temp, data[-key_size_bytes: 4 - key_size_bytes])
-
-        for _ in range(3 if key_size_bytes == 32 else 2 if key_size_bytes == 24 else 0):
-            temp = data[-4:]
-            data += xor(temp, data[-key_size_bytes: 4 - key_size_bytes])
-    data = data[:expanded_key_size_bytes]
-
-    return data
+    return bytes_to_intlist(_pack_words(_key_expansion_words(intlist_to_bytes(data))))
 
 
 def aes_encrypt(data, expanded_key):
@@ -131,17 +147,14 @@ def aes_encrypt(data, expanded_key):
     @param {int[]} expanded_key  176/208/240-Byte expanded key
     @returns {int[]}             16-Byte cipher
     """
-    rounds = len(expanded_key) // BLOCK_SIZE_BYTES - 1
-
-    data = xor(data, expanded_key[:BLOCK_SIZE_BYTES])
-    for i in range(1, rounds + 1):
-        data = sub_bytes(data)
-        data = shift_rows(data)
-        if i != rounds:
-            data = mix_columns(data)
-        data = xor(data, expanded_key[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES])
-
-    return data
+    data = data[:BLOCK_SIZE_BYTES]
+    round_keys = _unpack_words(intlist_to_bytes(
+        expanded_key[:len(expanded_key) // BLOCK_SIZE_BYTES * BLOCK_SIZE_BYTES]))
+    if len(round_keys) <= 4:
+        # Without rounds only the first round key is added
+        return [x ^ y for x, y in zip(data, expanded_key)]
+    block = _encrypt_block(*(_unpack_words(intlist_to_bytes(data)) + (round_keys,)))
+    return bytes_to_intlist(_pack_words(block))[:len(data)]
 
 
 def aes_decrypt(data, expanded_key):
@@ -152,17 +165,15 @@ def aes_decrypt(data, expanded_key):
     @param {int[]} expanded_key  176/208/240-Byte expanded key
     @returns {int[]}             16-Byte state
     """
-    rounds = len(expanded_key) // BLOCK_SIZE_BYTES - 1
-
-    for i in range(rounds, 0, -1):
-        data = xor(data, expanded_key[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES])
-        if i != rounds:
-            data = mix_columns_inv(data)
-        data = shift_rows_inv(data)
-        data = sub_bytes_inv(data)
-    data = xor(data, expanded_key[:BLOCK_SIZE_BYTES])
-
-    return data
+    data = data[:BLOCK_SIZE_BYTES]
+    round_keys = _unpack_words(intlist_to_bytes(
+        expanded_key[:len(expanded_key) // BLOCK_SIZE_BYTES * BLOCK_SIZE_BYTES]))
+    if len(round_keys) <= 4:
+        # Without rounds only the first round key is added
+        return [x ^ y for x, y in zip(data, expanded_key)]
+    block = _decrypt_block(*(
+        _unpack_words(intlist_to_bytes(data)) + (_decryption_round_keys(round_keys),)))
+    return bytes_to_intlist(_pack_words(block))[:len(data)]
 
 
 def aes_decrypt_text(data, password, key_size_bytes):
@@ -180,27 +191,19 @@ def aes_decrypt_text(data, password, key_size_bytes):
     """
     NONCE_LENGTH_BYTES = 8
 
-    data = bytes_to_intlist(base64.b64decode(data.encode('utf-8')))
-    password = bytes_to_intlist(password.encode('utf-8'))
+    data = base64.b64decode(data.encode('utf-8'))
+    password = password.encode('utf-8')
 
-    key = password[:key_size_bytes] + [0] * (key_size_bytes - len(password))
-    key = aes_encrypt(key[:BLOCK_SIZE_BYTES], key_expansion(key)) * (key_size_bytes // BLOCK_SIZE_BYTES)
+    key = password[:key_size_bytes] + b'\0' * (key_size_bytes - len(password))
+    key_block = _encrypt_block(*(
+        _unpack_words(key[:BLOCK_SIZE_BYTES]) + (_key_expansion_words(key),)))
+    key = _pack_words(key_block) * (key_size_bytes // BLOCK_SIZE_BYTES)
 
     nonce = data[:NONCE_LENGTH_BYTES]
     cipher = data[NONCE_LENGTH_BYTES:]
 
-    class Counter(object):
-        __value = nonce + [0] * (BLOCK_SIZE_BYTES - NONCE_LENGTH_BYTES)
-
-        def next_value(self):
-            temp = self.__value
-            self.__value = inc(self.__value)
-            return temp
-
-    decrypted_data = aes_ctr_decrypt(cipher, key, Counter())
-    plaintext = intlist_to_bytes(decrypted_data)
-
-    return plaintext
+    return aes_ctr_decrypt_bytes(
+        cipher, key, nonce + b'\0' * (BLOCK_SIZE_BYTES - NONCE_LENGTH_BYTES))
 
 
 RCON = (0x8d, 0x01, 0x02, 0x04, 0x08, 0x10, 0x20, 0x40, 0x80, 0x1b, 0x36)
@@ -236,126 +239,171 @@ SBOX_INV = (0x52, 0x09, 0x6a, 0xd5, 0x30, 0x36, 0xa5, 0x38, 0xbf, 0x40, 0xa3, 0x
             0x60, 0x51, 0x7f, 0xa9, 0x19, 0xb5, 0x4a, 0x0d, 0x2d, 0xe5, 0x7a, 0x9f, 0x93, 0xc9, 0x9c, 0xef,
             0xa0, 0xe0, 0x3b, 0x4d, 0xae, 0x2a, 0xf5, 0xb0, 0xc8, 0xeb, 0xbb, 0x3c, 0x83, 0x53, 0x99, 0x61,
             0x17, 0x2b, 0x04, 0x7e, 0xba, 0x77, 0xd6, 0x26, 0xe1, 0x69, 0x14, 0x63, 0x55, 0x21, 0x0c, 0x7d)
-MIX_COLUMN_MATRIX = ((0x2, 0x3, 0x1, 0x1),
-                     (0x1, 0x2, 0x3, 0x1),
-                     (0x1, 0x1, 0x2, 0x3),
-                     (0x3, 0x1, 0x1, 0x2))
-MIX_COLUMN_MATRIX_INV = ((0xE, 0xB, 0xD, 0x9),
-                         (0x9, 0xE, 0xB, 0xD),
-                         (0xD, 0x9, 0xE, 0xB),
-                         (0xB, 0xD, 0x9, 0xE))
-RIJNDAEL_EXP_TABLE = (0x01, 0x03, 0x05, 0x0F, 0x11, 0x33, 0x55, 0xFF, 0x1A, 0x2E, 0x72, 0x96, 0xA1, 0xF8, 0x13, 0x35,
-                      0x5F, 0xE1, 0x38, 0x48, 0xD8, 0x73, 0x95, 0xA4, 0xF7, 0x02, 0x06, 0x0A, 0x1E, 0x22, 0x66, 0xAA,
-                      0xE5, 0x34, 0x5C, 0xE4, 0x37, 0x59, 0xEB, 0x26, 0x6A, 0xBE, 0xD9, 0x70, 0x90, 0xAB, 0xE6, 0x31,
-                      0x53, 0xF5, 0x04, 0x0C, 0x14, 0x3C, 0x44, 0xCC, 0x4F, 0xD1, 0x68, 0xB8, 0xD3, 0x6E, 0xB2, 0xCD,
-                      0x4C, 0xD4, 0x67, 0xA9, 0xE0, 0x3B, 0x4D, 0xD7, 0x62, 0xA6, 0xF1, 0x08, 0x18, 0x28, 0x78, 0x88,
-                      0x83, 0x9E, 0xB9, 0xD0, 0x6B, 0xBD, 0xDC, 0x7F, 0x81, 0x98, 0xB3, 0xCE, 0x49, 0xDB, 0x76, 0x9A,
-                      0xB5, 0xC4, 0x57, 0xF9, 0x10, 0x30, 0x50, 0xF0, 0x0B, 0x1D, 0x27, 0x69, 0xBB, 0xD6, 0x61, 0xA3,
-                      0xFE, 0x19, 0x2B, 0x7D, 0x87, 0x92, 0xAD, 0xEC, 0x2F, 0x71, 0x93, 0xAE, 0xE9, 0x20, 0x60, 0xA0,
-                      0xFB, 0x16, 0x3A, 0x4E, 0xD2, 0x6D, 0xB7, 0xC2, 0x5D, 0xE7, 0x32, 0x56, 0xFA, 0x15, 0x3F, 0x41,
-                      0xC3, 0x5E, 0xE2, 0x3D, 0x47, 0xC9, 0x40, 0xC0, 0x5B, 0xED, 0x2C, 0x74, 0x9C, 0xBF, 0xDA, 0x75,
-                      0x9F, 0xBA, 0xD5, 0x64, 0xAC, 0xEF, 0x2A, 0x7E, 0x82, 0x9D, 0xBC, 0xDF, 0x7A, 0x8E, 0x89, 0x80,
-                      0x9B, 0xB6, 0xC1, 0x58, 0xE8, 0x23, 0x65, 0xAF, 0xEA, 0x25, 0x6F, 0xB1, 0xC8, 0x43, 0xC5, 0x54,
-                      0xFC, 0x1F, 0x21, 0x63, 0xA5, 0xF4, 0x07, 0x09, 0x1B, 0x2D, 0x77, 0x99, 0xB0, 0xCB, 0x46, 0xCA,
-                      0x45, 0xCF, 0x4A, 0xDE, 0x79, 0x8B, 0x86, 0x91, 0xA8, 0xE3, 0x3E, 0x42, 0xC6, 0x51, 0xF3, 0x0E,
-                      0x12, 0x36, 0x5A, 0xEE, 0x29, 0x7B, 0x8D, 0x8C, 0x8F, 0x8A, 0x85, 0x94, 0xA7, 0xF2, 0x0D, 0x17,
-                      0x39, 0x4B, 0xDD, 0x7C, 0x84, 0x97, 0xA2, 0xFD, 0x1C, 0x24, 0x6C, 0xB4, 0xC7, 0x52, 0xF6, 0x01)
-RIJNDAEL_LOG_TABLE = (0x00, 0x00, 0x19, 0x01, 0x32, 0x02, 0x1a, 0xc6, 0x4b, 0xc7, 0x1b, 0x68, 0x33, 0xee, 0xdf, 0x03,
-                      0x64, 0x04, 0xe0, 0x0e, 0x34, 0x8d, 0x81, 0xef, 0x4c, 0x71, 0x08, 0xc8, 0xf8, 0x69, 0x1c, 0xc1,
-                      0x7d, 0xc2, 0x1d, 0xb5, 0xf9, 0xb9, 0x27, 0x6a, 0x4d, 0xe4, 0xa6, 0x72, 0x9a, 0xc9, 0x09, 0x78,
-                      0x65, 0x2f, 0x8a, 0x05, 0x21, 0x0f, 0xe1, 0x24, 0x12, 0xf0, 0x82, 0x45, 0x35, 0x93, 0xda, 0x8e,
-                      0x96, 0x8f, 0xdb, 0xbd, 0x36, 0xd0, 0xce, 0x94, 0x13, 0x5c, 0xd2, 0xf1, 0x40, 0x46, 0x83, 0x38,
-                      0x66, 0xdd, 0xfd, 0x30, 0xbf, 0x06, 0x8b, 0x62, 0xb3, 0x25, 0xe2, 0x98, 0x22, 0x88, 0x91, 0x10,
-                      0x7e, 0x6e, 0x48, 0xc3, 0xa3, 0xb6, 0x1e, 0x42, 0x3a, 0x6b, 0x28, 0x54, 0xfa, 0x85, 0x3d, 0xba,
-                      0x2b, 0x79, 0x0a, 0x15, 0x9b, 0x9f, 0x5e, 0xca, 0x4e, 0xd4, 0xac, 0xe5, 0xf3, 0x73, 0xa7, 0x57,
-                      0xaf, 0x58, 0xa8, 0x50, 0xf4, 0xea, 0xd6, 0x74, 0x4f, 0xae, 0xe9, 0xd5, 0xe7, 0xe6, 0xad, 0xe8,
-                      0x2c, 0xd7, 0x75, 0x7a, 0xeb, 0x16, 0x0b, 0xf5, 0x59, 0xcb, 0x5f, 0xb0, 0x9c, 0xa9, 0x51, 0xa0,
-                      0x7f, 0x0c, 0xf6, 0x6f, 0x17, 0xc4, 0x49, 0xec, 0xd8, 0x43, 0x1f, 0x2d, 0xa4, 0x76, 0x7b, 0xb7,
-                      0xcc, 0xbb, 0x3e, 0x5a, 0xfb, 0x60, 0xb1, 0x86, 0x3b, 0x52, 0xa1, 0x6c, 0xaa, 0x55, 0x29, 0x9d,
-                      0x97, 0xb2, 0x87, 0x90, 0x61, 0xbe, 0xdc, 0xfc, 0xbc, 0x95, 0xcf, 0xcd, 0x37, 0x3f, 0x5b, 0xd1,
-                      0x53, 0x39, 0x84, 0x3c, 0x41, 0xa2, 0x6d, 0x47, 0x14, 0x2a, 0x9e, 0x5d, 0x56, 0xf2, 0xd3, 0xab,
-                      0x44, 0x11, 0x92, 0xd9, 0x23, 0x20, 0x2e, 0x89, 0xb4, 0x7c, 0xb8, 0x26, 0x77, 0x99, 0xe3, 0xa5,
-                      0x67, 0x4a, 0xed, 0xde, 0xc5, 0x31, 0xfe, 0x18, 0x0d, 0x63, 0x8c, 0x80, 0xc0, 0xf7, 0x70, 0x07)
-
-
-def sub_bytes(data):
-    return [SBOX[x] for x in data]
-
-
-def sub_bytes_inv(data):
-    return [SBOX_INV[x] for x in data]
-
-
-def rotate(data):
-    return data[1:] + [data[0]]
-
-
-def key_schedule_core(data, rcon_iteration):
-    data = rotate(data)
-    data = sub_bytes(data)
-    data[0] = data[0] ^ RCON[rcon_iteration]
-
-    return data
-
-
-def xor(data1, data2):
-    return [x ^ y for x, y in zip(data1, data2)]
-
-
-def rijndael_mul(a, b):
-    if(a == 0 or b == 0):
-        return 0
-    return RIJNDAEL_EXP_TABLE[(RIJNDAEL_LOG_TABLE[a] + RIJNDAEL_LOG_TABLE[b]) % 0xFF]
-
-
-def mix_column(data, matrix):
-    data_mixed = []
-    for row in range(4):
-        mixed = 0
-        for column in range(4):
-            # xor is (+) and (-)
-            mixed ^= rijndael_mul(data[column], matrix[row][column])
-        data_mixed.append(mixed)
-    return data_mixed
-
-
-def mix_columns(data, matrix=MIX_COLUMN_MATRIX):
-    data_mixed = []
-    for i in range(4):
-        column = data[i * 4: (i + 1) * 4]
-        data_mixed += mix_column(column, matrix)
-    return data_mixed
-
-
-def mix_columns_inv(data):
-    return mix_columns(data, MIX_COLUMN_MATRIX_INV)
-
-
-def shift_rows(data):
-    data_shifted = []
-    for column in range(4):
-        for row in range(4):
-            data_shifted.append(data[((column + row) & 0b11) * 4 + row])
-    return data_shifted
-
-
-def shift_rows_inv(data):
-    data_shifted = []
-    for column in range(4):
-        for row in range(4):
-            data_shifted.append(data[((column - row) & 0b11) * 4 + row])
-    return data_shifted
-
-
-def inc(data):
-    data = data[:]  # copy
-    for i in range(len(data) - 1, -1, -1):
-        if data[i] == 255:
-            data[i] = 0
-        else:
-            data[i] = data[i] + 1
-            break
-    return data
 
 
-__all__ = ['aes_encrypt', 'key_expansion', 'aes_ctr_decrypt', 'aes_cbc_decrypt', 'aes_decrypt_text']
+def _make_tables():
+    def xtime(x):
+        x <<= 1
+        return x ^ 0x11B if x & 0x100 else x
+
+    def rotations(table):
+        tables = [table]
+        for _ in range(3):
+            table = tuple((x >> 8) | ((x & 0xFF) << 24) for x in table)
+            tables.append(table)
+        return tables
+
+    encryption_table = []
+    decryption_table = []
+    for x in range(256):
+        s = SBOX[x]
+        s2 = xtime(s)
+        encryption_table.append(s2 << 24 | s << 16 | s << 8 | s2 ^ s)
+
+        s = SBOX_INV[x]
+        s2 = xtime(s)
+        s4 = xtime(s2)
+        s8 = xtime(s4)
+        decryption_table.append(
+            (s8 ^ s4 ^ s2) << 24 | (s8 ^ s) << 16 | (s8 ^ s4 ^ s) << 8 | s8 ^ s2 ^ s)
+
+    return rotations(tuple(encryption_table)), rotations(tuple(decryption_table))
+
+
+# TE0[x] is the column SubBytes and MixColumns turn x into, TD0[x] the one
+# of InvSubBytes and InvMixColumns; TEn and TDn are rotated by n bytes
+(TE0, TE1, TE2, TE3), (TD0, TD1, TD2, TD3) = _make_tables()
+
+
+def _as_bytes(data):
+    if isinstance(data, memoryview):
+        return data.tobytes()
+    return bytes(data)
+
+
+def _unpack_words(data):
+    """Unpack data into big-endian 32-bit words, padded with 0s to whole blocks"""
+    data = _as_bytes(data)
+    padding = -len(data) % BLOCK_SIZE_BYTES
+    if padding:
+        data += b'\0' * padding
+    return compat_struct_unpack('>%dI' % (len(data) // 4), data)
+
+
+def _pack_words(words):
+    return compat_struct_pack('>%dI' % len(words), *words)
+
+
+def _sub_word(word):
+    return SBOX[word >> 24] << 24 | SBOX[word >> 16 & 0xFF] << 16 | SBOX[word >> 8 & 0xFF] << 8 | SBOX[word & 0xFF]
+
+
+def _key_expansion_words(key):
+    """Return the key schedule of a 16/24/32-Byte key as a list of words"""
+    key = _as_bytes(key)
+    key_size_words = len(key) // 4
+    words = list(compat_struct_unpack('>%dI' % key_size_words, key))
+    for i in range(key_size_words, (key_size_words + 7) * 4):
+        temp = words[-1]
+        if i % key_size_words == 0:
+            temp = _sub_word((temp << 8 | temp >> 24) & 0xFFFFFFFF) ^ (RCON[i // key_size_words] << 24)
+        elif key_size_words > 6 and i % key_size_words == 4:
+            temp = _sub_word(temp)
+        words.append(words[-key_size_words] ^ temp)
+    return words
+
+
+def _decryption_round_keys(round_keys):
+    """
+    Return the key schedule for the equivalent inverse cipher: the round
+    keys in reverse order, the inner ones transformed with InvMixColumns
+    """
+    rounds = len(round_keys) // 4 - 1
+    decryption_keys = []
+    for i in range(rounds, -1, -1):
+        words = round_keys[i * 4:(i + 1) * 4]
+        if 0 < i < rounds:
+            words = [
+                TD0[SBOX[w >> 24]] ^ TD1[SBOX[w >> 16 & 0xFF]] ^ TD2[SBOX[w >> 8 & 0xFF]] ^ TD3[SBOX[w & 0xFF]]
+                for w in words]
+        decryption_keys.extend(words)
+    return decryption_keys
+
+
+def _encrypt_block(s0, s1, s2, s3, round_keys):
+    te0, te1, te2, te3, sbox = TE0, TE1, TE2, TE3, SBOX
+
+    s0 ^= round_keys[0]
+    s1 ^= round_keys[1]
+    s2 ^= round_keys[2]
+    s3 ^= round_keys[3]
+    for i in range(4, len(round_keys) - 4, 4):
+        s0, s1, s2, s3 = (
+            te0[s0 >> 24] ^ te1[s1 >> 16 & 0xFF] ^ te2[s2 >> 8 & 0xFF] ^ te3[s3 & 0xFF] ^ round_keys[i],
+            te0[s1 >> 24] ^ te1[s2 >> 16 & 0xFF] ^ te2[s3 >> 8 & 0xFF] ^ te3[s0 & 0xFF] ^ round_keys[i + 1],
+            te0[s2 >> 24] ^ te1[s3 >> 16 & 0xFF] ^ te2[s0 >> 8 & 0xFF] ^ te3[s1 & 0xFF] ^ round_keys[i + 2],
+            te0[s3 >> 24] ^ te1[s0 >> 16 & 0xFF] ^ te2[s1 >> 8 & 0xFF] ^ te3[s2 & 0xFF] ^ round_keys[i + 3])
+
+    # The last round has no MixColumns step
+    i = len(round_keys) - 4
+    return (
+        (sbox[s0 >> 24] << 24 | sbox[s1 >> 16 & 0xFF] << 16 | sbox[s2 >> 8 & 0xFF] << 8 | sbox[s3 & 0xFF]) ^ round_keys[i],
+        (sbox[s1 >> 24] << 24 | sbox[s2 >> 16 & 0xFF] << 16 | sbox[s3 >> 8 & 0xFF] << 8 | sbox[s0 & 0xFF]) ^ round_keys[i + 1],
+        (sbox[s2 >> 24] << 24 | sbox[s3 >> 16 & 0xFF] << 16 | sbox[s0 >> 8 & 0xFF] << 8 | sbox[s1 & 0xFF]) ^ round_keys[i + 2],
+        (sbox[s3 >> 24] << 24 | sbox[s0 >> 16 & 0xFF] << 16 | sbox[s1 >> 8 & 0xFF] << 8 | sbox[s2 & 0xFF]) ^ round_keys[i + 3])
+
+
+def _decrypt_block(s0, s1, s2, s3, round_keys):
+    """Decrypt one block with round keys from _decryption_round_keys"""
+    td0, td1, td2, td3, sbox_inv = TD0, TD1, TD2, TD3, SBOX_INV
+
+    s0 ^= round_keys[0]
+    s1 ^= round_keys[1]
+    s2 ^= round_keys[2]
+    s3 ^= round_keys[3]
+    for i in range(4, len(round_keys) - 4, 4):
+        s0, s1, s2, s3 = (
+            td0[s0 >> 24] ^ td1[s3 >> 16 & 0xFF] ^ td2[s2 >> 8 & 0xFF] ^ td3[s1 & 0xFF] ^ round_keys[i],
+            td0[s1 >> 24] ^ td1[s0 >> 16 & 0xFF] ^ td2[s3 >> 8 & 0xFF] ^ td3[s2 & 0xFF] ^ round_keys[i + 1],
+            td0[s2 >> 24] ^ td1[s1 >> 16 & 0xFF] ^ td2[s0 >> 8 & 0xFF] ^ td3[s3 & 0xFF] ^ round_keys[i + 2],
+            td0[s3 >> 24] ^ td1[s2 >> 16 & 0xFF] ^ td2[s1 >> 8 & 0xFF] ^ td3[s0 & 0xFF] ^ round_keys[i + 3])
+
+    i = len(round_keys) - 4
+    return (
+        (sbox_inv[s0 >> 24] << 24 | sbox_inv[s3 >> 16 & 0xFF] << 16 | sbox_inv[s2 >> 8 & 0xFF] << 8 | sbox_inv[s1 & 0xFF]) ^ round_keys[i],
+        (sbox_inv[s1 >> 24] << 24 | sbox_inv[s0 >> 16 & 0xFF] << 16 | sbox_inv[s3 >> 8 & 0xFF] << 8 | sbox_inv[s2 & 0xFF]) ^ round_keys[i + 1],
+        (sbox_inv[s2 >> 24] << 24 | sbox_inv[s1 >> 16 & 0xFF] << 16 | sbox_inv[s0 >> 8 & 0xFF] << 8 | sbox_inv[s3 & 0xFF]) ^ round_keys[i + 2],
+        (sbox_inv[s3 >> 24] << 24 | sbox_inv[s2 >> 16 & 0xFF] << 16 | sbox_inv[s1 >> 8 & 0xFF] << 8 | sbox_inv[s0 & 0xFF]) ^ round_keys[i + 3])
+
+
+def _counter_blocks(block):
+    """Generate counter blocks starting with block, incrementing it as a 128-Bit integer"""
+    c0, c1, c2, c3 = block
+    value = c0 << 96 | c1 << 64 | c2 << 32 | c3
+    while True:
+        yield value >> 96, value >> 64 & 0xFFFFFFFF, value >> 32 & 0xFFFFFFFF, value & 0xFFFFFFFF
+        value = (value + 1) & 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF
+
+
+def _ctr_crypt(data, round_keys, counter_blocks):
+    words = _unpack_words(data)
+
+    crypted = []
+    append = crypted.extend
+    for i, (c0, c1, c2, c3) in zip(range(0, len(words), 4), counter_blocks):
+        k0, k1, k2, k3 = _encrypt_block(c0, c1, c2, c3, round_keys)
+        append((words[i] ^ k0, words[i + 1] ^ k1, words[i + 2] ^ k2, words[i + 3] ^ k3))
+
+    return _pack_words(crypted)[:len(data)]
+
+
+__all__ = [
+    'aes_encrypt',
+    'key_expansion',
+    'aes_ctr_decrypt',
+    'aes_ctr_decrypt_bytes',
+    'aes_cbc_decrypt',
+    'aes_cbc_decrypt_bytes',
+    'aes_cbc_encrypt_bytes',
+    'aes_decrypt_text',
+]
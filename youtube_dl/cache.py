@@ -1,21 +1,101 @@
 from __future__ import unicode_literals
 
+import base64
+import collections
+import copy
+import email.message
+import email.utils
 import errno
+import hashlib
 import io
 import json
 import os
 import re
 import shutil
+import threading
+import time
 import traceback
 
-from .compat import compat_getenv
+from .compat import (
+    compat_getenv,
+    compat_urllib_error,
+    compat_urllib_request,
+    compat_urllib_response,
+)
 from .utils import (
     expand_path,
+    sanitized_Request,
+    std_headers,
+    update_Request,
     write_json_file,
 )
 
 
+class _MemoTier(object):
+    """
+    Process-wide, thread-safe LRU cache of parsed cache files. An entry is
+    only used as long as its file is unchanged, so files written by other
+    processes are picked up.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _signature(stat):
+        # Files are replaced rather than rewritten, hence the inode
+        return stat.st_ino, stat.st_mtime, stat.st_size
+
+    def get(self, fn, stat):
+        with self._lock:
+            entry = self._entries.pop(fn, None)
+            if entry is None or entry[0] != self._signature(stat):
+                return None
+            # Move to the most recently used end
+            self._entries[fn] = entry
+            return entry[1]
+
+    def put(self, fn, stat, data):
+        with self._lock:
+            self._entries.pop(fn, None)
+            self._entries[fn] = (self._signature(stat), data)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, fn=None):
+        with self._lock:
+            if fn is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(fn, None)
+
+
 class Cache(object):
+    """
+    Filesystem cache of JSON data, stored as <cachedir>/<section>/<key>.json
+
+    Entries stored with a ttl expire after ttl seconds. Every file is
+    written atomically, so concurrent writers never corrupt entries, and
+    parsed files are kept in memory for as long as they do not change.
+    With the cache_max_size parameter, the least recently used entries are
+    removed once the total size of the entries exceeds it. The cache
+    directory is walked on the first store of the process and then only
+    when what has been stored since may have made it exceed the limit.
+    """
+
+    # Entries with an expiry time are stored as objects with these keys
+    _EXPIRES_KEY = '_ytdl_cache_expires'
+    _DATA_KEY = '_ytdl_cache_data'
+
+    _memo = _MemoTier()
+    # Total size of the entries per cache directory as of the last walk,
+    # plus what has been stored since, so that the directory is only
+    # walked when it may exceed cache_max_size
+    _sizes = {}
+    _sizes_lock = threading.Lock()
+
     def __init__(self, ydl):
         self._ydl = ydl
 
@@ -37,13 +117,22 @@ class Cache(object):
     def enabled(self):
         return self._ydl.params.get('cachedir') is not False
 
-    def store(self, section, key, data, dtype='json'):
+    def store(self, section, key, data, dtype='json', ttl=None):
         assert dtype in ('json',)
 
         if not self.enabled:
             return
 
         fn = self._get_cache_fn(section, key, dtype)
+        if ttl is not None:
+            data = {
+                self._EXPIRES_KEY: time.time() + ttl,
+                self._DATA_KEY: data,
+            }
+        try:
+            old_size = os.path.getsize(fn)
+        except OSError:
+            old_size = 0
         try:
             try:
                 os.makedirs(os.path.dirname(fn))
@@ -51,10 +140,23 @@ class Cache(object):
                 if ose.errno != errno.EEXIST:
                     raise
             write_json_file(data, fn)
+            new_size = os.path.getsize(fn)
         except Exception:
             tb = traceback.format_exc()
             self._ydl.report_warning(
                 'Writing cache to %r failed: %s' % (fn, tb))
+            return
+        self._memo.discard(fn)
+
+        max_size = self._ydl.params.get('cache_max_size')
+        if max_size is not None:
+            root_dir = self._get_root_dir()
+            with self._sizes_lock:
+                total_size = self._sizes.get(root_dir)
+                if total_size is not None:
+                    total_size = self._sizes[root_dir] = total_size + new_size - old_size
+            if total_size is None or total_size > max_size:
+                self._evict(max_size)
 
     def load(self, section, key, dtype='json', default=None):
         assert dtype in ('json',)
@@ -64,20 +166,78 @@ class Cache(object):
 
         cache_fn = self._get_cache_fn(section, key, dtype)
         try:
+            stat = os.stat(cache_fn)
+        except OSError:
+            return default  # No cache available
+
+        data = self._memo.get(cache_fn, stat)
+        if data is None:
             try:
-                with io.open(cache_fn, 'r', encoding='utf-8') as cachef:
-                    return json.load(cachef)
-            except ValueError:
                 try:
-                    file_size = os.path.getsize(cache_fn)
-                except (OSError, IOError) as oe:
-                    file_size = str(oe)
-                self._ydl.report_warning(
-                    'Cache retrieval from %s failed (%s)' % (cache_fn, file_size))
-        except IOError:
-            pass  # No cache available
+                    with io.open(cache_fn, 'r', encoding='utf-8') as cachef:
+                        data = json.load(cachef)
+                except ValueError:
+                    try:
+                        file_size = os.path.getsize(cache_fn)
+                    except (OSError, IOError) as oe:
+                        file_size = str(oe)
+                    self._ydl.report_warning(
+                        'Cache retrieval from %s failed (%s)' % (cache_fn, file_size))
+                    return default
+            except IOError:
+                return default  # No cache available
+            self._memo.put(cache_fn, stat, data)
+
+        if isinstance(data, dict) and set(data) == set((self._EXPIRES_KEY, self._DATA_KEY)):
+            if data[self._EXPIRES_KEY] < time.time():
+                self._remove_entry(cache_fn)
+                return default
+            data = data[self._DATA_KEY]
+
+        self._touch(cache_fn, stat)
+        # Callers are free to modify what they get
+        return copy.deepcopy(data)
+
+    @staticmethod
+    def _touch(fn, stat):
+        # The access time is the LRU order for eviction. It is set
+        # explicitly since file systems may not keep it up to date; the
+        # modification time is left alone.
+        try:
+            os.utime(fn, (time.time(), stat.st_mtime))
+        except OSError:
+            pass
+
+    def _remove_entry(self, fn):
+        self._memo.discard(fn)
+        try:
+            os.remove(fn)
+        except OSError:
+            pass
 
-        return default
+    def _evict(self, max_size):
+        """Remove the least recently used entries until their total size does not exceed max_size"""
+        entries = []
+        total_size = 0
+        for dirpath, _, filenames in os.walk(self._get_root_dir()):
+            for filename in filenames:
+                if not filename.endswith('.json'):
+                    continue
+                fn = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(fn)
+                except OSError:
+                    continue
+                entries.append((stat.st_atime, stat.st_size, fn))
+                total_size += stat.st_size
+        entries.sort()
+        for _, size, fn in entries:
+            if total_size <= max_size:
+                break
+            self._remove_entry(fn)
+            total_size -= size
+        with self._sizes_lock:
+            self._sizes[self._get_root_dir()] = total_size
 
     def remove(self):
         if not self.enabled:
@@ -93,4 +253,202 @@ class Cache(object):
         if os.path.exists(cachedir):
             self._ydl.to_screen('.', skip_eol=True)
             shutil.rmtree(cachedir)
+        self._memo.discard()
+        with self._sizes_lock:
+            self._sizes.pop(cachedir, None)
         self._ydl.to_screen('.')
+
+
+class HTTPResponseCache(object):
+    """
+    Cache of the HTTP responses to the GET requests of the extractors,
+    stored in the filesystem cache.
+
+    A response is fresh for the lifetime given by its Cache-Control max-age
+    or Expires headers, at most http_cache_max_age seconds (the default
+    lifetime). A stale response is revalidated with a conditional request
+    if it has an ETag or a Last-Modified header and is dropped
+    http_cache_max_age seconds after it was stored. Requests with a body or
+    credentials and responses with Cache-Control no-store are never cached.
+    """
+
+    SECTION = 'http-responses'
+    DEFAULT_MAX_AGE = 3600
+
+    # Randomised for every session when bypassing geo restriction, so they
+    # would make every session miss
+    _KEY_IGNORED_HEADERS = ('x-forwarded-for',)
+
+    # Parameters that make requests depend on the user
+    _CREDENTIAL_PARAMS = (
+        'username', 'password', 'usenetrc', 'videopassword',
+        'ap_username', 'ap_password', 'cookiefile')
+
+    def __init__(self, ydl):
+        self._ydl = ydl
+        self._lock = threading.Lock()
+        # Extractor name -> [hits, revalidations, misses]
+        self._stats = {}
+
+    @property
+    def enabled(self):
+        return bool(self._ydl.params.get('http_cache')) and self._ydl.cache.enabled
+
+    @property
+    def max_age(self):
+        max_age = self._ydl.params.get('http_cache_max_age')
+        return self.DEFAULT_MAX_AGE if max_age is None else max_age
+
+    def _count(self, ie_name, idx):
+        with self._lock:
+            self._stats.setdefault(ie_name, [0, 0, 0])[idx] += 1
+
+    def format_stats(self):
+        lines = []
+        with self._lock:
+            for ie_name, (hits, revalidations, misses) in sorted(self._stats.items()):
+                total = hits + revalidations + misses
+                lines.append('%s: %d hits, %d revalidated, %d misses (%.0f%% served from cache)' % (
+                    ie_name, hits, revalidations, misses, 100.0 * (hits + revalidations) / total))
+        return lines
+
+    def cacheable(self, req):
+        if req.get_method() != 'GET' or req.data is not None:
+            return False
+        if any(h.lower() in ('authorization', 'cookie') for h, _ in req.header_items()):
+            return False
+        return not any(self._ydl.params.get(p) for p in self._CREDENTIAL_PARAMS)
+
+    def _key(self, req):
+        # The cookies from the cookie jar are only added by the opener, but
+        # the responses may depend on them as much as on any other header
+        req = update_Request(req)
+        self._ydl.cookiejar.add_cookie_header(req)
+        headers = dict((k.lower(), v) for k, v in std_headers.items())
+        headers.update((k.lower(), v) for k, v in req.header_items())
+        for h in self._KEY_IGNORED_HEADERS:
+            headers.pop(h, None)
+        key = json.dumps([req.get_method(), req.get_full_url(), sorted(headers.items())])
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _cache_control(headers):
+        directives = {}
+        for directive in (headers.get('Cache-Control') or '').split(','):
+            name, _, value = directive.strip().partition('=')
+            if name:
+                directives[name.lower()] = value.strip('"')
+        return directives
+
+    def _lifetime(self, headers):
+        """Freshness lifetime of a response in seconds, None if it must not be stored"""
+        directives = self._cache_control(headers)
+        if 'no-store' in directives:
+            return None
+        if 'no-cache' in directives:
+            return 0
+        lifetime = None
+        try:
+            lifetime = int(directives['max-age'])
+        except (KeyError, ValueError):
+            expires = email.utils.parsedate_tz(headers.get('Expires') or '')
+            if expires is not None:
+                lifetime = email.utils.mktime_tz(expires) - time.time()
+        if lifetime is None:
+            lifetime = self.max_age
+        return max(0, min(lifetime, self.max_age))
+
+    def _store(self, key, url, code, headers, body, now):
+        lifetime = self._lifetime(headers)
+        if lifetime is None or headers.get('Vary', '').strip() == '*':
+            return
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if not lifetime and not (etag or last_modified):
+            return
+        self._ydl.cache.store(self.SECTION, key, {
+            'url': url,
+            'code': code,
+            'headers': list(headers.items()),
+            'body': base64.b64encode(body).decode('ascii'),
+            'fresh_until': now + lifetime,
+            'etag': etag,
+            'last_modified': last_modified,
+        }, ttl=self.max_age)
+
+    @staticmethod
+    def _make_response(url, code, headers, body):
+        return compat_urllib_response.addinfourl(io.BytesIO(body), headers, url, code)
+
+    @staticmethod
+    def _entry_headers(entry):
+        headers = email.message.Message()
+        for name, value in entry['headers']:
+            headers[name] = value
+        return headers
+
+    def _entry_response(self, entry):
+        return self._make_response(
+            entry['url'], entry['code'], self._entry_headers(entry),
+            base64.b64decode(entry['body'].encode('ascii')))
+
+    def _replay_cookies(self, response):
+        # Cached responses do not go through the opener, so the cookies they
+        # set have to be put in the cookie jar explicitly
+        self._ydl.cookiejar.extract_cookies(response, sanitized_Request(response.geturl()))
+
+    def urlopen(self, req, ie_name):
+        """Open req like YoutubeDL.urlopen, answering from the cache when possible"""
+        if not isinstance(req, compat_urllib_request.Request):
+            req = sanitized_Request(req)
+        if not self.enabled or not self.cacheable(req):
+            return self._ydl.urlopen(req)
+
+        key = self._key(req)
+        now = time.time()
+        entry = self._ydl.cache.load(self.SECTION, key)
+        if entry and entry['fresh_until'] > now:
+            self._count(ie_name, 0)
+            response = self._entry_response(entry)
+            self._replay_cookies(response)
+            return response
+
+        conditional_headers = {}
+        if entry:
+            if entry.get('etag'):
+                conditional_headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                conditional_headers['If-Modified-Since'] = entry['last_modified']
+        if conditional_headers:
+            try:
+                urlh = self._ydl.urlopen(update_Request(req, headers=conditional_headers))
+            except compat_urllib_error.HTTPError as err:
+                if err.code != 304:
+                    raise
+                # Reading the empty body lets the connection be reused
+                err.read()
+                # Not modified: the stored response gets the new validity
+                # and any updated headers
+                body = base64.b64decode(entry['body'].encode('ascii'))
+                headers = self._entry_headers(entry)
+                for name, value in err.headers.items():
+                    # The opener has already handled the cookies of the 304
+                    if name.lower() in ('content-length', 'set-cookie'):
+                        continue
+                    del headers[name]
+                    headers[name] = value
+                self._store(key, entry['url'], entry['code'], headers, body, now)
+                self._count(ie_name, 1)
+                response = self._make_response(entry['url'], entry['code'], headers, body)
+                self._replay_cookies(response)
+                return response
+        else:
+            urlh = self._ydl.urlopen(req)
+
+        self._count(ie_name, 2)
+        body = urlh.read()
+        url = urlh.geturl()
+        code = urlh.getcode()
+        if code == 200:
+            self._store(key, url, code, urlh.headers, body, now)
+        return self._make_response(url, code, urlh.headers, body)
@@ -2346,6 +2346,11 @@ try:
 except ImportError:
     import BaseHTTPServer as compat_http_server
 
+try:
+    import queue as compat_queue
+except ImportError:  # Python 2
+    import Queue as compat_queue
+
 try:
     compat_str = unicode  # Python 2
 except NameError:
@@ -2932,6 +2937,7 @@ __all__ = [
     'compat_os_name',
     'compat_parse_qs',
     'compat_print',
+    'compat_queue',
     'compat_setenv',
     'compat_shlex_quote',
     'compat_shlex_split',
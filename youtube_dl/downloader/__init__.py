@@ -44,7 +44,8 @@ def get_suitable_downloader(info_dict, params={}):
             return ed
 
     if protocol.startswith('m3u8') and info_dict.get('is_live'):
-        return FFmpegFD
+        # The native downloader captures live streams only on request
+        return HlsFD if params.get('hls_prefer_native') is True else FFmpegFD
 
     if protocol == 'm3u8' and params.get('hls_prefer_native') is True:
         return HlsFD
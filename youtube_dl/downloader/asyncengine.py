@@ -0,0 +1,336 @@
+from __future__ import division, unicode_literals
+
+import asyncio
+import concurrent.futures
+import io
+import ssl
+import threading
+import time
+
+from ..compat import (
+    compat_http_client,
+    compat_urllib_error,
+    compat_urllib_parse_urlparse,
+    compat_urllib_response,
+    compat_urlparse,
+)
+from ..utils import (
+    sanitized_Request,
+    std_headers,
+)
+
+
+class AsyncEngine(object):
+    """
+    Event loop downloading fragments over HTTP.
+
+    The loop runs in a daemon thread and is shared by all the fragment
+    downloads of the process, so that many fragments of many streams are
+    multiplexed on a single thread instead of taking a thread each. Idle
+    connections are kept open and reused for later requests to the same host.
+    """
+
+    _MAX_REDIRECTS = 5
+    _BLOCK_SIZE = 64 * 1024
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        # Idle connections per (scheme, host, port)
+        self._idle = {}
+        thread = threading.Thread(target=self._run)
+        thread.daemon = True
+        thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule coro on the event loop and return a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def semaphore(self, value):
+        """Return a semaphore bound to the event loop"""
+        async def create():
+            return asyncio.Semaphore(value)
+        return self.submit(create()).result()
+
+    @staticmethod
+    def _ssl_context(params):
+        context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
+        if params.get('nocheckcertificate', False):
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        return context
+
+    async def _connect(self, key, params, timeout):
+        idle = self._idle.get(key)
+        if idle:
+            return idle.pop(), True
+        scheme, host, port = key
+        kwargs = {}
+        if scheme == 'https':
+            kwargs['ssl'] = self._ssl_context(params)
+        source_address = params.get('source_address')
+        if source_address is not None:
+            kwargs['local_addr'] = (source_address, 0)
+        conn = await asyncio.wait_for(
+            asyncio.open_connection(host, port, **kwargs), timeout)
+        return conn, False
+
+    def _release(self, key, conn):
+        self._idle.setdefault(key, []).append(conn)
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn[1].close()
+        except Exception:
+            pass
+
+    async def _read_body(self, reader, headers, timeout, on_data):
+        length = headers.get('Content-Length')
+        if headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout)
+                size = int(line.split(b';')[0].strip(), 16)
+                if size == 0:
+                    # Skip trailers
+                    while (await asyncio.wait_for(reader.readline(), timeout)).strip():
+                        pass
+                    return True
+                while size > 0:
+                    data = await asyncio.wait_for(
+                        reader.read(min(size, self._BLOCK_SIZE)), timeout)
+                    if not data:
+                        raise asyncio.IncompleteReadError(b'', size)
+                    size -= len(data)
+                    await on_data(data)
+                await asyncio.wait_for(reader.readexactly(2), timeout)
+        elif length is not None:
+            remaining = int(length)
+            while remaining > 0:
+                data = await asyncio.wait_for(
+                    reader.read(min(remaining, self._BLOCK_SIZE)), timeout)
+                if not data:
+                    raise asyncio.IncompleteReadError(b'', remaining)
+                remaining -= len(data)
+                await on_data(data)
+            return True
+        else:
+            while True:
+                data = await asyncio.wait_for(reader.read(self._BLOCK_SIZE), timeout)
+                if not data:
+                    # The end of the body is the end of the connection
+                    return False
+                await on_data(data)
+
+    async def _request(self, ydl, url, headers, timeout, on_data):
+        parsed = compat_urllib_parse_urlparse(url)
+        scheme = parsed.scheme.lower()
+        port = parsed.port or (443 if scheme == 'https' else 80)
+        key = (scheme, parsed.hostname, port)
+        path = parsed.path or '/'
+        if parsed.query:
+            path += '?' + parsed.query
+
+        req = sanitized_Request(url, None, headers)
+        ydl.cookiejar.add_cookie_header(req)
+        host = parsed.hostname if parsed.port is None else '%s:%d' % (parsed.hostname, parsed.port)
+        request = ['GET %s HTTP/1.1' % path, 'Host: %s' % host]
+        request.extend('%s: %s' % (k, v) for k, v in req.header_items() if k.lower() != 'host')
+        request = ('\r\n'.join(request) + '\r\n\r\n').encode('latin-1')
+
+        while True:
+            conn, reused = await self._connect(key, ydl.params, timeout)
+            reader, writer = conn
+            try:
+                writer.write(request)
+                await writer.drain()
+                status_line = await asyncio.wait_for(reader.readline(), timeout)
+                if not status_line:
+                    raise ConnectionResetError('connection closed by server')
+            except (OSError, asyncio.IncompleteReadError):
+                self._close(conn)
+                # The server may have closed an idle connection in the
+                # meantime, so try again with another one
+                if reused:
+                    continue
+                raise
+            break
+
+        try:
+            version, status = status_line.split()[:2]
+            status = int(status)
+            header_lines = []
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                header_lines.append(line)
+            response_headers = compat_http_client.parse_headers(io.BytesIO(b''.join(header_lines)))
+            response = compat_urllib_response.addinfourl(io.BytesIO(), response_headers, url, status)
+            ydl.cookiejar.extract_cookies(response, req)
+
+            if status in (204, 304):
+                complete, body = True, b''
+            elif status >= 300:
+                chunks = []
+
+                async def collect(data):
+                    chunks.append(data)
+                complete = await self._read_body(reader, response_headers, timeout, collect)
+                body = b''.join(chunks)
+            else:
+                complete = await self._read_body(reader, response_headers, timeout, on_data)
+                body = None
+        except BaseException:
+            self._close(conn)
+            raise
+        connection = response_headers.get('Connection', '').lower()
+        if complete and (connection == 'keep-alive' or (
+                version != b'HTTP/1.0' and connection != 'close')):
+            self._release(key, conn)
+        else:
+            self._close(conn)
+        return status, response_headers, body
+
+    async def fetch(self, ydl, url, headers, on_data):
+        """
+        GET url and call the coroutine function on_data with every block of
+        the response body.
+
+        headers are sent along with the standard headers. Redirects are
+        followed and an HTTPError is raised for error responses.
+        """
+        timeout = ydl.params.get('socket_timeout')
+        timeout = 600 if timeout is None else float(timeout)
+        req_headers = dict(std_headers)
+        req_headers.update(headers or {})
+        # Fragments are not compressed and have to be read as they are
+        req_headers['Accept-Encoding'] = 'identity'
+        for _ in range(self._MAX_REDIRECTS + 1):
+            status, response_headers, body = await self._request(
+                ydl, url, req_headers, timeout, on_data)
+            location = response_headers.get('Location')
+            if status in (301, 302, 303, 307, 308) and location:
+                url = compat_urlparse.urljoin(url, location)
+                continue
+            if status >= 400:
+                raise compat_urllib_error.HTTPError(
+                    url, status, compat_http_client.responses.get(status, ''),
+                    response_headers, io.BytesIO(body))
+            return response_headers
+        raise compat_urllib_error.HTTPError(
+            url, status, 'Too many redirects', response_headers, io.BytesIO(body))
+
+    async def _fetch_fragment(self, fd, url, headers, filename):
+        """
+        Download a whole fragment with fd's rate limits and report its
+        progress to fd's progress hooks under filename.
+
+        Returns the fragment content.
+        """
+        chunks = []
+        state = {
+            'status': 'downloading',
+            'downloaded_bytes': 0,
+            'filename': filename,
+            'tmpfilename': filename,
+        }
+        start = time.time()
+        # A list so that on_data can update it
+        last_progress = [start]
+        progress_interval = fd.progress_interval()
+
+        async def on_data(data):
+            chunks.append(data)
+            state['downloaded_bytes'] += len(data)
+            delay = fd.throttle_delay(len(data), url)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            now = time.time()
+            if now - last_progress[0] >= progress_interval:
+                last_progress[0] = now
+                state['elapsed'] = now - start
+                state['speed'] = fd.calc_speed(start, now, state['downloaded_bytes'])
+                fd._hook_progress(dict(state))
+
+        await self.fetch(fd.ydl, url, headers, on_data)
+        content = b''.join(chunks)
+        total_bytes = len(content)
+        fd._hook_progress({
+            'status': 'finished',
+            'downloaded_bytes': total_bytes,
+            'total_bytes': total_bytes,
+            'filename': filename,
+            'tmpfilename': filename,
+            'elapsed': time.time() - start,
+        })
+        return content
+
+    async def download_fragment(self, fd, url, headers, filename, semaphore,
+                                fragment_retries, report_retry_fragment):
+        """
+        Download a fragment once semaphore allows it, like
+        FragmentFD._download_fragment with an HttpFD.
+
+        Server errors and connection errors are retried up to fd's retries,
+        other HTTP errors up to fragment_retries times, calling
+        report_retry_fragment with the error and the attempt number before
+        each retry, all of them according to fd's retry policy.
+        Returns a (success, frag_content) tuple, where frag_content is None
+        if the fragment is still unavailable after all retries.
+        """
+        policy = fd.retry_policy
+        retries = fd.params.get('retries', 0)
+        async with semaphore:
+            count = errors = 0
+            while True:
+                delay = policy.host_delay(url)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                try:
+                    content = await self._fetch_fragment(fd, url, headers, filename)
+                except compat_urllib_error.HTTPError as err:
+                    if not policy.is_failure(err):
+                        count += 1
+                        if count > fragment_retries:
+                            return True, None
+                        report_retry_fragment(err, count)
+                        await asyncio.sleep(policy.delay(count, err))
+                        continue
+                    source_error = err
+                except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as err:
+                    source_error = err
+                else:
+                    policy.record_success(url)
+                    return True, content
+                fd.record_failure(url, source_error)
+                errors += 1
+                if errors > retries:
+                    fd.report_error('giving up after %s retries' % retries)
+                    return False, None
+                fd.report_retry(source_error, errors, retries)
+                await asyncio.sleep(policy.delay(errors, source_error))
+
+    def wait(self, future):
+        """Return the result of future, waiting for it in an interruptible way"""
+        while True:
+            try:
+                return future.result(1)
+            except concurrent.futures.TimeoutError:
+                pass
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Return the process-wide engine, starting it if needed"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AsyncEngine()
+        return _engine
@@ -6,7 +6,12 @@ import sys
 import time
 import random
 
-from ..compat import compat_os_name
+from .ratelimit import get_token_bucket
+from .retry import RetryPolicy
+from ..compat import (
+    compat_os_name,
+    compat_urllib_parse_urlparse,
+)
 from ..utils import (
     decodeArgument,
     encodeFilename,
@@ -31,12 +36,21 @@ class FileDownloader(object):
 
     verbose:            Print additional info to stdout.
     quiet:              Do not print messages to stdout.
-    ratelimit:          Download speed limit, in bytes/sec.
+    ratelimit:          Download speed limit, in bytes/sec, shared by all the
+                        downloads of the process.
+    ratelimit_per_host: Download speed limit for every host, in bytes/sec.
     retries:            Number of times to retry for HTTP error 5xx
+    retry_backoff, retry_max_delay, circuit_breaker_threshold,
+    circuit_breaker_cooldown:
+                        How long to wait between retries and when to pause
+                        requests to failing hosts, see RetryPolicy in
+                        downloader/retry.py.
     buffersize:         Size of download buffer in bytes.
     noresizebuffer:     Do not automatically resize the download buffer.
     continuedl:         Try to continue downloads if possible.
     noprogress:         Do not print the progress bar.
+    progress_rate:      Maximum number of progress updates per second while
+                        downloading (10 by default), 0 for no limit.
     logtostderr:        Log messages to stderr instead of stdout.
     consoletitle:       Display progress in console window's titlebar.
     nopart:             Do not use temporary .part files.
@@ -49,6 +63,8 @@ class FileDownloader(object):
     external_downloader_args:  A list of additional command-line arguments for the
                         external downloader.
     hls_use_mpegts:     Use the mpegts container for HLS videos.
+    http_connections:   Number of connections to download a file over HTTP
+                        with, each one fetching its own range of bytes.
 
     Subclasses of this one must re-define the real_download method.
     """
@@ -61,6 +77,7 @@ class FileDownloader(object):
         self.ydl = ydl
         self._progress_hooks = []
         self.params = params
+        self.retry_policy = RetryPolicy(params)
         self.add_progress_hook(self.report_progress)
 
     @staticmethod
@@ -162,19 +179,34 @@ class FileDownloader(object):
     def report_error(self, *args, **kargs):
         self.ydl.report_error(*args, **kargs)
 
-    def slow_down(self, start_time, now, byte_counter):
-        """Sleep if the download speed is over the rate limit."""
+    def progress_interval(self):
+        """Minimum number of seconds between two progress updates."""
+        progress_rate = self.params.get('progress_rate')
+        if progress_rate is None:
+            progress_rate = 10
+        return 1.0 / progress_rate if progress_rate > 0 else 0
+
+    def throttle_delay(self, byte_count, url=None):
+        """
+        Reserve byte_count more bytes within the rate limits, which are
+        shared by all the downloads of the process, and return the number
+        of seconds to wait before transferring them.
+        """
+        delay = 0
         rate_limit = self.params.get('ratelimit')
-        if rate_limit is None or byte_counter == 0:
-            return
-        if now is None:
-            now = time.time()
-        elapsed = now - start_time
-        if elapsed <= 0.0:
-            return
-        speed = float(byte_counter) / elapsed
-        if speed > rate_limit:
-            time.sleep(max((byte_counter // rate_limit) - elapsed, 0))
+        if rate_limit:
+            delay = get_token_bucket(rate_limit).reserve(byte_count)
+        host_rate_limit = self.params.get('ratelimit_per_host')
+        if host_rate_limit and url:
+            host = compat_urllib_parse_urlparse(url).netloc
+            delay = max(delay, get_token_bucket(host_rate_limit, host).reserve(byte_count))
+        return delay
+
+    def throttle(self, byte_count, url=None):
+        """Sleep as long as needed to keep byte_count more bytes within the rate limits."""
+        delay = self.throttle_delay(byte_count, url)
+        if delay > 0:
+            time.sleep(delay)
 
     def temp_name(self, filename):
         """Returns a temporary filename for the given filename."""
@@ -310,6 +342,13 @@ class FileDownloader(object):
             '[download] Got server HTTP error: %s. Retrying (attempt %d of %s)...'
             % (error_to_compat_str(err), count, self.format_retries(retries)))
 
+    def record_failure(self, url, err):
+        """Record the failure err of a request to url with the retry policy"""
+        if self.retry_policy.record_failure(url, err):
+            self.report_warning(
+                'Too many failed requests to %s, pausing requests to it for %s seconds'
+                % (compat_urllib_parse_urlparse(url).netloc, self.retry_policy.cooldown))
+
     def report_file_already_downloaded(self, file_name):
         """Report file has already been fully downloaded."""
         try:
@@ -9,6 +9,7 @@ from .common import FileDownloader
 from ..compat import (
     compat_setenv,
     compat_str,
+    compat_urllib_parse_urlparse,
 )
 from ..postprocessor.ffmpeg import FFmpegPostProcessor, EXT_TO_OUT_FORMATS
 from ..utils import (
@@ -210,6 +211,12 @@ class FFmpegFD(ExternalFD):
             return False
         ffpp.check_version()
 
+        scheme = compat_urllib_parse_urlparse(url).scheme
+        protocols = ffpp.get_capabilities('protocols')
+        if scheme and protocols and scheme not in protocols:
+            self.report_warning(
+                'Your copy of %s does not seem to support the %s protocol' % (ffpp.basename, scheme))
+
         args = [ffpp.executable, '-y']
 
         for log_level in ('quiet', 'verbose'):
@@ -1,11 +1,20 @@
 from __future__ import division, unicode_literals
 
+import collections
+import functools
+import io
 import os
+import threading
 import time
 import json
 
 from .common import FileDownloader
 from .http import HttpFD
+from ..compat import (
+    compat_queue,
+    compat_urllib_error,
+    compat_urllib_request,
+)
 from ..utils import (
     error_to_compat_str,
     encodeFilename,
@@ -13,6 +22,12 @@ from ..utils import (
     sanitized_Request,
 )
 
+try:
+    from .asyncengine import get_engine as get_async_engine
+except (ImportError, SyntaxError):
+    # asyncio with async/await requires Python 3.5+
+    get_async_engine = None
+
 
 class HttpQuietDownloader(HttpFD):
     def to_screen(self, *args, **kargs):
@@ -30,7 +45,15 @@ class FragmentFD(FileDownloader):
     skip_unavailable_fragments:
                         Skip unavailable fragments (DASH and hlsnative only)
     keep_fragments:     Keep downloaded fragments on disk after downloading is
-                        finished
+                        finished. Otherwise fragments are downloaded straight
+                        into memory and never written to disk on their own
+    concurrent_fragment_downloads:
+                        Number of fragments to download in parallel (DASH,
+                        hlsnative and ISM only)
+    fragment_engine:    How fragments are downloaded: "threads" (default) with
+                        a pool of threads per download, or "asyncio" with a
+                        single event loop shared by all downloads (Python 3.5+,
+                        without proxy)
 
     For each incomplete fragment download youtube-dl keeps on disk a special
     bookkeeping file with download state and metadata (in future such files will
@@ -90,18 +113,35 @@ class FragmentFD(FileDownloader):
         frag_index_stream.write(json.dumps({'downloader': downloader}))
         frag_index_stream.close()
 
-    def _download_fragment(self, ctx, frag_url, info_dict, headers=None):
-        fragment_filename = '%s-Frag%d' % (ctx['tmpfilename'], ctx['fragment_index'])
-        success = ctx['dl'].download(fragment_filename, {
+    def _download_fragment(self, ctx, frag_url, info_dict, headers=None, wrap_stream=None):
+        fragment_info_dict = {
             'url': frag_url,
             'http_headers': headers or info_dict.get('http_headers'),
-        })
+        }
+        frag_stream = io.BytesIO()
+        # The downloaded data may have to be processed (e.g. decrypted) on
+        # its way to frag_stream
+        dest_stream = wrap_stream(frag_stream) if wrap_stream else None
+        if not self.params.get('keep_fragments', False):
+            # Fragments are not kept on disk so read them straight into memory
+            # instead of making a round trip through a temporary file
+            if not ctx['dl'].download(dest_stream or frag_stream, fragment_info_dict):
+                return False, None
+            if dest_stream:
+                dest_stream.close()
+            return True, frag_stream.getvalue()
+        fragment_filename = '%s-Frag%d' % (ctx['tmpfilename'], ctx['fragment_index'])
+        success = ctx['dl'].download(fragment_filename, fragment_info_dict)
         if not success:
             return False, None
         down, frag_sanitized = sanitize_open(fragment_filename, 'rb')
         ctx['fragment_filename_sanitized'] = frag_sanitized
         frag_content = down.read()
         down.close()
+        if dest_stream:
+            dest_stream.write(frag_content)
+            dest_stream.close()
+            frag_content = frag_stream.getvalue()
         return True, frag_content
 
     def _append_fragment(self, ctx, frag_content):
@@ -111,9 +151,251 @@ class FragmentFD(FileDownloader):
         finally:
             if self.__do_ytdl_file(ctx):
                 self._write_ytdl_file(ctx)
-            if not self.params.get('keep_fragments', False):
-                os.remove(ctx['fragment_filename_sanitized'])
-            del ctx['fragment_filename_sanitized']
+            ctx.pop('fragment_filename_sanitized', None)
+
+    def download_and_append_fragments(self, ctx, fragments, info_dict, pack_func=None, stream_func=None):
+        """
+        Download fragments and append them to the destination stream in order.
+
+        fragments is an iterable of dictionaries with the following keys:
+        frag_index: 1-based index of the fragment among all fragments
+        url:        URL of the fragment
+        byte_range: (optional) Dictionary with start and end byte offsets
+        fatal:      (optional) Abort even if skip_unavailable_fragments is set
+
+        Fragments with frag_index not greater than ctx['fragment_index'] are
+        considered already downloaded. pack_func, if given, is called with the
+        fragment content and the fragment dictionary right before appending,
+        always in fragment order, and should return the content to append.
+        stream_func, if given, is called with a writable stream and the
+        fragment dictionary before the fragment is downloaded. It may return
+        a file-like object that processes the data written to it while the
+        fragment is being downloaded and writes the result to the stream, or
+        None. The object has to support tell(), seek(0) and truncate() so
+        that interrupted downloads can be resumed or restarted and is closed
+        once all the data has been written to it.
+        Returns True on success and False otherwise.
+        """
+        fragment_retries = self.params.get('fragment_retries', 0)
+        skip_unavailable_fragments = self.params.get('skip_unavailable_fragments', True)
+        max_workers = self.params.get('concurrent_fragment_downloads') or 1
+
+        # fragments may be generated while they are being downloaded (e.g.
+        # for live streams), so they are only filtered as they come
+        fragments = (
+            fragment for fragment in fragments
+            if fragment['frag_index'] > ctx['fragment_index'])
+
+        def fragment_headers(fragment):
+            headers = info_dict.get('http_headers')
+            byte_range = fragment.get('byte_range')
+            if byte_range:
+                headers = dict(headers or {})
+                headers['Range'] = 'bytes=%d-%d' % (byte_range['start'], byte_range['end'])
+            return headers
+
+        def download_fragment(fragment, frag_ctx):
+            frag_index = fragment['frag_index']
+            headers = fragment_headers(fragment)
+            wrap_stream = None
+            if stream_func:
+                wrap_stream = functools.partial(stream_func, fragment=fragment)
+            count = 0
+            while count <= fragment_retries:
+                try:
+                    return self._download_fragment(
+                        frag_ctx, fragment['url'], info_dict, headers, wrap_stream)
+                except compat_urllib_error.HTTPError as err:
+                    # Unavailable (possibly temporary) fragments may be served.
+                    # First we try to retry then either skip or abort.
+                    # See https://github.com/rg3/youtube-dl/issues/10165,
+                    # https://github.com/rg3/youtube-dl/issues/10448).
+                    # YouTube may also return 404 for a fragment that usually
+                    # succeeds when retried immediately with the same request.
+                    ctx['dl'].record_failure(fragment['url'], err)
+                    count += 1
+                    if count <= fragment_retries:
+                        self.report_retry_fragment(err, frag_index, count, fragment_retries)
+                        self.retry_policy.sleep(count, err)
+            # Still unavailable after all retries
+            return True, None
+
+        if self._use_async_engine():
+            ctx['concurrent'] = True
+            results = self._download_fragments_async(
+                ctx, fragments, fragment_headers, stream_func, max_workers)
+        elif max_workers > 1:
+            ctx['concurrent'] = True
+            results = self._download_fragments_concurrently(
+                ctx, fragments, download_fragment, max_workers)
+        else:
+            results = (
+                (fragment, ctx, download_fragment(fragment, ctx))
+                for fragment in fragments)
+
+        for fragment, frag_ctx, (success, frag_content) in results:
+            frag_index = fragment['frag_index']
+            if not success:
+                return False
+            if frag_content is None:
+                if fragment.get('fatal') or not skip_unavailable_fragments:
+                    self.report_error(
+                        'giving up after %s fragment retries' % fragment_retries)
+                    return False
+                self.report_skip_fragment(frag_index)
+                ctx['fragment_index'] = frag_index
+                continue
+            if pack_func:
+                frag_content = pack_func(frag_content, fragment)
+            # Only fragments appended so far may be recorded in .ytdl file
+            ctx['fragment_index'] = frag_ctx['fragment_index'] = frag_index
+            self._append_fragment(frag_ctx, frag_content)
+        return True
+
+    def _download_fragments_concurrently(self, ctx, fragments, download_fragment, max_workers):
+        """
+        Download fragments with a pool of max_workers threads.
+
+        Yields (fragment, frag_ctx, result) tuples in the original fragment
+        order, where result is the return value of download_fragment.
+        """
+        jobs = compat_queue.Queue()
+        pending = collections.deque()
+        aborted = threading.Event()
+        fragments_iter = iter(fragments)
+
+        def worker():
+            while True:
+                job = jobs.get()
+                if job is None:
+                    return
+                if not aborted.is_set():
+                    try:
+                        job['result'] = download_fragment(job['fragment'], job['ctx'])
+                    except Exception as e:
+                        job['error'] = e
+                job['done'].set()
+
+        def submit():
+            fragment = next(fragments_iter, None)
+            if fragment is None:
+                return
+            # Each fragment gets its own context so that its temporary
+            # filename is derived from its own index
+            frag_ctx = ctx.copy()
+            frag_ctx['fragment_index'] = fragment['frag_index'] - 1
+            job = {
+                'fragment': fragment,
+                'ctx': frag_ctx,
+                'done': threading.Event(),
+            }
+            pending.append(job)
+            jobs.put(job)
+
+        workers = []
+        for _ in range(max_workers):
+            t = threading.Thread(target=worker)
+            t.daemon = True
+            t.start()
+            workers.append(t)
+
+        # Keep some fragments in flight while the earliest one is appended
+        for _ in range(max_workers * 2):
+            submit()
+
+        try:
+            while pending:
+                job = pending.popleft()
+                # Waiting with a timeout keeps the main thread interruptible
+                while not job['done'].is_set():
+                    job['done'].wait(1)
+                if 'error' in job:
+                    raise job['error']
+                submit()
+                yield job['fragment'], job['ctx'], job['result']
+        finally:
+            aborted.set()
+            for _ in workers:
+                jobs.put(None)
+
+    def _use_async_engine(self):
+        if self.params.get('fragment_engine') != 'asyncio':
+            return False
+        if get_async_engine is None:
+            self.report_warning(
+                'The asyncio fragment engine requires Python 3.5 or later, '
+                'downloading fragments with threads instead')
+            return False
+        proxy = self.params.get('proxy')
+        if proxy or (proxy is None and compat_urllib_request.getproxies()):
+            self.report_warning(
+                'The asyncio fragment engine does not support proxies, '
+                'downloading fragments with threads instead')
+            return False
+        # Test downloads only fetch the beginning of fragments
+        return not self.params.get('test', False)
+
+    def _download_fragments_async(self, ctx, fragments, fragment_headers, stream_func, max_workers):
+        """
+        Download fragments on the event loop of the asyncio engine, at most
+        max_workers at a time.
+
+        Yields (fragment, frag_ctx, result) tuples in the original fragment
+        order like _download_fragments_concurrently, where result is a
+        (success, frag_content) tuple like the one of _download_fragment.
+        """
+        engine = get_async_engine()
+        semaphore = engine.semaphore(max_workers)
+        fragment_retries = self.params.get('fragment_retries', 0)
+        pending = collections.deque()
+        fragments_iter = iter(fragments)
+
+        def submit():
+            fragment = next(fragments_iter, None)
+            if fragment is None:
+                return
+            frag_index = fragment['frag_index']
+            frag_ctx = ctx.copy()
+            frag_ctx['fragment_index'] = frag_index - 1
+            # Progress is reported under the name the fragment would be kept as
+            fragment_filename = '%s-Frag%d' % (ctx['tmpfilename'], frag_ctx['fragment_index'])
+            future = engine.submit(engine.download_fragment(
+                ctx['dl'], fragment['url'], fragment_headers(fragment),
+                fragment_filename, semaphore, fragment_retries,
+                functools.partial(self._report_retry_async_fragment, frag_index, fragment_retries)))
+            pending.append((fragment, frag_ctx, fragment_filename, future))
+
+        # Keep some fragments in flight while the earliest one is appended
+        for _ in range(max_workers * 2):
+            submit()
+
+        try:
+            while pending:
+                fragment, frag_ctx, fragment_filename, future = pending.popleft()
+                success, frag_content = engine.wait(future)
+                submit()
+                if frag_content is not None:
+                    if self.params.get('keep_fragments', False):
+                        down, frag_sanitized = sanitize_open(fragment_filename, 'wb')
+                        down.write(frag_content)
+                        down.close()
+                        frag_ctx['fragment_filename_sanitized'] = frag_sanitized
+                    # The data is processed (e.g. decrypted) here rather than
+                    # on the event loop, which is shared by all downloads
+                    if stream_func:
+                        frag_stream = io.BytesIO()
+                        dest_stream = stream_func(frag_stream, fragment=fragment)
+                        if dest_stream:
+                            dest_stream.write(frag_content)
+                            dest_stream.close()
+                            frag_content = frag_stream.getvalue()
+                yield fragment, frag_ctx, (success, frag_content)
+        finally:
+            for _, _, _, future in pending:
+                future.cancel()
+
+    def _report_retry_async_fragment(self, frag_index, retries, err, count):
+        self.report_retry_fragment(err, frag_index, count, retries)
 
     def _prepare_frag_download(self, ctx):
         if 'live' not in ctx:
@@ -135,7 +417,12 @@ class FragmentFD(FileDownloader):
                 'quiet': True,
                 'noprogress': True,
                 'ratelimit': self.params.get('ratelimit'),
+                'ratelimit_per_host': self.params.get('ratelimit_per_host'),
                 'retries': self.params.get('retries', 0),
+                'retry_backoff': self.params.get('retry_backoff'),
+                'retry_max_delay': self.params.get('retry_max_delay'),
+                'circuit_breaker_threshold': self.params.get('circuit_breaker_threshold'),
+                'circuit_breaker_cooldown': self.params.get('circuit_breaker_cooldown'),
                 'nopart': self.params.get('nopart', False),
                 'test': self.params.get('test', False),
             }
@@ -195,40 +482,47 @@ class FragmentFD(FileDownloader):
         ctx.update({
             'started': start,
             # Amount of fragment's bytes downloaded by the time of the previous
-            # frag progress hook invocation
-            'prev_frag_downloaded_bytes': 0,
+            # frag progress hook invocation, per fragment filename
+            'prev_frag_downloaded_bytes': {},
         })
+        # Fragments may be downloaded concurrently
+        lock = threading.Lock()
 
         def frag_progress_hook(s):
             if s['status'] not in ('downloading', 'finished'):
                 return
 
-            time_now = time.time()
-            state['elapsed'] = time_now - start
-            frag_total_bytes = s.get('total_bytes') or 0
-            if not ctx['live']:
-                estimated_size = (
-                    (ctx['complete_frags_downloaded_bytes'] + frag_total_bytes) /
-                    (state['fragment_index'] + 1) * total_frags)
-                state['total_bytes_estimate'] = estimated_size
-
-            if s['status'] == 'finished':
-                state['fragment_index'] += 1
-                ctx['fragment_index'] = state['fragment_index']
-                state['downloaded_bytes'] += frag_total_bytes - ctx['prev_frag_downloaded_bytes']
-                ctx['complete_frags_downloaded_bytes'] = state['downloaded_bytes']
-                ctx['prev_frag_downloaded_bytes'] = 0
-            else:
-                frag_downloaded_bytes = s['downloaded_bytes']
-                state['downloaded_bytes'] += frag_downloaded_bytes - ctx['prev_frag_downloaded_bytes']
+            with lock:
+                time_now = time.time()
+                state['elapsed'] = time_now - start
+                frag_total_bytes = s.get('total_bytes') or 0
                 if not ctx['live']:
-                    state['eta'] = self.calc_eta(
-                        start, time_now, estimated_size,
-                        state['downloaded_bytes'])
-                state['speed'] = s.get('speed') or ctx.get('speed')
-                ctx['speed'] = state['speed']
-                ctx['prev_frag_downloaded_bytes'] = frag_downloaded_bytes
-            self._hook_progress(state)
+                    estimated_size = (
+                        (ctx['complete_frags_downloaded_bytes'] + frag_total_bytes) /
+                        (state['fragment_index'] + 1) * total_frags)
+                    state['total_bytes_estimate'] = estimated_size
+
+                prev_frag_downloaded_bytes = ctx['prev_frag_downloaded_bytes'].get(s['filename'], 0)
+                if s['status'] == 'finished':
+                    state['fragment_index'] += 1
+                    # With concurrent downloads the fragment index is only
+                    # advanced once the fragment is appended
+                    if not ctx.get('concurrent'):
+                        ctx['fragment_index'] = state['fragment_index']
+                    state['downloaded_bytes'] += frag_total_bytes - prev_frag_downloaded_bytes
+                    ctx['complete_frags_downloaded_bytes'] = state['downloaded_bytes']
+                    ctx['prev_frag_downloaded_bytes'].pop(s['filename'], None)
+                else:
+                    frag_downloaded_bytes = s['downloaded_bytes']
+                    state['downloaded_bytes'] += frag_downloaded_bytes - prev_frag_downloaded_bytes
+                    if not ctx['live']:
+                        state['eta'] = self.calc_eta(
+                            start, time_now, estimated_size,
+                            state['downloaded_bytes'])
+                    state['speed'] = s.get('speed') or ctx.get('speed')
+                    ctx['speed'] = state['speed']
+                    ctx['prev_frag_downloaded_bytes'][s['filename']] = frag_downloaded_bytes
+                self._hook_progress(state)
 
         ctx['dl'].add_progress_hook(frag_progress_hook)
 
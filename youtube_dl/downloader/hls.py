@@ -2,31 +2,94 @@ from __future__ import unicode_literals
 
 import re
 import binascii
+import socket
+import threading
 try:
     from Crypto.Cipher import AES
-    can_decrypt_frag = True
+
+    def aes_cbc_decrypt_bytes(data, key, iv):
+        return AES.new(key, AES.MODE_CBC, iv).decrypt(data)
 except ImportError:
-    can_decrypt_frag = False
+    from ..aes import aes_cbc_decrypt_bytes
 
 from .fragment import FragmentFD
 from .external import FFmpegFD
 
+from ..aes import BLOCK_SIZE_BYTES
 from ..compat import (
+    compat_http_client,
+    compat_queue,
     compat_urllib_error,
     compat_urlparse,
     compat_struct_pack,
 )
 from ..utils import (
+    error_to_compat_str,
     parse_m3u8_attributes,
     update_url_query,
 )
 
 
+class AES128DecryptingStream(object):
+    """
+    Write-only file-like object that decrypts AES-128 (CBC) encrypted data
+    written to it as soon as whole blocks are available and writes the
+    decrypted data to stream
+    """
+
+    def __init__(self, stream, key, iv):
+        self._stream = stream
+        self._key = key
+        self._iv = iv
+        self._start = stream.tell()
+        self._reset()
+
+    def _reset(self):
+        self._prev_block = self._iv
+        self._pending = b''
+        self._position = 0
+
+    def write(self, data):
+        self._position += len(data)
+        data = self._pending + data
+        end = len(data) - len(data) % BLOCK_SIZE_BYTES
+        self._pending = data[end:]
+        if end:
+            data = data[:end]
+            self._stream.write(aes_cbc_decrypt_bytes(data, self._key, self._prev_block))
+            self._prev_block = data[-BLOCK_SIZE_BYTES:]
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset):
+        # Decryption can only be restarted from the beginning
+        assert offset == 0
+        self._stream.seek(self._start)
+        self._reset()
+
+    def truncate(self):
+        self._stream.truncate()
+
+    def close(self):
+        # A trailing partial block (only expected for partial downloads in
+        # test mode) is decrypted as if it was padded with 0s
+        if self._pending:
+            length = len(self._pending)
+            self._stream.write(aes_cbc_decrypt_bytes(
+                self._pending + b'\0' * (BLOCK_SIZE_BYTES - length),
+                self._key, self._prev_block)[:length])
+            self._pending = b''
+
+
 class HlsFD(FragmentFD):
     """ A limited implementation that does not require ffmpeg """
 
     FD_NAME = 'hlsnative'
 
+    # Refresh interval of live playlists without #EXT-X-TARGETDURATION
+    _DEFAULT_TARGET_DURATION = 10
+
     @staticmethod
     def can_download(manifest, info_dict):
         UNSUPPORTED_FEATURES = (
@@ -50,74 +113,41 @@ class HlsFD(FragmentFD):
         )
         check_results = [not re.search(feature, manifest) for feature in UNSUPPORTED_FEATURES]
         is_aes128_enc = '#EXT-X-KEY:METHOD=AES-128' in manifest
-        check_results.append(can_decrypt_frag or not is_aes128_enc)
         check_results.append(not (is_aes128_enc and r'#EXT-X-BYTERANGE' in manifest))
-        check_results.append(not info_dict.get('is_live'))
         return all(check_results)
 
-    def real_download(self, filename, info_dict):
-        man_url = info_dict['url']
-        self.to_screen('[%s] Downloading m3u8 manifest' % self.FD_NAME)
-
-        urlh = self.ydl.urlopen(self._prepare_url(info_dict, man_url))
-        man_url = urlh.geturl()
-        s = urlh.read().decode('utf-8', 'ignore')
-
-        if not self.can_download(s, info_dict):
-            if info_dict.get('extra_param_to_segment_url'):
-                self.report_error('pycrypto not found. Please install it.')
-                return False
-            self.report_warning(
-                'hlsnative has detected features it does not support, '
-                'extraction will be delegated to ffmpeg')
-            fd = FFmpegFD(self.ydl, self.params)
-            for ph in self._progress_hooks:
-                fd.add_progress_hook(ph)
-            return fd.real_download(filename, info_dict)
-
-        def anvato_ad(s):
-            return s.startswith('#ANVATO-SEGMENT-INFO') and 'type=ad' in s
-
-        media_frags = 0
-        ad_frags = 0
-        ad_frag_next = False
-        for line in s.splitlines():
-            line = line.strip()
-            if not line:
-                continue
-            if line.startswith('#'):
-                if anvato_ad(line):
-                    ad_frags += 1
-                    ad_frag_next = True
-                continue
-            if ad_frag_next:
-                ad_frag_next = False
-                continue
-            media_frags += 1
-
-        ctx = {
-            'filename': filename,
-            'total_frags': media_frags,
-            'ad_frags': ad_frags,
-        }
+    @staticmethod
+    def _is_anvato_ad(line):
+        return line.startswith('#ANVATO-SEGMENT-INFO') and 'type=ad' in line
 
-        self._prepare_and_start_frag_download(ctx)
+    def _count_ad_fragments(self, manifest):
+        return len([
+            line for line in manifest.splitlines()
+            if self._is_anvato_ad(line.strip())])
 
-        fragment_retries = self.params.get('fragment_retries', 0)
-        skip_unavailable_fragments = self.params.get('skip_unavailable_fragments', True)
-        test = self.params.get('test', False)
+    def _parse_fragments(self, manifest, man_url, info_dict):
+        """
+        Parse the media playlist manifest downloaded from man_url.
 
+        Returns a (fragments, target_duration, ended) tuple, where fragments
+        is a list of dictionaries as expected by
+        download_and_append_fragments, target_duration is the value of
+        #EXT-X-TARGETDURATION or None and ended tells whether the playlist
+        has an #EXT-X-ENDLIST tag.
+        """
         extra_query = None
         extra_param_to_segment_url = info_dict.get('extra_param_to_segment_url')
         if extra_param_to_segment_url:
             extra_query = compat_urlparse.parse_qs(extra_param_to_segment_url)
-        i = 0
         media_sequence = 0
         decrypt_info = {'METHOD': 'NONE'}
         byte_range = {}
         frag_index = 0
         ad_frag_next = False
-        for line in s.splitlines():
+        target_duration = None
+        ended = False
+        fragments = []
+        for line in manifest.splitlines():
             line = line.strip()
             if line:
                 if not line.startswith('#'):
@@ -125,55 +155,21 @@ class HlsFD(FragmentFD):
                         ad_frag_next = False
                         continue
                     frag_index += 1
-                    if frag_index <= ctx['fragment_index']:
-                        continue
                     frag_url = (
                         line
                         if re.match(r'^https?://', line)
                         else compat_urlparse.urljoin(man_url, line))
                     if extra_query:
                         frag_url = update_url_query(frag_url, extra_query)
-                    count = 0
-                    headers = info_dict.get('http_headers', {})
-                    if byte_range:
-                        headers['Range'] = 'bytes=%d-%d' % (byte_range['start'], byte_range['end'])
-                    while count <= fragment_retries:
-                        try:
-                            success, frag_content = self._download_fragment(
-                                ctx, frag_url, info_dict, headers)
-                            if not success:
-                                return False
-                            break
-                        except compat_urllib_error.HTTPError as err:
-                            # Unavailable (possibly temporary) fragments may be served.
-                            # First we try to retry then either skip or abort.
-                            # See https://github.com/rg3/youtube-dl/issues/10165,
-                            # https://github.com/rg3/youtube-dl/issues/10448).
-                            count += 1
-                            if count <= fragment_retries:
-                                self.report_retry_fragment(err, frag_index, count, fragment_retries)
-                    if count > fragment_retries:
-                        if skip_unavailable_fragments:
-                            i += 1
-                            media_sequence += 1
-                            self.report_skip_fragment(frag_index)
-                            continue
-                        self.report_error(
-                            'giving up after %s fragment retries' % fragment_retries)
-                        return False
-                    if decrypt_info['METHOD'] == 'AES-128':
-                        iv = decrypt_info.get('IV') or compat_struct_pack('>8xq', media_sequence)
-                        decrypt_info['KEY'] = decrypt_info.get('KEY') or self.ydl.urlopen(decrypt_info['URI']).read()
-                        frag_content = AES.new(
-                            decrypt_info['KEY'], AES.MODE_CBC, iv).decrypt(frag_content)
-                    self._append_fragment(ctx, frag_content)
-                    # We only download the first fragment during the test
-                    if test:
-                        break
-                    i += 1
+                    fragments.append({
+                        'frag_index': frag_index,
+                        'url': frag_url,
+                        'decrypt_info': decrypt_info,
+                        'byte_range': byte_range,
+                        'media_sequence': media_sequence,
+                    })
                     media_sequence += 1
                 elif line.startswith('#EXT-X-KEY'):
-                    decrypt_url = decrypt_info.get('URI')
                     decrypt_info = parse_m3u8_attributes(line[11:])
                     if decrypt_info['METHOD'] == 'AES-128':
                         if 'IV' in decrypt_info:
@@ -183,10 +179,12 @@ class HlsFD(FragmentFD):
                                 man_url, decrypt_info['URI'])
                         if extra_query:
                             decrypt_info['URI'] = update_url_query(decrypt_info['URI'], extra_query)
-                        if decrypt_url != decrypt_info['URI']:
-                            decrypt_info['KEY'] = None
                 elif line.startswith('#EXT-X-MEDIA-SEQUENCE'):
                     media_sequence = int(line[22:])
+                elif line.startswith('#EXT-X-TARGETDURATION'):
+                    target_duration = float(line[22:])
+                elif line.startswith('#EXT-X-ENDLIST'):
+                    ended = True
                 elif line.startswith('#EXT-X-BYTERANGE'):
                     splitted_byte_range = line[17:].split('@')
                     sub_range_start = int(splitted_byte_range[1]) if len(splitted_byte_range) == 2 else byte_range['end']
@@ -194,8 +192,166 @@ class HlsFD(FragmentFD):
                         'start': sub_range_start,
                         'end': sub_range_start + int(splitted_byte_range[0]),
                     }
-                elif anvato_ad(line):
+                elif self._is_anvato_ad(line):
                     ad_frag_next = True
+        return fragments, target_duration, ended
+
+    def _live_fragments(self, info_dict, man_url, fragments, target_duration):
+        """
+        Generate the fragments of a live stream, starting with fragments.
+
+        The media playlist is refreshed in a background thread every target
+        duration, so that new fragments are found while the previous ones
+        are being downloaded. Fragments are identified by their media
+        sequence number and numbered in the order they are generated.
+        The generator ends once the playlist has an #EXT-X-ENDLIST tag, it
+        cannot be refreshed anymore or the generator is closed.
+        """
+        fragment_queue = compat_queue.Queue()
+        stopped = threading.Event()
+        retries = self.params.get('retries', 0)
+
+        def refresh(fragments, man_url, target_duration):
+            last_sequence = None
+            errors = 0
+            try:
+                while True:
+                    new_fragments = [
+                        fragment for fragment in fragments
+                        if last_sequence is None or fragment['media_sequence'] > last_sequence]
+                    if new_fragments:
+                        if last_sequence is not None and new_fragments[0]['media_sequence'] > last_sequence + 1:
+                            self.report_warning(
+                                '%d live fragments expired before they could be downloaded'
+                                % (new_fragments[0]['media_sequence'] - last_sequence - 1))
+                        last_sequence = new_fragments[-1]['media_sequence']
+                        for fragment in new_fragments:
+                            fragment_queue.put(fragment)
+                    # Unchanged playlists are polled again after half the
+                    # target duration
+                    # (see https://tools.ietf.org/html/rfc8216#section-6.3.4)
+                    interval = target_duration or self._DEFAULT_TARGET_DURATION
+                    if not new_fragments:
+                        interval /= 2
+                    if stopped.wait(interval):
+                        return
+                    try:
+                        urlh = self.ydl.urlopen(self._prepare_url(info_dict, man_url))
+                        man_url = urlh.geturl()
+                        manifest = urlh.read().decode('utf-8', 'ignore')
+                    except (compat_urllib_error.URLError, compat_http_client.HTTPException, socket.error) as err:
+                        errors += 1
+                        if errors > retries:
+                            self.report_warning(
+                                'Unable to refresh the live playlist, giving up after %s retries: %s'
+                                % (retries, error_to_compat_str(err)))
+                            return
+                        self.report_retry(err, errors, retries)
+                        fragments = []
+                        continue
+                    errors = 0
+                    fragments, new_target_duration, ended = self._parse_fragments(
+                        manifest, man_url, info_dict)
+                    target_duration = new_target_duration or target_duration
+                    if ended:
+                        stopped.set()
+            finally:
+                fragment_queue.put(None)
+
+        refresh_thread = threading.Thread(
+            target=refresh, args=(fragments, man_url, target_duration))
+        refresh_thread.daemon = True
+        refresh_thread.start()
+
+        frag_index = 0
+        try:
+            while True:
+                # Waiting with a timeout keeps the main thread interruptible
+                try:
+                    fragment = fragment_queue.get(True, 1)
+                except compat_queue.Empty:
+                    continue
+                if fragment is None:
+                    return
+                frag_index += 1
+                fragment['frag_index'] = frag_index
+                yield fragment
+        finally:
+            stopped.set()
+
+    def real_download(self, filename, info_dict):
+        man_url = info_dict['url']
+        self.to_screen('[%s] Downloading m3u8 manifest' % self.FD_NAME)
+
+        urlh = self.ydl.urlopen(self._prepare_url(info_dict, man_url))
+        man_url = urlh.geturl()
+        s = urlh.read().decode('utf-8', 'ignore')
+
+        if not self.can_download(s, info_dict):
+            if info_dict.get('extra_param_to_segment_url'):
+                self.report_error('hlsnative does not support this stream')
+                return False
+            self.report_warning(
+                'hlsnative has detected features it does not support, '
+                'extraction will be delegated to ffmpeg')
+            fd = FFmpegFD(self.ydl, self.params)
+            for ph in self._progress_hooks:
+                fd.add_progress_hook(ph)
+            return fd.real_download(filename, info_dict)
+
+        live = bool(info_dict.get('is_live'))
+        fragments, target_duration, ended = self._parse_fragments(s, man_url, info_dict)
+
+        ctx = {
+            'filename': filename,
+            'total_frags': None if live else len(fragments),
+            'ad_frags': self._count_ad_fragments(s),
+            'live': live,
+        }
+
+        self._prepare_and_start_frag_download(ctx)
+
+        test = self.params.get('test', False)
+
+        # We only download the first fragment during the test
+        if test:
+            fragments = fragments[:1]
+
+        # Keys are fetched only once per URI, even if fragments are downloaded
+        # concurrently
+        keys = {}
+        keys_lock = threading.Lock()
+
+        def get_key(key_url):
+            with keys_lock:
+                if key_url not in keys:
+                    keys[key_url] = self.ydl.urlopen(key_url).read()
+                return keys[key_url]
+
+        def decrypting_stream(stream, fragment):
+            decrypt_info = fragment['decrypt_info']
+            if decrypt_info['METHOD'] != 'AES-128':
+                return None
+            iv = decrypt_info.get('IV') or compat_struct_pack('>8xq', fragment['media_sequence'])
+            return AES128DecryptingStream(stream, get_key(decrypt_info['URI']), iv)
+
+        # Live playlists are refreshed until they end
+        refresh = live and not ended and not test
+        if refresh:
+            fragments = self._live_fragments(
+                info_dict, man_url, fragments, target_duration)
+        try:
+            if not self.download_and_append_fragments(
+                    ctx, fragments, info_dict, stream_func=decrypting_stream):
+                return False
+        except KeyboardInterrupt:
+            if not live:
+                raise
+            # Keep what has been captured so far, like ffmpeg does
+            self.to_screen('[%s] Interrupted by user, stopping live capture' % self.FD_NAME)
+        finally:
+            if refresh:
+                fragments.close()
 
         self._finish_frag_download(ctx)
 
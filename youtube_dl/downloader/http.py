@@ -1,25 +1,45 @@
 from __future__ import unicode_literals
 
 import errno
+import io
+import json
 import os
 import socket
+import threading
 import time
 import re
 
 from .common import FileDownloader
-from ..compat import compat_urllib_error
+from ..compat import (
+    compat_http_client,
+    compat_urllib_error,
+)
 from ..utils import (
     ContentTooShortError,
     encodeFilename,
+    error_to_compat_str,
     sanitize_open,
     sanitized_Request,
+    write_json_file,
     write_xattr,
     XAttrMetadataError,
     XAttrUnavailableError,
 )
 
 
+class SucceedDownload(Exception):
+    pass
+
+
+class RetryDownload(Exception):
+    def __init__(self, source_error):
+        self.source_error = source_error
+
+
 class HttpFD(FileDownloader):
+    # Files are only split into segments of at least this size
+    _MIN_SEGMENT_SIZE = 1024 * 1024
+
     def real_download(self, filename, info_dict):
         url = info_dict['url']
 
@@ -30,7 +50,9 @@ class HttpFD(FileDownloader):
 
         ctx = DownloadContext()
         ctx.filename = filename
-        ctx.tmpfilename = self.temp_name(filename)
+        # filename may also be a file-like object to write the data to
+        ctx.to_stream = hasattr(filename, 'write')
+        ctx.tmpfilename = filename if ctx.to_stream else self.temp_name(filename)
         ctx.stream = None
 
         # Do not include the Accept-Encoding header
@@ -43,13 +65,19 @@ class HttpFD(FileDownloader):
 
         is_test = self.params.get('test', False)
 
+        connections = self.params.get('http_connections') or 1
+        if connections > 1 and not ctx.to_stream and not is_test and ctx.tmpfilename != '-':
+            result = self._download_segmented(filename, info_dict, headers, connections)
+            if result is not None:
+                return result
+
         if is_test:
             request.add_header('Range', 'bytes=0-%s' % str(self._TEST_FILE_SIZE - 1))
 
         ctx.open_mode = 'wb'
         ctx.resume_len = 0
 
-        if self.params.get('continuedl', True):
+        if self.params.get('continuedl', True) and not ctx.to_stream:
             # Establish possible resume length
             if os.path.isfile(encodeFilename(ctx.tmpfilename)):
                 ctx.resume_len = os.path.getsize(encodeFilename(ctx.tmpfilename))
@@ -57,21 +85,16 @@ class HttpFD(FileDownloader):
         count = 0
         retries = self.params.get('retries', 0)
 
-        class SucceedDownload(Exception):
-            pass
-
-        class RetryDownload(Exception):
-            def __init__(self, source_error):
-                self.source_error = source_error
-
         def establish_connection():
             if ctx.resume_len != 0:
                 self.report_resuming_byte(ctx.resume_len)
                 request.add_header('Range', 'bytes=%d-' % ctx.resume_len)
                 ctx.open_mode = 'ab'
             # Establish connection
+            self.retry_policy.wait_for_host(url)
             try:
                 ctx.data = self.ydl.urlopen(request)
+                self.retry_policy.record_success(url)
                 # When trying to resume, Content-Range HTTP header of response has to be checked
                 # to match the value of requested Range HTTP header. This is due to a webservers
                 # that don't support resuming and serve a whole file with no Content-Range
@@ -92,7 +115,7 @@ class HttpFD(FileDownloader):
                     ctx.open_mode = 'wb'
                 return
             except (compat_urllib_error.HTTPError, ) as err:
-                if (err.code < 500 or err.code >= 600) and err.code != 416:
+                if (err.code < 500 or err.code >= 600) and err.code not in (416, 429):
                     # Unexpected HTTP error
                     raise
                 elif err.code == 416:
@@ -163,21 +186,37 @@ class HttpFD(FileDownloader):
             block_size = self.params.get('buffersize', 1024)
             start = time.time()
 
-            # measure time over whole while-loop, so slow_down() and best_block_size() work together properly
-            now = None  # needed for slow_down() in the first loop run
+            # measure time over whole while-loop, so throttle() and best_block_size() work together properly
             before = start  # start measuring
 
+            # Read blocks into a reusable buffer instead of allocating a new
+            # bytes object for each of them, if the response supports it
+            readinto = getattr(ctx.data, 'readinto', None)
+            buf = None
+
+            progress_interval = self.progress_interval()
+            last_progress = None
+
             def retry(e):
-                if ctx.tmpfilename != '-':
-                    ctx.stream.close()
+                if ctx.to_stream:
+                    ctx.resume_len = ctx.tmpfilename.tell()
+                else:
+                    if ctx.tmpfilename != '-':
+                        ctx.stream.close()
+                    ctx.resume_len = os.path.getsize(encodeFilename(ctx.tmpfilename))
                 ctx.stream = None
-                ctx.resume_len = os.path.getsize(encodeFilename(ctx.tmpfilename))
                 raise RetryDownload(e)
 
             while True:
+                read_size = block_size if not is_test else min(block_size, data_len - byte_counter)
                 try:
                     # Download and write
-                    data_block = ctx.data.read(block_size if not is_test else min(block_size, data_len - byte_counter))
+                    if readinto is not None:
+                        if buf is None or len(buf) < read_size:
+                            buf = memoryview(bytearray(read_size))
+                        data_block = buf[:readinto(buf[:read_size])]
+                    else:
+                        data_block = ctx.data.read(read_size)
                 # socket.timeout is a subclass of socket.error but may not have
                 # errno set
                 except socket.timeout as e:
@@ -194,7 +233,13 @@ class HttpFD(FileDownloader):
                     break
 
                 # Open destination file just in time
-                if ctx.stream is None:
+                if ctx.stream is None and ctx.to_stream:
+                    ctx.stream = ctx.tmpfilename
+                    if ctx.open_mode == 'wb':
+                        # Previously written data can not be resumed
+                        ctx.stream.seek(0)
+                        ctx.stream.truncate()
+                elif ctx.stream is None:
                     try:
                         ctx.stream, ctx.tmpfilename = sanitize_open(
                             ctx.tmpfilename, ctx.open_mode)
@@ -219,7 +264,7 @@ class HttpFD(FileDownloader):
                     return False
 
                 # Apply rate limit
-                self.slow_down(start, now, byte_counter - ctx.resume_len)
+                self.throttle(len(data_block), url)
 
                 # end measuring of one loop run
                 now = time.time()
@@ -231,23 +276,25 @@ class HttpFD(FileDownloader):
 
                 before = after
 
-                # Progress message
-                speed = self.calc_speed(start, now, byte_counter - ctx.resume_len)
-                if data_len is None:
-                    eta = None
-                else:
-                    eta = self.calc_eta(start, time.time(), data_len - ctx.resume_len, byte_counter - ctx.resume_len)
-
-                self._hook_progress({
-                    'status': 'downloading',
-                    'downloaded_bytes': byte_counter,
-                    'total_bytes': data_len,
-                    'tmpfilename': ctx.tmpfilename,
-                    'filename': ctx.filename,
-                    'eta': eta,
-                    'speed': speed,
-                    'elapsed': now - start,
-                })
+                # Progress message, at most once per progress interval
+                if last_progress is None or now - last_progress >= progress_interval:
+                    last_progress = now
+                    speed = self.calc_speed(start, now, byte_counter - ctx.resume_len)
+                    if data_len is None:
+                        eta = None
+                    else:
+                        eta = self.calc_eta(start, now, data_len - ctx.resume_len, byte_counter - ctx.resume_len)
+
+                    self._hook_progress({
+                        'status': 'downloading',
+                        'downloaded_bytes': byte_counter,
+                        'total_bytes': data_len,
+                        'tmpfilename': ctx.tmpfilename,
+                        'filename': ctx.filename,
+                        'eta': eta,
+                        'speed': speed,
+                        'elapsed': now - start,
+                    })
 
                 if is_test and byte_counter == data_len:
                     break
@@ -256,7 +303,7 @@ class HttpFD(FileDownloader):
                 self.to_stderr('\n')
                 self.report_error('Did not get any data blocks')
                 return False
-            if ctx.tmpfilename != '-':
+            if ctx.tmpfilename != '-' and not ctx.to_stream:
                 ctx.stream.close()
 
             if data_len is not None and byte_counter != data_len:
@@ -268,7 +315,7 @@ class HttpFD(FileDownloader):
             self.try_rename(ctx.tmpfilename, ctx.filename)
 
             # Update file modification time
-            if self.params.get('updatetime', True):
+            if self.params.get('updatetime', True) and not ctx.to_stream:
                 info_dict['filetime'] = self.try_utime(ctx.filename, ctx.data.info().get('last-modified', None))
 
             self._hook_progress({
@@ -286,12 +333,284 @@ class HttpFD(FileDownloader):
                 establish_connection()
                 return download()
             except RetryDownload as e:
+                self.record_failure(url, e.source_error)
                 count += 1
                 if count <= retries:
                     self.report_retry(e.source_error, count, retries)
+                    self.retry_policy.sleep(count, e.source_error)
                 continue
             except SucceedDownload:
                 return True
 
         self.report_error('giving up after %s retries' % retries)
         return False
+
+    def _probe_size(self, url, headers):
+        """
+        Return a tuple (size, response headers) if the file at url can be
+        downloaded in byte ranges, otherwise None
+        """
+        request = sanitized_Request(url, None, headers)
+        request.add_header('Range', 'bytes=0-0')
+        try:
+            data = self.ydl.urlopen(request)
+            try:
+                data.read()
+            finally:
+                data.close()
+        except (compat_urllib_error.URLError, compat_http_client.HTTPException, socket.error):
+            # Errors are reported by the single connection download
+            return None
+        # A partial response is as good as an Accept-Ranges header
+        mobj = re.match(r'bytes 0-0/(\d+)', data.headers.get('Content-Range') or '')
+        if data.getcode() != 206 or not mobj:
+            return None
+        return int(mobj.group(1)), data.headers
+
+    def _read_segments_state(self, filename):
+        try:
+            with io.open(encodeFilename(self.ytdl_filename(filename)), 'r', encoding='utf-8') as f:
+                return json.load(f)['downloader']['segments']
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _write_segments_state(self, filename, total_bytes, segments):
+        write_json_file({
+            'downloader': {
+                'segments': {
+                    'total_bytes': total_bytes,
+                    'ranges': [[seg['start'], seg['end'], seg['downloaded']] for seg in segments],
+                },
+            },
+        }, encodeFilename(self.ytdl_filename(filename)))
+
+    def _remove_segmented_files(self, filename, tmpfilename):
+        for fn in (self.ytdl_filename(filename), tmpfilename):
+            try:
+                os.remove(encodeFilename(fn))
+            except OSError:
+                pass
+
+    def _download_segmented(self, filename, info_dict, headers, connections):
+        """
+        Download the file with several connections, each one fetching its
+        own byte range and writing it at its offset in the .part file. The
+        progress of every range is recorded in the .ytdl file, so the
+        download can be resumed.
+
+        Return None if the file can't be downloaded in segments, in which
+        case the .part file is left as it was or removed if it was written
+        in segments.
+        """
+        url = info_dict['url']
+        tmpfilename = self.temp_name(filename)
+        continuedl = self.params.get('continuedl', True)
+
+        state = None
+        if os.path.isfile(encodeFilename(tmpfilename)):
+            state = self._read_segments_state(filename) if continuedl else None
+            if continuedl and state is None:
+                # Started by a single connection download, which resumes it
+                return None
+
+        probe = self._probe_size(url, headers)
+        if probe is not None and state is not None and state['total_bytes'] != probe[0]:
+            self.report_unable_to_resume()
+            state = None
+        if probe is None or state is None:
+            # Any previous progress is lost, the data can't be trusted
+            self._remove_segmented_files(filename, tmpfilename)
+        if probe is None:
+            return None
+        total_bytes, response_headers = probe
+
+        if state is None:
+            connections = min(connections, total_bytes // self._MIN_SEGMENT_SIZE)
+            if connections < 2:
+                return None
+            min_data_len = self.params.get('min_filesize')
+            max_data_len = self.params.get('max_filesize')
+            if min_data_len is not None and total_bytes < min_data_len:
+                self.to_screen('\r[download] File is smaller than min-filesize (%s bytes < %s bytes). Aborting.' % (total_bytes, min_data_len))
+                return False
+            if max_data_len is not None and total_bytes > max_data_len:
+                self.to_screen('\r[download] File is larger than max-filesize (%s bytes > %s bytes). Aborting.' % (total_bytes, max_data_len))
+                return False
+            segment_size = total_bytes // connections
+            segments = [{
+                'start': i * segment_size,
+                'end': (i + 1) * segment_size - 1 if i < connections - 1 else total_bytes - 1,
+                'downloaded': 0,
+            } for i in range(connections)]
+            try:
+                stream, tmpfilename = sanitize_open(tmpfilename, 'wb')
+                try:
+                    stream.truncate(total_bytes)
+                finally:
+                    stream.close()
+            except (OSError, IOError) as err:
+                self.report_error('unable to open for writing: %s' % str(err))
+                return False
+            self._write_segments_state(filename, total_bytes, segments)
+        else:
+            segments = [{
+                'start': start,
+                'end': end,
+                'downloaded': downloaded,
+            } for start, end, downloaded in state['ranges']]
+            self.report_resuming_byte(sum(seg['downloaded'] for seg in segments))
+        self.report_destination(filename)
+
+        if self.params.get('xattr_set_filesize', False):
+            try:
+                write_xattr(tmpfilename, 'user.ytdl.filesize', str(total_bytes).encode('utf-8'))
+            except (XAttrUnavailableError, XAttrMetadataError) as err:
+                self.report_error('unable to set filesize xattr: %s' % str(err))
+
+        lock = threading.Lock()
+        aborted = threading.Event()
+        errors = []
+        resume_len = sum(seg['downloaded'] for seg in segments)
+        counter = {'downloaded': resume_len}
+        start = time.time()
+
+        def download_range(segment, stream):
+            offset = segment['start'] + segment['downloaded']
+            request = sanitized_Request(url, None, headers)
+            request.add_header('Range', 'bytes=%d-%d' % (offset, segment['end']))
+            self.retry_policy.wait_for_host(url)
+            try:
+                data = self.ydl.urlopen(request)
+                self.retry_policy.record_success(url)
+            except compat_urllib_error.HTTPError as err:
+                if (err.code < 500 or err.code >= 600) and err.code != 429:
+                    raise
+                raise RetryDownload(err)
+            except socket.error as err:
+                if err.errno not in (errno.ECONNRESET, errno.ETIMEDOUT) and not isinstance(err, socket.timeout):
+                    raise
+                raise RetryDownload(err)
+            try:
+                content_range = data.headers.get('Content-Range') or ''
+                if data.getcode() != 206 or not content_range.startswith('bytes %d-' % offset):
+                    raise compat_urllib_error.URLError(
+                        'the server did not honour the requested range (%s)' % (content_range or 'none'))
+                readinto = getattr(data, 'readinto', None)
+                block_size = self.params.get('buffersize', 1024)
+                buf = None
+                stream.seek(offset)
+                while not aborted.is_set():
+                    read_size = min(block_size, segment['end'] + 1 - offset)
+                    if read_size <= 0:
+                        return
+                    before = time.time()
+                    try:
+                        if readinto is not None:
+                            if buf is None or len(buf) < read_size:
+                                buf = memoryview(bytearray(read_size))
+                            data_block = buf[:readinto(buf[:read_size])]
+                        else:
+                            data_block = data.read(read_size)
+                    except socket.timeout as err:
+                        raise RetryDownload(err)
+                    except socket.error as err:
+                        if err.errno not in (errno.ECONNRESET, errno.ETIMEDOUT):
+                            raise
+                        raise RetryDownload(err)
+                    if not len(data_block):
+                        raise RetryDownload(ContentTooShortError(
+                            offset - segment['start'], segment['end'] + 1 - segment['start']))
+                    stream.write(data_block)
+                    offset += len(data_block)
+                    with lock:
+                        segment['downloaded'] += len(data_block)
+                        counter['downloaded'] += len(data_block)
+                    self.throttle(len(data_block), url)
+                    if not self.params.get('noresizebuffer', False):
+                        block_size = self.best_block_size(time.time() - before, len(data_block))
+            finally:
+                data.close()
+
+        def worker(segment):
+            count = 0
+            retries = self.params.get('retries', 0)
+            try:
+                # Unbuffered, so that everything counted as downloaded has
+                # been handed over to the operating system
+                stream = io.open(encodeFilename(tmpfilename), 'r+b', buffering=0)
+            except (OSError, IOError) as err:
+                errors.append('unable to open for writing: %s' % error_to_compat_str(err))
+                aborted.set()
+                return
+            try:
+                while not aborted.is_set():
+                    try:
+                        download_range(segment, stream)
+                        return
+                    except RetryDownload as e:
+                        self.record_failure(url, e.source_error)
+                        count += 1
+                        if count > retries:
+                            errors.append('giving up after %s retries: %s' % (
+                                retries, error_to_compat_str(e.source_error)))
+                            aborted.set()
+                            return
+                        self.report_retry(e.source_error, count, retries)
+                        self.retry_policy.sleep(count, e.source_error)
+                    except Exception as err:
+                        errors.append('unable to download range: %s' % error_to_compat_str(err))
+                        aborted.set()
+                        return
+            finally:
+                stream.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(segment,))
+            for segment in segments if segment['start'] + segment['downloaded'] <= segment['end']]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        progress_interval = max(self.progress_interval(), 0.1)
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(progress_interval)
+                    with lock:
+                        downloaded = counter['downloaded']
+                        self._write_segments_state(filename, total_bytes, segments)
+                    now = time.time()
+                    self._hook_progress({
+                        'status': 'downloading',
+                        'downloaded_bytes': downloaded,
+                        'total_bytes': total_bytes,
+                        'tmpfilename': tmpfilename,
+                        'filename': filename,
+                        'eta': self.calc_eta(start, now, total_bytes - resume_len, downloaded - resume_len),
+                        'speed': self.calc_speed(start, now, downloaded - resume_len),
+                        'elapsed': now - start,
+                    })
+        except BaseException:
+            aborted.set()
+            for thread in threads:
+                thread.join()
+            self._write_segments_state(filename, total_bytes, segments)
+            raise
+
+        if errors:
+            self._write_segments_state(filename, total_bytes, segments)
+            self.report_error(errors[0])
+            return False
+
+        os.remove(encodeFilename(self.ytdl_filename(filename)))
+        self.try_rename(tmpfilename, filename)
+        if self.params.get('updatetime', True):
+            info_dict['filetime'] = self.try_utime(filename, response_headers.get('last-modified', None))
+        self._hook_progress({
+            'downloaded_bytes': total_bytes,
+            'total_bytes': total_bytes,
+            'filename': filename,
+            'status': 'finished',
+            'elapsed': time.time() - start,
+        })
+        return True
@@ -0,0 +1,58 @@
+from __future__ import division, unicode_literals
+
+import threading
+import time
+
+
+class TokenBucket(object):
+    """
+    Thread-safe token bucket limiting the rate of a stream of bytes.
+
+    Tokens are added at rate bytes per second up to capacity. Consuming
+    more tokens than are available puts the bucket in debt and makes the
+    caller sleep until the debt is paid off, so concurrent consumers are
+    paced smoothly and together never exceed the rate.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        # By default allow bursts of a tenth of a second
+        self.capacity = capacity if capacity is not None else max(self.rate / 10, 1)
+        self._tokens = self.capacity
+        self._last = time.time()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount):
+        """
+        Take amount tokens out of the bucket and return the number of
+        seconds to wait before using them
+        """
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= amount
+            return -self._tokens / self.rate if self._tokens < 0 else 0
+
+    def consume(self, amount):
+        """Take amount tokens out of the bucket, sleeping if there are not enough"""
+        wait = self.reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_token_bucket(rate, host=None):
+    """
+    Return the process-wide bucket for rate, shared by all downloads or, if
+    host is given, by all downloads from host
+    """
+    key = (host, rate)
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = _buckets[key] = TokenBucket(rate)
+        return bucket
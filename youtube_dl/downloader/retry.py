@@ -0,0 +1,168 @@
+from __future__ import division, unicode_literals
+
+import email.utils
+import random
+import socket
+import threading
+import time
+
+from ..compat import (
+    compat_urllib_error,
+    compat_urllib_parse_urlparse,
+)
+
+
+class CircuitBreaker(object):
+    """
+    Thread-safe circuit breaker for a host.
+
+    After threshold failures in a row the circuit opens and requests to the
+    host are held back for cooldown seconds. Once it has cooled down,
+    requests go through again: a success closes the circuit, another
+    failure opens it again right away.
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._open_until = 0
+        self._lock = threading.Lock()
+
+    def delay(self):
+        """Return the number of seconds to wait before the next request"""
+        with self._lock:
+            return max(self._open_until - time.time(), 0)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._open_until = 0
+
+    def record_failure(self):
+        """Record a failure and return True if it opens the circuit"""
+        with self._lock:
+            self._failures += 1
+            if self._failures < self.threshold:
+                return False
+            now = time.time()
+            opened = self._open_until <= now
+            self._open_until = max(self._open_until, now + self.cooldown)
+            return opened
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(host, threshold, cooldown):
+    """Return the process-wide circuit breaker for host"""
+    key = (host, threshold, cooldown)
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = _breakers[key] = CircuitBreaker(threshold, cooldown)
+        return breaker
+
+
+class RetryPolicy(object):
+    """
+    How downloaders wait before retrying a failed request.
+
+    Retries are delayed with exponential backoff and full jitter: the n-th
+    retry waits a random time between 0 and retry_backoff * 2 ** (n - 1)
+    seconds, at most retry_max_delay, or as long as the server asks for
+    with a Retry-After header if that is longer. Server errors and failed
+    connections are also recorded by the circuit breaker of the host, which
+    is shared by all downloads of the process.
+
+    Available options:
+
+    retry_backoff:      Base delay between retries in seconds (1 by default),
+                        0 to retry immediately.
+    retry_max_delay:    Maximum delay between retries in seconds (60 by default).
+    circuit_breaker_threshold:
+                        Number of failures in a row after which requests to a
+                        host are paused (10 by default), 0 to never pause them.
+    circuit_breaker_cooldown:
+                        Number of seconds requests to a host are paused for
+                        (30 by default).
+    """
+
+    def __init__(self, params):
+        backoff = params.get('retry_backoff')
+        self.backoff = 1 if backoff is None else backoff
+        max_delay = params.get('retry_max_delay')
+        self.max_delay = 60 if max_delay is None else max_delay
+        threshold = params.get('circuit_breaker_threshold')
+        self.threshold = 10 if threshold is None else threshold
+        cooldown = params.get('circuit_breaker_cooldown')
+        self.cooldown = 30 if cooldown is None else cooldown
+
+    @staticmethod
+    def retry_after(err):
+        """Return the delay requested by the Retry-After header of err or None"""
+        headers = getattr(err, 'headers', None)
+        value = headers.get('Retry-After') if headers is not None else None
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return int(value)
+        timetuple = email.utils.parsedate_tz(value)
+        if timetuple is None:
+            return None
+        return max(email.utils.mktime_tz(timetuple) - time.time(), 0)
+
+    def delay(self, attempt, err=None):
+        """Return the number of seconds to wait before retry number attempt"""
+        delay = 0
+        if self.backoff:
+            delay = random.uniform(0, min(self.backoff * 2 ** (attempt - 1), self.max_delay))
+        retry_after = self.retry_after(err)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def sleep(self, attempt, err=None):
+        delay = self.delay(attempt, err)
+        if delay > 0:
+            time.sleep(delay)
+
+    @staticmethod
+    def is_failure(err):
+        """Tell whether err means that the server is in trouble"""
+        if isinstance(err, compat_urllib_error.HTTPError):
+            return err.code >= 500 or err.code == 429
+        return isinstance(err, (compat_urllib_error.URLError, socket.error))
+
+    def _breaker(self, url):
+        if not self.threshold:
+            return None
+        host = compat_urllib_parse_urlparse(url).netloc
+        return get_circuit_breaker(host, self.threshold, self.cooldown)
+
+    def host_delay(self, url):
+        """Return the number of seconds to wait before requesting url"""
+        breaker = self._breaker(url)
+        return breaker.delay() if breaker else 0
+
+    def wait_for_host(self, url):
+        delay = self.host_delay(url)
+        if delay > 0:
+            time.sleep(delay)
+
+    def record_success(self, url):
+        breaker = self._breaker(url)
+        if breaker:
+            breaker.record_success()
+
+    def record_failure(self, url, err):
+        """
+        Record the failure err of a request to url and return True if
+        requests to its host are now paused
+        """
+        if not self.is_failure(err):
+            return False
+        breaker = self._breaker(url)
+        return breaker.record_failure() if breaker else False
@@ -4,8 +4,13 @@ try:
     from .lazy_extractors import *
     from .lazy_extractors import _ALL_CLASSES
     _LAZY_LOADER = True
+    try:
+        from .lazy_extractors import _URL_INDEX, _URL_INDEX_UNINDEXED
+    except ImportError:  # generated by an older version
+        _URL_INDEX = None
 except ImportError:
     _LAZY_LOADER = False
+    _URL_INDEX = None
     from .extractors import *
 
     _ALL_CLASSES = [
@@ -23,6 +28,20 @@ def gen_extractor_classes():
     return _ALL_CLASSES
 
 
+def gen_extractor_url_index():
+    """ Return the URL dispatch index of the supported extractors.
+
+    It is a tuple (index, unindexed) where index maps URL tokens (as
+    returned by urlindex.url_tokens) to the keys of the extractors that may
+    be suitable for URLs containing them and unindexed lists the keys of the
+    extractors that may be suitable for any URL. The index is generated
+    along with the lazy extractors; None is returned if it is not available.
+    """
+    if _URL_INDEX is None:
+        return None
+    return _URL_INDEX, _URL_INDEX_UNINDEXED
+
+
 def gen_extractors():
     """ Return a list of an instance of every supported extractor.
     The order does matter; the first extractor matched is the one handling the URL.
@@ -332,6 +332,8 @@ class InfoExtractor(object):
     Subclasses of this one should re-define the _real_initialize() and
     _real_extract() methods and define a _VALID_URL regexp.
     Probably, they should also be added to the list of extractors.
+    An overridden suitable() may only reject URLs matched by _VALID_URL,
+    since the URL dispatch index is built from _VALID_URL.
 
     _GEO_BYPASS attribute may be set to False in order to disable
     geo restriction bypass mechanisms for a particular extractor.
@@ -485,8 +487,14 @@ class InfoExtractor(object):
     def IE_NAME(self):
         return compat_str(type(self).__name__[:-2])
 
-    def _request_webpage(self, url_or_request, video_id, note=None, errnote=None, fatal=True, data=None, headers={}, query={}):
-        """ Returns the response handle """
+    def _request_webpage(self, url_or_request, video_id, note=None, errnote=None, fatal=True, data=None, headers={}, query={}, use_http_cache=False):
+        """
+        Returns the response handle
+
+        With use_http_cache, the response may come from the HTTP response
+        cache (see the http_cache parameter of YoutubeDL) and is always
+        read completely.
+        """
         if note is None:
             self.report_download_webpage(video_id)
         elif note is not False:
@@ -503,6 +511,8 @@ class InfoExtractor(object):
             if data is not None or headers:
                 url_or_request = sanitized_Request(url_or_request, data, headers)
         try:
+            if use_http_cache:
+                return self._downloader.http_cache.urlopen(url_or_request, self.IE_NAME)
             return self._downloader.urlopen(url_or_request)
         except (compat_urllib_error.URLError, compat_http_client.HTTPException, socket.error) as err:
             if errnote is False:
@@ -532,7 +542,7 @@ class InfoExtractor(object):
             if 'X-Forwarded-For' not in headers:
                 headers['X-Forwarded-For'] = self._x_forwarded_for_ip
 
-        urlh = self._request_webpage(url_or_request, video_id, note, errnote, fatal, data=data, headers=headers, query=query)
+        urlh = self._request_webpage(url_or_request, video_id, note, errnote, fatal, data=data, headers=headers, query=query, use_http_cache=True)
         if urlh is False:
             assert not fatal
             return False
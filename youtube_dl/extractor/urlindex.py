@@ -0,0 +1,213 @@
+from __future__ import unicode_literals
+
+import re
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from ..compat import compat_chr
+
+
+# A URL token is a maximal run of these characters in the lowercased URL
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Placeholders in URL templates: any string (possibly containing token
+# characters) and a non-empty string without token characters
+_ANY = '\0'
+_SEP = '\1'
+
+_MAX_TEMPLATES = 64
+
+_TOKEN_CHARS = [chr(c) for c in range(ord('a'), ord('z') + 1)] + [
+    chr(c) for c in range(ord('A'), ord('Z') + 1)] + [
+    chr(c) for c in range(ord('0'), ord('9') + 1)]
+
+
+def url_tokens(url):
+    """Return the set of tokens found in url"""
+    return set(_TOKEN_RE.findall(url.lower()))
+
+
+def _opname(op):
+    return ('%s' % op).upper()
+
+
+def _category_matches(category, ch):
+    category = _opname(category)
+    if category.endswith('_NOT_DIGIT'):
+        return not ch.isdigit()
+    if category.endswith('_DIGIT'):
+        return ch.isdigit()
+    if category.endswith('_NOT_WORD') or category.endswith('_SPACE') or category.endswith('_LINEBREAK'):
+        return category.endswith('_NOT_SPACE') or category.endswith('_NOT_LINEBREAK')
+    if category.endswith('_WORD'):
+        return True
+    return None
+
+
+def _item_matches(op, av, ch):
+    op = _opname(op)
+    if op == 'LITERAL':
+        return av == ord(ch)
+    if op == 'RANGE':
+        return av[0] <= ord(ch) <= av[1]
+    if op == 'CATEGORY':
+        return _category_matches(av, ch)
+    return None
+
+
+def _may_match_token_char(items):
+    """Whether a character set may match a token character (in any case)"""
+    negate = bool(items) and _opname(items[0][0]) == 'NEGATE'
+    if negate:
+        items = items[1:]
+    for ch in _TOKEN_CHARS:
+        matched = False
+        for op, av in items:
+            m = _item_matches(op, av, ch)
+            # Assume the worst for anything we do not understand
+            if m is None:
+                m = not negate
+            if m:
+                matched = True
+                break
+        if matched != negate:
+            return True
+    return False
+
+
+def _product(templates, alternatives):
+    if len(templates) * len(alternatives) > _MAX_TEMPLATES:
+        alternatives = [_ANY]
+    return [t + a for t in templates for a in alternatives]
+
+
+def _collapse(alternatives):
+    if any(_ANY in a or _TOKEN_RE.search(a) for a in alternatives):
+        return _ANY
+    return _SEP
+
+
+def _expand(pattern):
+    """
+    Return a list of templates such that every string matched by pattern
+    is matched by one of them
+    """
+    templates = ['']
+    for op, av in pattern:
+        templates = _product(templates, _expand_node(_opname(op), av))
+    return templates
+
+
+def _expand_node(op, av):
+    if op == 'LITERAL':
+        ch = compat_chr(av).lower()
+        return [ch if _TOKEN_RE.match(ch) else _SEP]
+    if op == 'IN':
+        return [_ANY if _may_match_token_char(av) else _SEP]
+    if op == 'CATEGORY':
+        return [_ANY if _may_match_token_char([(op, av)]) else _SEP]
+    if op in ('ANY', 'NOT_LITERAL'):
+        return [_ANY]
+    if op in ('AT', 'ASSERT', 'ASSERT_NOT'):
+        return ['']
+    if op == 'SUBPATTERN':
+        return _expand(av[-1])
+    if op == 'ATOMIC_GROUP':
+        return _expand(av)
+    if op == 'BRANCH':
+        alternatives = []
+        for branch in av[1]:
+            alternatives.extend(_expand(branch))
+        return alternatives if len(alternatives) <= _MAX_TEMPLATES else [_ANY]
+    if op == 'GROUPREF_EXISTS':
+        alternatives = _expand(av[1]) + (_expand(av[2]) if av[2] else [''])
+        return alternatives if len(alternatives) <= _MAX_TEMPLATES else [_ANY]
+    if op in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT'):
+        lo, hi, sub = av
+        alternatives = _expand(sub)
+        if (lo, hi) == (0, 1):
+            return [''] + alternatives
+        if lo == hi and lo <= 3:
+            templates = ['']
+            for _ in range(lo):
+                templates = _product(templates, alternatives)
+            return templates
+        body = _collapse(alternatives)
+        if body == _ANY:
+            return [_ANY]
+        return [_SEP] if lo > 0 else ['', _SEP]
+    return [_ANY]
+
+
+def _template_tokens(template):
+    """
+    Tokens that are found in every URL matched by template. A run of
+    literal token characters is a token only if it is delimited on both
+    sides by the start of the URL or by a separator.
+    """
+    tokens = []
+    for mobj in _TOKEN_RE.finditer(template):
+        start, end = mobj.span()
+        if start > 0 and template[start - 1] == _ANY:
+            continue
+        if end == len(template) or template[end] == _ANY:
+            continue
+        tokens.append(mobj.group())
+    return tokens
+
+
+def valid_url_templates(ie):
+    if hasattr(ie, '_make_valid_url'):
+        valid_url = ie._make_valid_url()
+    else:
+        valid_url = getattr(ie, '_VALID_URL', None)
+    if not valid_url:
+        return None
+    try:
+        return _expand(sre_parse.parse(valid_url))
+    except Exception:
+        return None
+
+
+def build_url_index(ie_classes):
+    """
+    Build a dispatch index for ie_classes.
+
+    Return a tuple (index, unindexed) where index maps URL tokens to the
+    keys of the extractors that may be suitable for URLs containing them
+    and unindexed is the list of keys of extractors that must always be
+    tried.
+
+    Overridden suitable() methods are assumed to only narrow down what is
+    matched by _VALID_URL.
+    """
+    candidates = []
+    frequency = {}
+    for ie in ie_classes:
+        templates = valid_url_templates(ie)
+        token_lists = None
+        if templates is not None:
+            token_lists = [_template_tokens(t) for t in templates]
+            if not all(token_lists):
+                token_lists = None
+        if token_lists is not None:
+            for token in set(token for tokens in token_lists for token in tokens):
+                frequency[token] = frequency.get(token, 0) + 1
+        candidates.append((ie.ie_key(), token_lists))
+
+    index = {}
+    unindexed = []
+    for ie_key, token_lists in candidates:
+        if token_lists is None:
+            unindexed.append(ie_key)
+            continue
+        # The least common token of each template is the most selective one
+        chosen = set(
+            min(tokens, key=lambda t: (frequency[t], -len(t)))
+            for tokens in token_lists)
+        for token in chosen:
+            index.setdefault(token, []).append(ie_key)
+    return index, unindexed
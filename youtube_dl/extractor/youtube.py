@@ -3,11 +3,15 @@
 from __future__ import unicode_literals
 
 
+import collections
+import contextlib
+import errno
 import itertools
 import json
 import os.path
 import random
 import re
+import threading
 import time
 import traceback
 
@@ -33,6 +37,7 @@ from ..utils import (
     get_element_by_attribute,
     get_element_by_id,
     int_or_none,
+    locked_file,
     mimetype2ext,
     orderedSet,
     parse_codecs,
@@ -324,6 +329,164 @@ class YoutubePlaylistsBaseInfoExtractor(YoutubeEntryListBaseInfoExtractor):
         return self.playlist_result(self._entries(webpage, playlist_id), playlist_id, title)
 
 
+class _SignatureSpecCache(object):
+    """
+    Process-wide, thread-safe LRU cache of signature specs (the index lists
+    the signature functions are turned into) in front of the
+    youtube-sigfuncs filesystem cache.
+
+    A spec that comes from a cache file is only used as long as the
+    modification time of that file does not change, so specs written by
+    other processes are picked up. Extraction is serialized per spec
+    between threads and, with the filesystem cache enabled, between
+    processes, so every player is downloaded and interpreted only once.
+    """
+
+    SECTION = 'youtube-sigfuncs'
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        # Specs found in memory, loaded from the filesystem cache and
+        # extracted from players
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        # Seconds spent loading and extracting specs
+        self.load_time = 0.0
+
+    def _remember(self, key, mtime, spec):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (mtime, spec)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _mtime(cache_fn):
+        if cache_fn:
+            try:
+                return os.stat(cache_fn).st_mtime
+            except OSError:
+                pass
+        return None
+
+    def _lookup(self, cache, func_id, key, cache_fn):
+        mtime = self._mtime(cache_fn)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (mtime is None or entry[0] == mtime):
+                # Move to the most recently used end
+                del self._entries[key]
+                self._entries[key] = entry
+                self.hits += 1
+                return entry[1]
+        if mtime is None:
+            return None
+        start = time.time()
+        spec = cache.load(self.SECTION, func_id)
+        if spec is None:
+            return None
+        with self._lock:
+            self.disk_hits += 1
+            self.load_time += time.time() - start
+        self._remember(key, mtime, spec)
+        return spec
+
+    @staticmethod
+    def _lock_process(lock_fn):
+        """
+        Lock lock_fn against other processes and return the locked file or
+        None if locking is not possible
+        """
+        try:
+            os.makedirs(os.path.dirname(lock_fn))
+        except OSError as ose:
+            if ose.errno != errno.EEXIST:
+                return None
+        while True:
+            try:
+                process_lock = locked_file(lock_fn, 'a')
+                process_lock.__enter__()
+            except (IOError, OSError):
+                # The cache directory is not writable or file locking is
+                # not supported
+                return None
+            # The lock file is removed once the lock is released, so the
+            # file may have been removed while waiting for the lock
+            try:
+                st = os.stat(lock_fn)
+            except OSError:
+                st = None
+            fst = os.fstat(process_lock.f.fileno())
+            if st is not None and (st.st_dev, st.st_ino) == (fst.st_dev, fst.st_ino):
+                return process_lock
+            process_lock.__exit__(None, None, None)
+
+    @contextlib.contextmanager
+    def _extraction_lock(self, key, cache_fn):
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            key_lock[1] += 1
+        try:
+            with key_lock[0]:
+                process_lock = None
+                if cache_fn:
+                    lock_fn = os.path.splitext(cache_fn)[0] + '.lock'
+                    process_lock = self._lock_process(lock_fn)
+                try:
+                    yield
+                finally:
+                    if process_lock is not None:
+                        try:
+                            # Remove it while it is locked, see _lock_process
+                            os.remove(lock_fn)
+                        except OSError:
+                            # Open files cannot be removed on Windows
+                            pass
+                        process_lock.__exit__(None, None, None)
+        finally:
+            with self._lock:
+                key_lock[1] -= 1
+                if not key_lock[1]:
+                    del self._key_locks[key]
+
+    def get(self, cache, func_id, extract):
+        """
+        Return the spec for func_id, calling extract to extract it from the
+        player if it is not cached anywhere
+        """
+        cache_fn = cache._get_cache_fn(self.SECTION, func_id, 'json') if cache.enabled else None
+        key = cache_fn or func_id
+        spec = self._lookup(cache, func_id, key, cache_fn)
+        if spec is not None:
+            return spec
+
+        with self._extraction_lock(key, cache_fn):
+            # Another thread or process may have extracted it meanwhile
+            spec = self._lookup(cache, func_id, key, cache_fn)
+            if spec is not None:
+                return spec
+            start = time.time()
+            spec = extract()
+            with self._lock:
+                self.misses += 1
+                self.load_time += time.time() - start
+            cache.store(self.SECTION, func_id, spec)
+            self._remember(key, self._mtime(cache_fn), spec)
+            return spec
+
+    def format_stats(self):
+        return (
+            'Signature function cache: %d memory hits, %d filesystem hits, '
+            '%d extracted, %.3fs loading' % (self.hits, self.disk_hits, self.misses, self.load_time))
+
+
+_SIGNATURE_SPEC_CACHE = _SignatureSpecCache()
+
+
 class YoutubeIE(YoutubeBaseInfoExtractor):
     IE_DESC = 'YouTube.com'
     _VALID_URL = r"""(?x)^
@@ -1080,15 +1243,19 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
         player_type = id_m.group('ext')
         player_id = id_m.group('id')
 
-        # Read from filesystem cache
         func_id = '%s_%s_%s' % (
             player_type, player_id, self._signature_cache_id(example_sig))
         assert os.path.basename(func_id) == func_id
 
-        cache_spec = self._downloader.cache.load('youtube-sigfuncs', func_id)
-        if cache_spec is not None:
-            return lambda s: ''.join(s[i] for i in cache_spec)
+        cache_spec = _SIGNATURE_SPEC_CACHE.get(
+            self._downloader.cache, func_id,
+            lambda: self._extract_signature_spec(
+                video_id, player_url, player_type, player_id, example_sig))
+        if self._downloader.params.get('verbose'):
+            self._downloader.to_screen('[debug] ' + _SIGNATURE_SPEC_CACHE.format_stats())
+        return lambda s: ''.join(s[i] for i in cache_spec)
 
+    def _extract_signature_spec(self, video_id, player_url, player_type, player_id, example_sig):
         download_note = (
             'Downloading player %s' % player_url
             if self._downloader.params.get('verbose') else
@@ -1112,10 +1279,7 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
 
         test_string = ''.join(map(compat_chr, range(len(example_sig))))
         cache_res = res(test_string)
-        cache_spec = [ord(c) for c in cache_res]
-
-        self._downloader.cache.store('youtube-sigfuncs', func_id, cache_spec)
-        return res
+        return [ord(c) for c in cache_res]
 
     def _print_sig_code(self, func, example_sig):
         def gen_sig_code(idxs):
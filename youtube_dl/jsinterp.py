@@ -1,5 +1,6 @@
 from __future__ import unicode_literals
 
+import itertools
 import json
 import operator
 import re
@@ -27,15 +28,77 @@ _ASSIGN_OPERATORS.append(('=', lambda cur, right: right))
 _NAME_RE = r'[a-zA-Z_$][a-zA-Z_$0-9]*'
 
 
+def _js_split(obj, argvals):
+    assert argvals == ('',)
+    return list(obj)
+
+
+def _js_join(obj, argvals):
+    assert len(argvals) == 1
+    return argvals[0].join(obj)
+
+
+def _js_reverse(obj, argvals):
+    assert len(argvals) == 0
+    obj.reverse()
+    return obj
+
+
+def _js_slice(obj, argvals):
+    assert len(argvals) == 1
+    return obj[argvals[0]:]
+
+
+def _js_splice(obj, argvals):
+    assert isinstance(obj, list)
+    index, howMany = argvals
+    res = []
+    for i in range(index, min(index + howMany, len(obj))):
+        res.append(obj.pop(index))
+    return res
+
+
+_BUILTIN_METHODS = {
+    'split': _js_split,
+    'join': _js_join,
+    'reverse': _js_reverse,
+    'slice': _js_slice,
+    'splice': _js_splice,
+}
+
+
 class JSInterpreter(object):
+    """
+    Interpreter for the subset of JavaScript used by the signature functions.
+
+    Code is compiled once into a tree of Python closures, each of which
+    takes the dictionary of local variables and evaluates its part of the
+    code, so calling a function again does not parse it again.
+    """
+
     def __init__(self, code, objects=None):
         if objects is None:
             objects = {}
         self.code = code
         self._functions = {}
         self._objects = objects
+        self._paren_ids = itertools.count()
 
     def interpret_statement(self, stmt, local_vars, allow_recursion=100):
+        compiled, should_abort = self.compile_statement(stmt, allow_recursion)
+        return compiled(local_vars), should_abort
+
+    def interpret_expression(self, expr, local_vars, allow_recursion):
+        return self.compile_expression(expr, allow_recursion)(local_vars)
+
+    def compile_statement(self, stmt, allow_recursion=100):
+        """
+        Compile a statement.
+
+        Return a tuple (function, should_abort) where function evaluates the
+        statement given the dictionary of local variables and should_abort
+        tells whether it is a return statement.
+        """
         if allow_recursion < 0:
             raise ExtractorError('Recursion limit reached')
 
@@ -53,13 +116,16 @@ class JSInterpreter(object):
                 # Try interpreting it as an expression
                 expr = stmt
 
-        v = self.interpret_expression(expr, local_vars, allow_recursion)
-        return v, should_abort
+        return self.compile_expression(expr, allow_recursion), should_abort
 
-    def interpret_expression(self, expr, local_vars, allow_recursion):
+    def compile_expression(self, expr, allow_recursion):
+        """
+        Compile an expression into a function that evaluates it given the
+        dictionary of local variables
+        """
         expr = expr.strip()
         if expr == '':  # Empty expression
-            return None
+            return lambda local_vars: None
 
         if expr.startswith('('):
             parens_count = 0
@@ -69,15 +135,21 @@ class JSInterpreter(object):
                 else:
                     parens_count -= 1
                     if parens_count == 0:
-                        sub_expr = expr[1:m.start()]
-                        sub_result = self.interpret_expression(
-                            sub_expr, local_vars, allow_recursion)
+                        sub_expr = self.compile_expression(
+                            expr[1:m.start()], allow_recursion)
                         remaining_expr = expr[m.end():].strip()
                         if not remaining_expr:
-                            return sub_result
-                        else:
-                            expr = json.dumps(sub_result) + remaining_expr
-                        break
+                            return sub_expr
+                        # The rest of the expression refers to the value in
+                        # parens through a local variable of its own
+                        paren_var = '__paren%d' % next(self._paren_ids)
+                        rest_expr = self.compile_expression(
+                            paren_var + remaining_expr, allow_recursion)
+
+                        def eval_parens(local_vars):
+                            local_vars[paren_var] = sub_expr(local_vars)
+                            return rest_expr(local_vars)
+                        return eval_parens
             else:
                 raise ExtractorError('Premature end of parens in %r' % expr)
 
@@ -88,127 +160,141 @@ class JSInterpreter(object):
                 (?P<expr>.*)$''' % (_NAME_RE, re.escape(op)), expr)
             if not m:
                 continue
-            right_val = self.interpret_expression(
-                m.group('expr'), local_vars, allow_recursion - 1)
-
-            if m.groupdict().get('index'):
-                lvar = local_vars[m.group('out')]
-                idx = self.interpret_expression(
-                    m.group('index'), local_vars, allow_recursion)
-                assert isinstance(idx, int)
-                cur = lvar[idx]
-                val = opfunc(cur, right_val)
-                lvar[idx] = val
-                return val
-            else:
-                cur = local_vars.get(m.group('out'))
-                val = opfunc(cur, right_val)
-                local_vars[m.group('out')] = val
-                return val
+            return self._compile_assignment(
+                m.group('out'), m.group('index'), opfunc, m.group('expr'), allow_recursion)
 
         if expr.isdigit():
-            return int(expr)
+            int_value = int(expr)
+            return lambda local_vars: int_value
 
         var_m = re.match(
             r'(?!if|return|true|false)(?P<name>%s)$' % _NAME_RE,
             expr)
         if var_m:
-            return local_vars[var_m.group('name')]
+            name = var_m.group('name')
+            return lambda local_vars: local_vars[name]
 
         try:
-            return json.loads(expr)
+            value = json.loads(expr)
         except ValueError:
             pass
+        else:
+            if isinstance(value, (list, dict)):
+                # Every evaluation has to create a new object
+                return lambda local_vars: json.loads(expr)
+            return lambda local_vars: value
 
         m = re.match(
             r'(?P<in>%s)\[(?P<idx>.+)\]$' % _NAME_RE, expr)
         if m:
-            val = local_vars[m.group('in')]
-            idx = self.interpret_expression(
-                m.group('idx'), local_vars, allow_recursion - 1)
-            return val[idx]
+            name = m.group('in')
+            idx_expr = self.compile_expression(m.group('idx'), allow_recursion - 1)
+            return lambda local_vars: local_vars[name][idx_expr(local_vars)]
 
         m = re.match(
             r'(?P<var>%s)(?:\.(?P<member>[^(]+)|\[(?P<member2>[^]]+)\])\s*(?:\(+(?P<args>[^()]*)\))?$' % _NAME_RE,
             expr)
         if m:
-            variable = m.group('var')
-            member = remove_quotes(m.group('member') or m.group('member2'))
-            arg_str = m.group('args')
-
-            if variable in local_vars:
-                obj = local_vars[variable]
-            else:
-                if variable not in self._objects:
-                    self._objects[variable] = self.extract_object(variable)
-                obj = self._objects[variable]
-
-            if arg_str is None:
-                # Member access
-                if member == 'length':
-                    return len(obj)
-                return obj[member]
-
-            assert expr.endswith(')')
-            # Function call
-            if arg_str == '':
-                argvals = tuple()
-            else:
-                argvals = tuple([
-                    self.interpret_expression(v, local_vars, allow_recursion)
-                    for v in arg_str.split(',')])
-
-            if member == 'split':
-                assert argvals == ('',)
-                return list(obj)
-            if member == 'join':
-                assert len(argvals) == 1
-                return argvals[0].join(obj)
-            if member == 'reverse':
-                assert len(argvals) == 0
-                obj.reverse()
-                return obj
-            if member == 'slice':
-                assert len(argvals) == 1
-                return obj[argvals[0]:]
-            if member == 'splice':
-                assert isinstance(obj, list)
-                index, howMany = argvals
-                res = []
-                for i in range(index, min(index + howMany, len(obj))):
-                    res.append(obj.pop(index))
-                return res
-
-            return obj[member](argvals)
+            return self._compile_member(
+                m.group('var'), remove_quotes(m.group('member') or m.group('member2')),
+                m.group('args'), expr, allow_recursion)
 
         for op, opfunc in _OPERATORS:
             m = re.match(r'(?P<x>.+?)%s(?P<y>.+)' % re.escape(op), expr)
             if not m:
                 continue
-            x, abort = self.interpret_statement(
-                m.group('x'), local_vars, allow_recursion - 1)
+            x_expr, abort = self.compile_statement(
+                m.group('x'), allow_recursion - 1)
             if abort:
                 raise ExtractorError(
                     'Premature left-side return of %s in %r' % (op, expr))
-            y, abort = self.interpret_statement(
-                m.group('y'), local_vars, allow_recursion - 1)
+            y_expr, abort = self.compile_statement(
+                m.group('y'), allow_recursion - 1)
             if abort:
                 raise ExtractorError(
                     'Premature right-side return of %s in %r' % (op, expr))
-            return opfunc(x, y)
+            return self._compile_operator(opfunc, x_expr, y_expr)
 
         m = re.match(
             r'^(?P<func>%s)\((?P<args>[a-zA-Z0-9_$,]*)\)$' % _NAME_RE, expr)
         if m:
-            fname = m.group('func')
+            return self._compile_call(m.group('func'), m.group('args'))
+
+        raise ExtractorError('Unsupported JS expression %r' % expr)
+
+    def _compile_assignment(self, out, index, opfunc, expr, allow_recursion):
+        right_expr = self.compile_expression(expr, allow_recursion - 1)
+
+        if index:
+            idx_expr = self.compile_expression(index, allow_recursion)
+
+            def assign_item(local_vars):
+                right_val = right_expr(local_vars)
+                lvar = local_vars[out]
+                idx = idx_expr(local_vars)
+                assert isinstance(idx, int)
+                cur = lvar[idx]
+                val = opfunc(cur, right_val)
+                lvar[idx] = val
+                return val
+            return assign_item
+
+        def assign(local_vars):
+            right_val = right_expr(local_vars)
+            cur = local_vars.get(out)
+            val = opfunc(cur, right_val)
+            local_vars[out] = val
+            return val
+        return assign
+
+    def _compile_member(self, variable, member, arg_str, expr, allow_recursion):
+        def get_obj(local_vars):
+            if variable in local_vars:
+                return local_vars[variable]
+            if variable not in self._objects:
+                self._objects[variable] = self.extract_object(variable)
+            return self._objects[variable]
+
+        if arg_str is None:
+            # Member access
+            if member == 'length':
+                return lambda local_vars: len(get_obj(local_vars))
+            return lambda local_vars: get_obj(local_vars)[member]
+
+        assert expr.endswith(')')
+        # Function call
+        if arg_str == '':
+            arg_exprs = []
+        else:
+            arg_exprs = [
+                self.compile_expression(v, allow_recursion)
+                for v in arg_str.split(',')]
+
+        method = _BUILTIN_METHODS.get(member)
+
+        def call_member(local_vars):
+            obj = get_obj(local_vars)
+            argvals = tuple([arg_expr(local_vars) for arg_expr in arg_exprs])
+            if method:
+                return method(obj, argvals)
+            return obj[member](argvals)
+        return call_member
+
+    @staticmethod
+    def _compile_operator(opfunc, x_expr, y_expr):
+        return lambda local_vars: opfunc(x_expr(local_vars), y_expr(local_vars))
+
+    def _compile_call(self, fname, arg_str):
+        args = arg_str.split(',') if len(arg_str) > 0 else []
+
+        def call(local_vars):
             argvals = tuple([
                 int(v) if v.isdigit() else local_vars[v]
-                for v in m.group('args').split(',')]) if len(m.group('args')) > 0 else tuple()
+                for v in args])
             if fname not in self._functions:
                 self._functions[fname] = self.extract_function(fname)
             return self._functions[fname](argvals)
-
-        raise ExtractorError('Unsupported JS expression %r' % expr)
+        return call
 
     def extract_object(self, objname):
         _FUNC_NAME_RE = r'''(?:[a-zA-Z$0-9]+|"[a-zA-Z$0-9]+"|'[a-zA-Z$0-9]+')'''
@@ -251,11 +337,26 @@ class JSInterpreter(object):
         f = self.extract_function(funcname)
         return f(args)
 
+    def _compile_function_statement(self, stmt):
+        try:
+            return self.compile_statement(stmt)
+        except ExtractorError as e:
+            # Unsupported statements are only an error once they are
+            # reached, they may well follow a return
+            error = e
+
+            def fail(local_vars):
+                raise error
+            return fail, False
+
     def build_function(self, argnames, code):
+        statements = [
+            self._compile_function_statement(stmt) for stmt in code.split(';')]
+
         def resf(args):
             local_vars = dict(zip(argnames, args))
-            for stmt in code.split(';'):
-                res, abort = self.interpret_statement(stmt, local_vars)
+            for stmt, abort in statements:
+                res = stmt(local_vars)
                 if abort:
                     break
             return res
@@ -211,6 +211,15 @@ def parseOpts(overrideArguments=None):
         '--socket-timeout',
         dest='socket_timeout', type=float, default=None, metavar='SECONDS',
         help='Time to wait before giving up, in seconds')
+    network.add_option(
+        '--keep-alive-connections',
+        dest='keep_alive_connections', type=int, default=None, metavar='NUMBER',
+        help='Maximum number of idle connections kept open per host for reuse '
+             '(default is 4), 0 to open a new connection for every request')
+    network.add_option(
+        '--keep-alive-timeout',
+        dest='keep_alive_timeout', type=float, default=None, metavar='SECONDS',
+        help='Time an idle connection is kept open for reuse, in seconds (default is 30)')
     network.add_option(
         '--source-address',
         metavar='IP', dest='source_address', default=None,
@@ -417,6 +426,13 @@ def parseOpts(overrideArguments=None):
             'If a merge is required (e.g. bestvideo+bestaudio), '
             'output to given container format. One of mkv, mp4, ogg, webm, flv. '
             'Ignored if no merge is required'))
+    video_format.add_option(
+        '--stream-merge',
+        action='store_true', dest='stream_merge', default=False,
+        help=(
+            'Merge formats while they are being downloaded instead of '
+            'downloading them to separate files first (POSIX only, '
+            'HTTP formats only)'))
 
     subtitles = optparse.OptionGroup(parser, 'Subtitle Options')
     subtitles.add_option(
@@ -449,7 +465,11 @@ def parseOpts(overrideArguments=None):
     downloader.add_option(
         '-r', '--limit-rate', '--rate-limit',
         dest='ratelimit', metavar='RATE',
-        help='Maximum download rate in bytes per second (e.g. 50K or 4.2M)')
+        help='Maximum download rate in bytes per second (e.g. 50K or 4.2M), shared by all downloads')
+    downloader.add_option(
+        '--limit-rate-per-host',
+        dest='ratelimit_per_host', metavar='RATE',
+        help='Maximum download rate from every host in bytes per second (e.g. 50K or 4.2M)')
     downloader.add_option(
         '-R', '--retries',
         dest='retries', metavar='RETRIES', default=10,
@@ -458,6 +478,22 @@ def parseOpts(overrideArguments=None):
         '--fragment-retries',
         dest='fragment_retries', metavar='RETRIES', default=10,
         help='Number of retries for a fragment (default is %default), or "infinite" (DASH, hlsnative and ISM)')
+    downloader.add_option(
+        '--retry-backoff',
+        dest='retry_backoff', metavar='SECONDS', default=1, type=float,
+        help='Base delay between retries, doubled after every retry and randomized (default is %default), 0 to retry immediately')
+    downloader.add_option(
+        '--retry-max-delay',
+        dest='retry_max_delay', metavar='SECONDS', default=60, type=float,
+        help='Maximum delay between retries, also for delays requested by servers with Retry-After (default is %default)')
+    downloader.add_option(
+        '--circuit-breaker-threshold',
+        dest='circuit_breaker_threshold', metavar='N', default=10, type=int,
+        help='Pause all requests to a host after N failed requests in a row (default is %default), 0 to never pause them')
+    downloader.add_option(
+        '--circuit-breaker-cooldown',
+        dest='circuit_breaker_cooldown', metavar='SECONDS', default=30, type=float,
+        help='Number of seconds requests to a failing host are paused for (default is %default)')
     downloader.add_option(
         '--skip-unavailable-fragments',
         action='store_true', dest='skip_unavailable_fragments', default=True,
@@ -470,6 +506,25 @@ def parseOpts(overrideArguments=None):
         '--keep-fragments',
         action='store_true', dest='keep_fragments', default=False,
         help='Keep downloaded fragments on disk after downloading is finished; fragments are erased by default')
+    downloader.add_option(
+        '-N', '--concurrent-fragments',
+        dest='concurrent_fragment_downloads', metavar='N', default=1, type=int,
+        help='Number of fragments to download concurrently (default is %default) (DASH, hlsnative and ISM)')
+    downloader.add_option(
+        '--concurrent-formats',
+        action='store_true', dest='concurrent_formats', default=False,
+        help='Download the formats to be merged (e.g. bestvideo+bestaudio) concurrently')
+    downloader.add_option(
+        '--fragment-engine',
+        dest='fragment_engine', metavar='ENGINE', default='threads',
+        type='choice', choices=['threads', 'asyncio'],
+        help='How to download fragments (DASH, hlsnative and ISM): '
+             '"threads" (default) uses a pool of threads per download, '
+             '"asyncio" a single event loop shared by all downloads (Python 3.5+, no proxy support)')
+    downloader.add_option(
+        '--http-connections',
+        dest='http_connections', metavar='N', default=1, type=int,
+        help='Number of connections to download a single file over HTTP with, each one fetching a range of bytes (default is %default)')
     downloader.add_option(
         '--buffer-size',
         dest='buffersize', metavar='SIZE', default='1024',
@@ -490,6 +545,15 @@ def parseOpts(overrideArguments=None):
         '--playlist-random',
         action='store_true',
         help='Download playlist videos in random order')
+    downloader.add_option(
+        '--playlist-workers',
+        dest='playlist_workers', metavar='N', default=1, type=int,
+        help='Number of playlist videos to extract and download concurrently (default is %default)')
+    downloader.add_option(
+        '--prefetch-entries',
+        dest='prefetch_entries', metavar='N', default=0, type=int,
+        help='Number of upcoming playlist videos or batch file URLs to extract '
+             'while the current one is being downloaded (default is %default)')
     downloader.add_option(
         '--xattr-set-filesize',
         dest='xattr_set_filesize', action='store_true',
@@ -497,7 +561,7 @@ def parseOpts(overrideArguments=None):
     downloader.add_option(
         '--hls-prefer-native',
         dest='hls_prefer_native', action='store_true', default=None,
-        help='Use the native HLS downloader instead of ffmpeg')
+        help='Use the native HLS downloader instead of ffmpeg, also for live streams')
     downloader.add_option(
         '--hls-prefer-ffmpeg',
         dest='hls_prefer_native', action='store_false', default=None,
@@ -634,6 +698,10 @@ def parseOpts(overrideArguments=None):
         '--no-progress',
         action='store_true', dest='noprogress', default=False,
         help='Do not print progress bar')
+    verbosity.add_option(
+        '--progress-rate',
+        dest='progress_rate', metavar='RATE', type=float,
+        help='Maximum number of progress updates per second (default is 10), 0 to update the progress after every downloaded block')
     verbosity.add_option(
         '--console-title',
         action='store_true', dest='consoletitle', default=False,
@@ -749,6 +817,16 @@ def parseOpts(overrideArguments=None):
     filesystem.add_option(
         '--no-cache-dir', action='store_const', const=False, dest='cachedir',
         help='Disable filesystem caching')
+    filesystem.add_option(
+        '--cache-max-size', dest='cache_max_size', metavar='SIZE',
+        help='Maximum total size of the filesystem cache (e.g. 50k or 44.6m), the least recently used entries are removed when it is exceeded')
+    filesystem.add_option(
+        '--http-cache',
+        action='store_true', dest='http_cache', default=False,
+        help='Cache the webpages and API responses downloaded by the extractors in the cache directory, honoring their Cache-Control, ETag and Last-Modified headers. Requests with a body or credentials are never cached')
+    filesystem.add_option(
+        '--http-cache-max-age', dest='http_cache_max_age', metavar='SECONDS', type=float,
+        help='Maximum number of seconds for which a cached HTTP response is used without revalidation and kept (default is 3600)')
     filesystem.add_option(
         '--rm-cache-dir',
         action='store_true', dest='rm_cachedir',
@@ -788,6 +866,10 @@ def parseOpts(overrideArguments=None):
         '--postprocessor-args',
         dest='postprocessor_args', metavar='ARGS',
         help='Give these arguments to the postprocessor')
+    postproc.add_option(
+        '--postprocessor-workers',
+        dest='postprocessor_workers', metavar='N', default=0, type=int,
+        help='Number of files to post-process in the background while the next ones are downloaded (default is %default, post-process every file right after its download)')
     postproc.add_option(
         '-k', '--keep-video',
         action='store_true', dest='keepvideo', default=False,
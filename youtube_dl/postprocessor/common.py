@@ -55,6 +55,16 @@ class PostProcessor(object):
         """
         return [], information  # by default, keep file and do nothing
 
+    def plan_stream_copy(self, information):
+        """Return what run() would do as a stream copy step.
+
+        Postprocessors rewriting the downloaded file with an ffmpeg stream
+        copy return a StreamCopyStep (see postprocessor/ffmpeg.py), so that
+        the downloader can run the steps of consecutive postprocessors with
+        a single ffmpeg invocation. None means that run() must be called.
+        """
+        return None
+
     def try_utime(self, path, atime, mtime, errnote='Cannot update utime of file'):
         try:
             os.utime(encodeFilename(path), (atime, mtime))
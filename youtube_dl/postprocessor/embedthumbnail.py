@@ -5,7 +5,10 @@ from __future__ import unicode_literals
 import os
 import subprocess
 
-from .ffmpeg import FFmpegPostProcessor
+from .ffmpeg import (
+    FFmpegPostProcessor,
+    StreamCopyStep,
+)
 
 from ..utils import (
     check_executable,
@@ -26,6 +29,20 @@ class EmbedThumbnailPP(FFmpegPostProcessor):
         super(EmbedThumbnailPP, self).__init__(downloader)
         self._already_have_thumbnail = already_have_thumbnail
 
+    def plan_stream_copy(self, info):
+        if info['ext'] != 'mp3' or not info.get('thumbnails'):
+            return None
+        thumbnail_filename = info['thumbnails'][-1]['filename']
+        if not os.path.exists(encodeFilename(thumbnail_filename)):
+            return None
+        return StreamCopyStep(
+            '[ffmpeg] Adding thumbnail to "%s"' % info['filepath'],
+            lambda first_input: [
+                '-map', '%d' % first_input,
+                '-metadata:s:v', 'title="Album cover"', '-metadata:s:v', 'comment="Cover (Front)"'],
+            inputs=[thumbnail_filename], map_all=True,
+            remove_files=[] if self._already_have_thumbnail else [thumbnail_filename])
+
     def run(self, info):
         filename = info['filepath']
         temp_filename = prepend_extension(filename, 'temp')
@@ -41,18 +58,7 @@ class EmbedThumbnailPP(FFmpegPostProcessor):
             return [], info
 
         if info['ext'] == 'mp3':
-            options = [
-                '-c', 'copy', '-map', '0', '-map', '1',
-                '-metadata:s:v', 'title="Album cover"', '-metadata:s:v', 'comment="Cover (Front)"']
-
-            self._downloader.to_screen('[ffmpeg] Adding thumbnail to "%s"' % filename)
-
-            self.run_ffmpeg_multiple_files([filename, thumbnail_filename], temp_filename, options)
-
-            if not self._already_have_thumbnail:
-                os.remove(encodeFilename(thumbnail_filename))
-            os.remove(encodeFilename(filename))
-            os.rename(encodeFilename(temp_filename), encodeFilename(filename))
+            return self.run_stream_copy(info, [self.plan_stream_copy(info)])
 
         elif info['ext'] in ['m4a', 'mp4']:
             if not check_executable('AtomicParsley', ['-v']):
@@ -1,8 +1,12 @@
 from __future__ import unicode_literals
 
+import hashlib
 import io
+import json
 import os
 import subprocess
+import tempfile
+import threading
 import time
 import re
 
@@ -10,11 +14,14 @@ import re
 from .common import AudioConversionError, PostProcessor
 
 from ..compat import (
+    compat_getenv,
+    compat_os_name,
     compat_subprocess_get_DEVNULL,
 )
 from ..utils import (
     encodeArgument,
     encodeFilename,
+    error_to_compat_str,
     get_exe_version,
     is_outdated_version,
     PostProcessingError,
@@ -54,6 +61,140 @@ class FFmpegPostProcessorError(PostProcessingError):
     pass
 
 
+def _find_executable(exe):
+    """Return the path of the file exe would run or None if it is not found"""
+    if os.path.dirname(exe):
+        candidates = [exe]
+    else:
+        candidates = [
+            os.path.join(directory, exe)
+            for directory in compat_getenv('PATH', os.defpath).split(os.pathsep)
+            if directory]
+    exts = ['']
+    if compat_os_name == 'nt':
+        exts += compat_getenv('PATHEXT', '.EXE').split(os.pathsep)
+    for candidate in candidates:
+        for ext in exts:
+            path = candidate + ext
+            if os.path.isfile(path) and os.access(path, os.X_OK):
+                return os.path.abspath(path)
+    return None
+
+
+class _ExecutableRegistry(object):
+    """
+    Process-wide registry of what ffmpeg/avconv executables support.
+
+    Executables are run once per process for their version and every kind
+    of capability. The results are keyed by the path, modification time and
+    size of the executable, so an updated one is probed again, and are also
+    stored in the cache, when it is given and enabled, for later processes.
+    """
+
+    CACHE_SECTION = 'ffmpeg-probe'
+
+    _CAPABILITY_ARGS = {
+        'muxers': ['-formats'],
+        'codecs': ['-codecs'],
+        'protocols': ['-protocols'],
+    }
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _signature(exe):
+        path = _find_executable(exe)
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return [path, stat.st_mtime, stat.st_size]
+
+    @staticmethod
+    def _cache_key(signature):
+        return hashlib.sha1(json.dumps(signature).encode('utf-8')).hexdigest()
+
+    def _store(self, entry, signature, cache):
+        # Executables that cannot be found are probed once per process only
+        if signature and cache is not None:
+            cache.store(self.CACHE_SECTION, self._cache_key(signature), entry)
+
+    def _entry(self, exe, cache):
+        signature = self._signature(exe)
+        key = (exe, tuple(signature) if signature else None)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            if signature and cache is not None:
+                entry = cache.load(self.CACHE_SECTION, self._cache_key(signature))
+            if entry is None:
+                entry = {'version': get_exe_version(exe, args=['-version'])}
+                self._store(entry, signature, cache)
+            with self._lock:
+                entry = self._entries.setdefault(key, entry)
+        return entry, signature
+
+    def get(self, exe, cache=None):
+        """Return the entry of exe with its version, False if it is missing"""
+        return self._entry(exe, cache)[0]
+
+    @staticmethod
+    def _run(exe, args):
+        try:
+            out, _ = subprocess.Popen(
+                [encodeArgument(exe), encodeArgument('-hide_banner')] + [encodeArgument(a) for a in args],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                stderr=compat_subprocess_get_DEVNULL()).communicate()
+        except OSError:
+            return None
+        return out.decode('utf-8', 'ignore')
+
+    @staticmethod
+    def _parse_listing(output, kind):
+        if kind == 'protocols':
+            protocols = []
+            for line in output.splitlines():
+                line = line.strip()
+                if line.startswith('Output'):
+                    break
+                if line and not line.endswith(':'):
+                    protocols.append(line)
+            return protocols
+        # Formats and codecs are listed after a separator line, with a first
+        # column of flags
+        result = [] if kind == 'muxers' else {}
+        listing = False
+        for line in output.splitlines():
+            if not listing:
+                listing = line.strip().startswith('--')
+                continue
+            mobj = re.match(r'^\s*([A-Z.]+)\s+(\S+)', line)
+            if not mobj:
+                continue
+            flags, names = mobj.groups()
+            if kind == 'muxers':
+                if 'E' in flags:
+                    result.extend(names.split(','))
+            else:
+                result[names] = ''.join(f for f in 'DE' if f in flags[:2])
+        return result
+
+    def get_capabilities(self, exe, kind, cache=None):
+        entry, signature = self._entry(exe, cache)
+        if kind not in entry:
+            output = self._run(exe, self._CAPABILITY_ARGS[kind])
+            entry[kind] = None if output is None else self._parse_listing(output, kind)
+            self._store(entry, signature, cache)
+        return entry[kind]
+
+
+_exe_registry = _ExecutableRegistry()
+
+
 class FFmpegPostProcessor(PostProcessor):
     def __init__(self, downloader=None):
         PostProcessor.__init__(self, downloader)
@@ -109,13 +250,11 @@ class FFmpegPostProcessor(PostProcessor):
 
                 self._paths = dict(
                     (p, os.path.join(location, p)) for p in programs)
-                self._versions = dict(
-                    (p, get_exe_version(self._paths[p], args=['-version']))
-                    for p in programs)
-        if self._versions is None:
-            self._versions = dict(
-                (p, get_exe_version(p, args=['-version'])) for p in programs)
+        if self._paths is None:
             self._paths = dict((p, p) for p in programs)
+        self._versions = dict(
+            (p, _exe_registry.get(self._paths[p], self._cache)['version'])
+            for p in programs)
 
         if prefer_ffmpeg:
             prefs = ('ffmpeg', 'avconv')
@@ -135,6 +274,25 @@ class FFmpegPostProcessor(PostProcessor):
                 self.probe_basename = p
                 break
 
+    @property
+    def _cache(self):
+        # FFmpegFD passes itself as the downloader
+        downloader = getattr(self._downloader, 'ydl', self._downloader)
+        return getattr(downloader, 'cache', None)
+
+    def get_capabilities(self, kind):
+        """
+        Return what the ffmpeg/avconv executable supports or None if it is
+        not available.
+
+        kind is one of 'muxers' (list of names), 'codecs' (dictionary of
+        codec names to a string with D if it can be decoded and E if it can
+        be encoded) or 'protocols' (list of input protocols).
+        """
+        if not self.available:
+            return None
+        return _exe_registry.get_capabilities(self.executable, kind, self._cache)
+
     @property
     def available(self):
         return self.basename is not None
@@ -175,13 +333,8 @@ class FFmpegPostProcessor(PostProcessor):
                 return audio_codec
         return None
 
-    def run_ffmpeg_multiple_files(self, input_paths, out_path, opts):
-        self.check_version()
-
-        oldest_mtime = min(
-            os.stat(encodeFilename(path)).st_mtime for path in input_paths)
-
-        opts += self._configuration_args()
+    def _ffmpeg_command(self, input_paths, out_path, opts):
+        opts = opts + self._configuration_args()
 
         files_cmd = []
         for path in input_paths:
@@ -196,6 +349,15 @@ class FFmpegPostProcessor(PostProcessor):
 
         if self._downloader.params.get('verbose', False):
             self._downloader.to_screen('[debug] ffmpeg command line: %s' % shell_quote(cmd))
+        return cmd
+
+    def run_ffmpeg_multiple_files(self, input_paths, out_path, opts):
+        self.check_version()
+
+        oldest_mtime = min(
+            os.stat(encodeFilename(path)).st_mtime for path in input_paths)
+
+        cmd = self._ffmpeg_command(input_paths, out_path, opts)
         p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.PIPE)
         stdout, stderr = p.communicate()
         if p.returncode != 0:
@@ -214,6 +376,84 @@ class FFmpegPostProcessor(PostProcessor):
         # Also leave '-' intact in order not to break streaming to stdout.
         return 'file:' + fn if fn != '-' else fn
 
+    def run_stream_copy(self, info, steps):
+        """
+        Rewrite info['filepath'] doing the stream copy steps with a single
+        ffmpeg invocation and return the files to delete and the updated
+        information like run()
+        """
+        filename = info['filepath']
+        temp_filename = prepend_extension(filename, 'temp')
+        input_paths = [filename]
+        opts = ['-c', 'copy']
+        if any(step.map_all for step in steps):
+            opts += ['-map', '0']
+        formats = set(step.format for step in steps if step.format)
+        assert len(formats) <= 1
+        for fmt in formats:
+            opts += ['-f', fmt]
+        for step in steps:
+            self._downloader.to_screen(step.message)
+            opts += step.args(len(input_paths))
+            input_paths.extend(step.inputs)
+        try:
+            self.run_ffmpeg_multiple_files(input_paths, temp_filename, opts)
+        except FFmpegPostProcessorError:
+            if os.path.exists(encodeFilename(temp_filename)):
+                os.remove(encodeFilename(temp_filename))
+            raise
+        os.remove(encodeFilename(filename))
+        os.rename(encodeFilename(temp_filename), encodeFilename(filename))
+        files_to_delete = []
+        for step in steps:
+            for path in step.remove_files:
+                os.remove(encodeFilename(path))
+            files_to_delete.extend(step.files_to_delete)
+        return files_to_delete, info
+
+
+class StreamCopyStep(object):
+    """
+    The rewrite of a media file done by a postprocessor with an ffmpeg
+    stream copy.
+
+    Consecutive steps can be run with a single ffmpeg invocation: their
+    options are given to the same output, after -c copy. Available
+    arguments:
+
+    message:         What the step does, shown when it is run.
+    args:            Function returning the output options given the index of
+                     the first of the inputs of the step.
+    inputs:          Files read besides the media file.
+    map_all:         Keep all the streams of the media file (-map 0) instead
+                     of the ones picked by ffmpeg.
+    format:          Output format forced by the step.
+    video:           False if the step drops the video streams.
+    remove_files:    Files to remove once the media file has been rewritten.
+    files_to_delete: Files that can be deleted, as returned by run().
+    """
+
+    def __init__(self, message, args=None, inputs=(), map_all=False,
+                 format=None, video=True, remove_files=(), files_to_delete=()):
+        self.message = message
+        self.args = args or (lambda first_input: [])
+        self.inputs = list(inputs)
+        self.map_all = map_all
+        self.format = format
+        self.video = video
+        self.remove_files = list(remove_files)
+        self.files_to_delete = list(files_to_delete)
+
+    def can_follow(self, steps):
+        """Tell whether the step can be run in the same ffmpeg invocation as steps"""
+        for step in steps:
+            if self.format and step.format and self.format != step.format:
+                return False
+            # Keeping all the streams would keep the video streams too
+            if (self.map_all and not step.video) or (step.map_all and not self.video):
+                return False
+        return True
+
 
 class FFmpegExtractAudioPP(FFmpegPostProcessor):
     def __init__(self, downloader=None, preferredcodec=None, preferredquality=None, nopostoverwrites=False):
@@ -342,63 +582,63 @@ class FFmpegVideoConvertorPP(FFmpegPostProcessor):
 
 
 class FFmpegEmbedSubtitlePP(FFmpegPostProcessor):
-    def run(self, information):
-        if information['ext'] not in ('mp4', 'webm', 'mkv'):
-            self._downloader.to_screen('[ffmpeg] Subtitles can only be embedded in mp4, webm or mkv files')
-            return [], information
-        subtitles = information.get('requested_subtitles')
-        if not subtitles:
-            self._downloader.to_screen('[ffmpeg] There aren\'t any subtitles to embed')
-            return [], information
-
-        filename = information['filepath']
-
+    def _subtitles_to_embed(self, information):
         ext = information['ext']
         sub_langs = []
         sub_filenames = []
         webm_vtt_warn = False
 
-        for lang, sub_info in subtitles.items():
+        for lang, sub_info in information['requested_subtitles'].items():
             sub_ext = sub_info['ext']
             if ext != 'webm' or ext == 'webm' and sub_ext == 'vtt':
                 sub_langs.append(lang)
-                sub_filenames.append(subtitles_filename(filename, lang, sub_ext))
+                sub_filenames.append(subtitles_filename(information['filepath'], lang, sub_ext))
             else:
                 if not webm_vtt_warn and ext == 'webm' and sub_ext != 'vtt':
                     webm_vtt_warn = True
                     self._downloader.to_screen('[ffmpeg] Only WebVTT subtitles can be embedded in webm files')
+        return sub_langs, sub_filenames
 
+    def plan_stream_copy(self, information):
+        if information['ext'] not in ('mp4', 'webm', 'mkv') or not information.get('requested_subtitles'):
+            return None
+        sub_langs, sub_filenames = self._subtitles_to_embed(information)
         if not sub_langs:
-            return [], information
-
-        input_files = [filename] + sub_filenames
+            return None
 
-        opts = [
-            '-map', '0',
-            '-c', 'copy',
+        def args(first_input):
             # Don't copy the existing subtitles, we may be running the
             # postprocessor a second time
-            '-map', '-0:s',
-        ]
-        if information['ext'] == 'mp4':
-            opts += ['-c:s', 'mov_text']
-        for (i, lang) in enumerate(sub_langs):
-            opts.extend(['-map', '%d:0' % (i + 1)])
-            lang_code = ISO639Utils.short2long(lang)
-            if lang_code is not None:
-                opts.extend(['-metadata:s:s:%d' % i, 'language=%s' % lang_code])
+            opts = ['-map', '-0:s']
+            if information['ext'] == 'mp4':
+                opts += ['-c:s', 'mov_text']
+            for (i, lang) in enumerate(sub_langs):
+                opts.extend(['-map', '%d:0' % (first_input + i)])
+                lang_code = ISO639Utils.short2long(lang)
+                if lang_code is not None:
+                    opts.extend(['-metadata:s:s:%d' % i, 'language=%s' % lang_code])
+            return opts
+
+        return StreamCopyStep(
+            '[ffmpeg] Embedding subtitles in \'%s\'' % information['filepath'],
+            args, inputs=sub_filenames, map_all=True, files_to_delete=sub_filenames)
 
-        temp_filename = prepend_extension(filename, 'temp')
-        self._downloader.to_screen('[ffmpeg] Embedding subtitles in \'%s\'' % filename)
-        self.run_ffmpeg_multiple_files(input_files, temp_filename, opts)
-        os.remove(encodeFilename(filename))
-        os.rename(encodeFilename(temp_filename), encodeFilename(filename))
+    def run(self, information):
+        if information['ext'] not in ('mp4', 'webm', 'mkv'):
+            self._downloader.to_screen('[ffmpeg] Subtitles can only be embedded in mp4, webm or mkv files')
+            return [], information
+        if not information.get('requested_subtitles'):
+            self._downloader.to_screen('[ffmpeg] There aren\'t any subtitles to embed')
+            return [], information
 
-        return sub_filenames, information
+        step = self.plan_stream_copy(information)
+        if step is None:
+            return [], information
+        return self.run_stream_copy(information, [step])
 
 
 class FFmpegMetadataPP(FFmpegPostProcessor):
-    def run(self, info):
+    def plan_stream_copy(self, info):
         metadata = {}
 
         def add(meta_list, info_list=None):
@@ -426,18 +666,14 @@ class FFmpegMetadataPP(FFmpegPostProcessor):
         add('disc', 'disc_number')
 
         if not metadata:
-            self._downloader.to_screen('[ffmpeg] There isn\'t any metadata to add')
-            return [], info
+            return None
 
         filename = info['filepath']
-        temp_filename = prepend_extension(filename, 'temp')
-        in_filenames = [filename]
+        in_filenames = []
         options = []
 
         if info['ext'] == 'm4a':
             options.extend(['-vn', '-acodec', 'copy'])
-        else:
-            options.extend(['-c', 'copy'])
 
         for (name, value) in metadata.items():
             options.extend(['-metadata', '%s=%s' % (name, value)])
@@ -459,27 +695,129 @@ class FFmpegMetadataPP(FFmpegPostProcessor):
                         metadata_file_content += 'title=%s\n' % ffmpeg_escape(chapter_title)
                 f.write(metadata_file_content)
                 in_filenames.append(metadata_filename)
-                options.extend(['-map_metadata', '1'])
 
-        self._downloader.to_screen('[ffmpeg] Adding metadata to \'%s\'' % filename)
-        self.run_ffmpeg_multiple_files(in_filenames, temp_filename, options)
-        if chapters:
-            os.remove(metadata_filename)
-        os.remove(encodeFilename(filename))
-        os.rename(encodeFilename(temp_filename), encodeFilename(filename))
-        return [], info
+        def args(first_input):
+            if chapters:
+                return options + ['-map_metadata', '%d' % first_input]
+            return options
+
+        return StreamCopyStep(
+            '[ffmpeg] Adding metadata to \'%s\'' % filename, args,
+            inputs=in_filenames, video=info['ext'] != 'm4a', remove_files=in_filenames)
+
+    def run(self, info):
+        step = self.plan_stream_copy(info)
+        if step is None:
+            self._downloader.to_screen('[ffmpeg] There isn\'t any metadata to add')
+            return [], info
+        return self.run_stream_copy(info, [step])
 
 
 class FFmpegMergerPP(FFmpegPostProcessor):
+    _MERGE_ARGS = ['-c', 'copy', '-map', '0:v:0', '-map', '1:a:0']
+
     def run(self, info):
         filename = info['filepath']
         temp_filename = prepend_extension(filename, 'temp')
-        args = ['-c', 'copy', '-map', '0:v:0', '-map', '1:a:0']
         self._downloader.to_screen('[ffmpeg] Merging formats into "%s"' % filename)
-        self.run_ffmpeg_multiple_files(info['__files_to_merge'], temp_filename, args)
+        self.run_ffmpeg_multiple_files(info['__files_to_merge'], temp_filename, self._MERGE_ARGS)
         os.rename(encodeFilename(temp_filename), encodeFilename(filename))
         return info['__files_to_merge'], info
 
+    @staticmethod
+    def can_stream():
+        return hasattr(os, 'mkfifo')
+
+    @staticmethod
+    def _release_fifo(path):
+        # Opening a FIFO for writing blocks until it is opened for reading
+        try:
+            os.close(os.open(encodeFilename(path), os.O_RDONLY | os.O_NONBLOCK))
+        except OSError:
+            pass
+
+    def run_streamed(self, filename, downloads):
+        """
+        Merge formats into filename while they are being downloaded.
+
+        downloads is a list of (path, download) tuples, one per format, where
+        download is a function downloading the format to path and returning
+        True on success. Every path is made a FIFO that ffmpeg reads from, so
+        the formats are downloaded concurrently and never stored on their own.
+        Returns True on success. Otherwise nothing is left behind and the
+        formats can be downloaded and merged again the usual way.
+        """
+        self.check_version()
+        paths = [path for path, _ in downloads]
+        temp_filename = prepend_extension(filename, 'temp')
+        created = []
+        success = False
+        proc = None
+        try:
+            try:
+                for path in paths:
+                    os.mkfifo(encodeFilename(path))
+                    created.append(path)
+            except OSError as err:
+                self._downloader.report_warning(
+                    'Unable to create a FIFO for streamed merge: %s' % error_to_compat_str(err))
+                return False
+
+            self._downloader.to_screen('[ffmpeg] Merging formats into "%s" while downloading them' % filename)
+            cmd = self._ffmpeg_command(paths, temp_filename, self._MERGE_ARGS)
+            # ffmpeg only writes to stderr, which must not fill up a pipe
+            stderr = tempfile.TemporaryFile()
+            proc = subprocess.Popen(cmd, stdout=compat_subprocess_get_DEVNULL(), stderr=stderr, stdin=subprocess.PIPE)
+
+            results = [None] * len(downloads)
+
+            def download(index, func):
+                try:
+                    results[index] = func()
+                except Exception as err:
+                    self._downloader.report_warning(
+                        'Streamed download failed: %s' % error_to_compat_str(err))
+                    results[index] = False
+
+            threads = [
+                threading.Thread(target=download, args=(i, func))
+                for i, (_, func) in enumerate(downloads)]
+            for thread in threads:
+                thread.daemon = True
+                thread.start()
+            for thread in threads:
+                while thread.is_alive():
+                    if False in results and proc.poll() is None:
+                        # ffmpeg would wait for the failed format forever
+                        proc.kill()
+                    if proc.poll() is not None:
+                        # Writers may wait for ffmpeg to open their FIFO
+                        for path in paths:
+                            self._release_fifo(path)
+                    thread.join(0.1)
+            retcode = proc.wait()
+            if not all(results):
+                return False
+            if retcode != 0:
+                stderr.seek(0)
+                msg = stderr.read().decode('utf-8', 'replace').strip().split('\n')[-1]
+                self._downloader.report_warning('Streamed merge failed: %s' % msg)
+                return False
+            os.rename(encodeFilename(temp_filename), encodeFilename(filename))
+            success = True
+            return True
+        finally:
+            if proc is not None:
+                if proc.poll() is None:
+                    proc.kill()
+                    proc.wait()
+                stderr.close()
+            for path in created:
+                self._release_fifo(path)
+                os.remove(encodeFilename(path))
+            if not success and os.path.exists(encodeFilename(temp_filename)):
+                os.remove(encodeFilename(temp_filename))
+
     def can_merge(self):
         # TODO: figure out merge-capable ffmpeg version
         if self.basename != 'avconv':
@@ -499,55 +837,49 @@ class FFmpegMergerPP(FFmpegPostProcessor):
 
 
 class FFmpegFixupStretchedPP(FFmpegPostProcessor):
-    def run(self, info):
+    def plan_stream_copy(self, info):
         stretched_ratio = info.get('stretched_ratio')
         if stretched_ratio is None or stretched_ratio == 1:
-            return [], info
-
-        filename = info['filepath']
-        temp_filename = prepend_extension(filename, 'temp')
-
-        options = ['-c', 'copy', '-aspect', '%f' % stretched_ratio]
-        self._downloader.to_screen('[ffmpeg] Fixing aspect ratio in "%s"' % filename)
-        self.run_ffmpeg(filename, temp_filename, options)
-
-        os.remove(encodeFilename(filename))
-        os.rename(encodeFilename(temp_filename), encodeFilename(filename))
-
-        return [], info
-
+            return None
+        return StreamCopyStep(
+            '[ffmpeg] Fixing aspect ratio in "%s"' % info['filepath'],
+            lambda first_input: ['-aspect', '%f' % stretched_ratio])
 
-class FFmpegFixupM4aPP(FFmpegPostProcessor):
     def run(self, info):
-        if info.get('container') != 'm4a_dash':
+        step = self.plan_stream_copy(info)
+        if step is None:
             return [], info
+        return self.run_stream_copy(info, [step])
 
-        filename = info['filepath']
-        temp_filename = prepend_extension(filename, 'temp')
 
-        options = ['-c', 'copy', '-f', 'mp4']
-        self._downloader.to_screen('[ffmpeg] Correcting container in "%s"' % filename)
-        self.run_ffmpeg(filename, temp_filename, options)
-
-        os.remove(encodeFilename(filename))
-        os.rename(encodeFilename(temp_filename), encodeFilename(filename))
+class FFmpegFixupM4aPP(FFmpegPostProcessor):
+    def plan_stream_copy(self, info):
+        if info.get('container') != 'm4a_dash':
+            return None
+        return StreamCopyStep(
+            '[ffmpeg] Correcting container in "%s"' % info['filepath'], format='mp4')
 
-        return [], info
+    def run(self, info):
+        step = self.plan_stream_copy(info)
+        if step is None:
+            return [], info
+        return self.run_stream_copy(info, [step])
 
 
 class FFmpegFixupM3u8PP(FFmpegPostProcessor):
-    def run(self, info):
+    def plan_stream_copy(self, info):
         filename = info['filepath']
-        if self.get_audio_codec(filename) == 'aac':
-            temp_filename = prepend_extension(filename, 'temp')
-
-            options = ['-c', 'copy', '-f', 'mp4', '-bsf:a', 'aac_adtstoasc']
-            self._downloader.to_screen('[ffmpeg] Fixing malformed AAC bitstream in "%s"' % filename)
-            self.run_ffmpeg(filename, temp_filename, options)
+        if self.get_audio_codec(filename) != 'aac':
+            return None
+        return StreamCopyStep(
+            '[ffmpeg] Fixing malformed AAC bitstream in "%s"' % filename,
+            lambda first_input: ['-bsf:a', 'aac_adtstoasc'], format='mp4')
 
-            os.remove(encodeFilename(filename))
-            os.rename(encodeFilename(temp_filename), encodeFilename(filename))
-        return [], info
+    def run(self, info):
+        step = self.plan_stream_copy(info)
+        if step is None:
+            return [], info
+        return self.run_stream_copy(info, [step])
 
 
 class FFmpegSubtitlesConvertorPP(FFmpegPostProcessor):
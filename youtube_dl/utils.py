@@ -30,6 +30,8 @@ import ssl
 import subprocess
 import sys
 import tempfile
+import threading
+import time
 import traceback
 import xml.etree.ElementTree
 import zlib
@@ -236,6 +238,10 @@ def write_json_file(obj, fn):
     try:
         with tf:
             json.dump(obj, tf)
+        if hasattr(os, 'replace'):
+            # Python 3.3+, atomic on all platforms
+            os.replace(tf.name, fn)
+            return
         if sys.platform == 'win32':
             # Need to remove existing file on Windows, else os.rename raises
             # WindowsError or FileExistsError.
@@ -885,6 +891,162 @@ def _create_http_connection(ydl_handler, http_class, is_https, *args, **kwargs):
     return hc
 
 
+class KeepAliveConnectionPool(object):
+    """Pool of idle persistent HTTP connections.
+
+    Connections are grouped by a key that identifies the endpoint they are
+    connected to (scheme, host, port and proxy). At most max_idle idle
+    connections are kept per key and connections that stayed idle for more
+    than idle_timeout seconds are dropped. The number of requests served by
+    a pooled connection and by a new connection are available as hits and
+    misses respectively.
+    """
+
+    def __init__(self, max_idle=4, idle_timeout=30):
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.hits = 0
+        self.misses = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """Return an idle connection for key or None if there is none"""
+        conn = None
+        with self._lock:
+            idle = self._idle.get(key)
+            now = time.time()
+            while idle:
+                candidate, released = idle.pop()
+                if now - released <= self.idle_timeout and candidate.sock is not None:
+                    conn = candidate
+                    break
+                candidate.close()
+            if conn is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return conn
+
+    def release(self, key, conn):
+        """Put a connection whose last response has been read back to the pool"""
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if conn.sock is not None and len(idle) < self.max_idle:
+                idle.append((conn, time.time()))
+                return
+        conn.close()
+
+    def close(self):
+        """Close all idle connections"""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn, _ in conns:
+                conn.close()
+
+
+class _KeepAliveHTTPResponse(compat_http_client.HTTPResponse):
+    # Callback returning the connection to the pool, only set when the
+    # connection may be reused
+    _release_conn = None
+
+    def _close_conn(self):
+        compat_http_client.HTTPResponse._close_conn(self)
+        release_conn, self._release_conn = self._release_conn, None
+        # Only a response read to the end leaves the connection in a state
+        # suitable for the next request
+        if release_conn and (self.chunked or not self.length or self._method == 'HEAD'):
+            release_conn()
+
+    def close(self):
+        if self.fp is not None:
+            # Unread data is left on the connection so it can't be reused
+            self._release_conn = None
+        compat_http_client.HTTPResponse.close(self)
+
+
+def _keepalive_do_open(ydl_handler, http_class, req, conn_key, **http_conn_args):
+    """
+    Same as AbstractHTTPHandler.do_open but reuses connections from
+    ydl_handler's connection pool and returns them to the pool once the
+    response is read to the end.
+    """
+    pool = ydl_handler._connection_pool
+    # Persistent connections are only supported on Python 3 where responses
+    # reliably report when they have been read to the end
+    if pool is None or pool.max_idle <= 0 or sys.version_info < (3, 0):
+        return ydl_handler.do_open(http_class, req, **http_conn_args)
+
+    host = req.host
+    if not host:
+        raise compat_urllib_error.URLError('no host given')
+
+    headers = dict(req.unredirected_hdrs)
+    headers.update(dict(
+        (k, v) for k, v in req.headers.items() if k not in headers))
+    headers['Connection'] = 'keep-alive'
+    headers = dict((name.title(), val) for name, val in headers.items())
+
+    tunnel_host = getattr(req, '_tunnel_host', None)
+    tunnel_headers = {}
+    if tunnel_host:
+        proxy_auth_hdr = 'Proxy-Authorization'
+        if proxy_auth_hdr in headers:
+            tunnel_headers[proxy_auth_hdr] = headers[proxy_auth_hdr]
+            # Proxy-Authorization should not be sent to origin server
+            del headers[proxy_auth_hdr]
+
+    request_kwargs = {}
+    if sys.version_info >= (3, 6):
+        request_kwargs['encode_chunked'] = req.has_header('Transfer-encoding')
+
+    while True:
+        h = pool.acquire(conn_key)
+        reused = h is not None
+        if h is None:
+            h = http_class(host, timeout=req.timeout, **http_conn_args)
+            h.set_debuglevel(ydl_handler._debuglevel)
+            h.response_class = _KeepAliveHTTPResponse
+            if tunnel_host:
+                h.set_tunnel(tunnel_host, headers=tunnel_headers)
+        else:
+            h.timeout = req.timeout
+            h.sock.settimeout(req.timeout)
+        try:
+            try:
+                h.request(
+                    req.get_method(), req.selector, req.data, headers,
+                    **request_kwargs)
+            except socket.error as err:
+                if reused:
+                    raise
+                raise compat_urllib_error.URLError(err)
+            r = h.getresponse()
+        except (socket.error, compat_http_client.HTTPException) as err:
+            h.close()
+            # The server may have closed an idle connection in the meantime,
+            # try again with a new one
+            if reused and not isinstance(err, socket.timeout):
+                continue
+            raise
+        except Exception:
+            h.close()
+            raise
+        break
+
+    if r.will_close:
+        if h.sock:
+            h.sock.close()
+            h.sock = None
+    else:
+        r._release_conn = functools.partial(pool.release, conn_key, h)
+
+    r.url = req.get_full_url()
+    r.msg = r.reason
+    return r
+
+
 def handle_youtubedl_headers(headers):
     filtered_headers = headers
 
@@ -914,6 +1076,7 @@ class YoutubeDLHandler(compat_urllib_request.HTTPHandler):
     """
 
     def __init__(self, params, *args, **kwargs):
+        self._connection_pool = kwargs.pop('connection_pool', None)
         compat_urllib_request.HTTPHandler.__init__(self, *args, **kwargs)
         self._params = params
 
@@ -925,9 +1088,9 @@ class YoutubeDLHandler(compat_urllib_request.HTTPHandler):
             conn_class = make_socks_conn_class(conn_class, socks_proxy)
             del req.headers['Ytdl-socks-proxy']
 
-        return self.do_open(functools.partial(
+        return _keepalive_do_open(self, functools.partial(
             _create_http_connection, self, conn_class, False),
-            req)
+            req, ('http', req.host, socks_proxy))
 
     @staticmethod
     def deflate(data):
@@ -1063,6 +1226,7 @@ def make_socks_conn_class(base_class, socks_proxy):
 
 class YoutubeDLHTTPSHandler(compat_urllib_request.HTTPSHandler):
     def __init__(self, params, https_conn_class=None, *args, **kwargs):
+        self._connection_pool = kwargs.pop('connection_pool', None)
         compat_urllib_request.HTTPSHandler.__init__(self, *args, **kwargs)
         self._https_conn_class = https_conn_class or compat_http_client.HTTPSConnection
         self._params = params
@@ -1081,9 +1245,10 @@ class YoutubeDLHTTPSHandler(compat_urllib_request.HTTPSHandler):
             conn_class = make_socks_conn_class(conn_class, socks_proxy)
             del req.headers['Ytdl-socks-proxy']
 
-        return self.do_open(functools.partial(
+        return _keepalive_do_open(self, functools.partial(
             _create_http_connection, self, conn_class, True),
-            req, **kwargs)
+            req, ('https', req.host, getattr(req, '_tunnel_host', None), socks_proxy),
+            **kwargs)
 
 
 class YoutubeDLCookieProcessor(compat_urllib_request.HTTPCookieProcessor):
@@ -1522,6 +1687,67 @@ class locked_file(object):
         return self.f.read(*args)
 
 
+class DownloadArchive(object):
+    """
+    In-memory index of a download archive file.
+
+    The archive file is read once and kept as a set of video ids. Lines
+    appended by other processes sharing the same file are picked up
+    incrementally on the next lookup, and the whole file is reloaded if it
+    has been truncated or replaced.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._ids = set()
+        self._offset = 0
+        self._stat = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        try:
+            st = os.stat(self.filename)
+        except OSError as err:
+            if err.errno != errno.ENOENT:
+                raise
+            self._ids = set()
+            self._offset = 0
+            self._stat = None
+            return
+        if self._stat is not None:
+            if (st.st_dev, st.st_ino) != self._stat[:2] or st.st_size < self._stat[2]:
+                # Archive has been replaced or truncated
+                self._ids = set()
+                self._offset = 0
+            elif st.st_size == self._stat[2]:
+                return
+        try:
+            with locked_file(self.filename, 'r', encoding='utf-8') as archive_file:
+                archive_file.f.seek(self._offset)
+                for line in archive_file.read().splitlines():
+                    line = line.strip()
+                    if line:
+                        self._ids.add(line)
+                self._offset = archive_file.f.tell()
+                self._stat = (st.st_dev, st.st_ino, self._offset)
+        except IOError as ioe:
+            if ioe.errno != errno.ENOENT:
+                raise
+
+    def __contains__(self, vid_id):
+        with self._lock:
+            if vid_id in self._ids:
+                return True
+            self._refresh()
+            return vid_id in self._ids
+
+    def add(self, vid_id):
+        with self._lock:
+            with locked_file(self.filename, 'a', encoding='utf-8') as archive_file:
+                archive_file.write(vid_id + '\n')
+            self._ids.add(vid_id)
+
+
 def get_filesystem_encoding():
     encoding = sys.getfilesystemencoding()
     return encoding if encoding is not None else 'utf-8'